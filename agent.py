@@ -1,13 +1,62 @@
 import os
+import json
 import logging
 import time
+import asyncio
+import sqlite3
 from dotenv import load_dotenv
+import httpx
 import requests
-from memory import ShortTermMemory
+from aio import run_sync, in_thread
+from memory import ResearchContext, estimate_tokens
+from deadline import Deadline, DeadlineExceeded, current_deadline, budget, check, time_left
+from validator import StreamValidator, StreamAborted
+from formatter import BlogDocument, IncrementalBlogRenderer, clean_model_output, parse_blog, render_blog_html
+from http_client import http_client, async_http_client
+from research_index import research_index
+from model_health import ModelHealthTracker, RATE_LIMITED, HTTP_ERROR, VALIDATION_FAILED, ERROR
+from ratelimit import scheduler, parse_retry_after
+from telemetry import span, RESEARCH_SECONDS, MODEL_SECONDS, TOKENS
+from cache import blog_cache
+from canonical import canonical_topic, correct_topic
+from generations import generation_store, GenerationNotFound
+from sections import section_headings, plan_prompt, parse_plan, section_prompt, stitch, passage_prompt, heading_key, split_document
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Sentence/paragraph counts for each blog size offered by the API
+BLOG_SIZES = {
+    'small': {'intro': 2, 'content': 3, 'summary': 1},
+    'medium': {'intro': 3, 'content': 4, 'summary': 2},
+    'large': {'intro': 4, 'content': 6, 'summary': 3}
+}
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+ALL_MODELS_FAILED = "Error: All OpenRouter models failed. Please check your API key and try again."
+
+
+def blog_size_name(intro_sentences, content_paragraphs, summary_sentences):
+    """The BLOG_SIZES name for these counts, or the counts themselves for a custom size"""
+    for name, sizes in BLOG_SIZES.items():
+        if (sizes['intro'], sizes['content'], sizes['summary']) == (intro_sentences, content_paragraphs, summary_sentences):
+            return name
+    return f"{intro_sentences}-{content_paragraphs}-{summary_sentences}"
+
+
+# Research sources dropped first when a request is short on time
+OPTIONAL_SOURCES = {"Government Schemes", "Current Trends"}
+
+DEFAULT_MODELS = [
+    "google/gemini-2.0-flash-exp:free",
+    "mistralai/mistral-7b-instruct:free",
+    "qwen/qwen3-coder:free",
+    "meta-llama/llama-3.2-3b-instruct:free",
+    "z-ai/glm-4.5-air:free",
+    "google/gemma-2-9b-it:free",
+    "huggingfaceh4/zephyr-7b-beta:free"
+]
+
 class BlogAgent:
     def __init__(self):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
@@ -19,93 +68,243 @@ class BlogAgent:
             raise ValueError("Invalid OpenRouter API key format")
         
         self.use_openrouter = True
+        self.research_workers = int(os.getenv("RESEARCH_MAX_WORKERS", "4"))
+        self.models = list(DEFAULT_MODELS)
+        self.model_health = ModelHealthTracker()
+        # Hedging is off with parallelism 1; higher values race up to that many models
+        self.hedge_parallelism = int(os.getenv("OPENROUTER_HEDGE_PARALLELISM", "1"))
+        self.hedge_delay = float(os.getenv("OPENROUTER_HEDGE_DELAY", "15"))
+        # Stream responses so StreamValidator can abandon bad or stalled generations early
+        self.early_abort = os.getenv("OPENROUTER_EARLY_ABORT", "1") == "1"
+        self.stall_timeout = float(os.getenv("STREAM_STALL_TIMEOUT", "20"))
+        # A model whose quota frees up later than this is skipped in favour of the next one
+        self.model_max_wait = float(os.getenv("OPENROUTER_MODEL_MAX_WAIT", "5"))
+        # Share of a request's remaining time research may use, and below how many seconds left
+        # the optional sources are skipped
+        self.research_share = float(os.getenv("DEADLINE_RESEARCH_SHARE", "0.4"))
+        self.full_research_min = float(os.getenv("DEADLINE_FULL_RESEARCH_MIN", "60"))
+        # "sections" plans the blog in one short call, then writes the body sections concurrently;
+        # it applies to blogs with at least SECTION_STRATEGY_MIN_PARAGRAPHS paragraphs
+        self.generation_strategy = os.getenv("GENERATION_STRATEGY", "single")
+        self.sections_min_paragraphs = int(os.getenv("SECTION_STRATEGY_MIN_PARAGRAPHS", "6"))
+        self.section_min_word_ratio = float(os.getenv("SECTION_MIN_WORD_RATIO", "0.6"))
+        # Research tokens allowed into the prompt, per blog size
+        self.context_budgets = {
+            'small': int(os.getenv("CONTEXT_TOKEN_BUDGET_SMALL", "500")),
+            'medium': int(os.getenv("CONTEXT_TOKEN_BUDGET_MEDIUM", "700")),
+            'large': int(os.getenv("CONTEXT_TOKEN_BUDGET_LARGE", "900"))
+        }
         logging.info("BlogAgent initialized with valid API key")
-        self.memory = ShortTermMemory()
     
-    def research_topic(self, topic: str):
+    def research_topic(self, topic: str, context: ResearchContext = None, deadline: Deadline = None) -> ResearchContext:
         """Research the topic using available tools with enhanced error handling"""
-        # Fix common spelling mistakes
-        if "Fianance" in topic:
-            topic = topic.replace("Fianance", "Finance")
+        return run_sync(self.aresearch_topic(topic, context, deadline))
+    
+    async def aresearch_topic(self, topic: str, context: ResearchContext = None, deadline: Deadline = None) -> ResearchContext:
+        """Async research_topic: all sources are queried concurrently
+
+        Under a deadline, research gets a share of the remaining time; queries still
+        running when it is up count as failed, and optional sources are skipped when
+        little time is left.
+        """
+        if deadline is not None:
+            current_deadline.set(deadline)
+        topic = correct_topic(topic)
+        
+        # Research is request-scoped so concurrent generations never see each other's data
+        if context is None:
+            context = ResearchContext(topic)
             
         logging.info(f"Researching topic: {topic}")
         
         try:
             from tools import ResearchTools
             
-            # Try Wikipedia first with error handling
-            try:
-                wiki_result = ResearchTools.wikipedia_search(topic)
-                if wiki_result and not wiki_result.startswith("Wikipedia search failed"):
-                    self.memory.add_research("Wikipedia", wiki_result)
-                else:
-                    self.memory.add_research("Wikipedia", f"Wikipedia search failed for: {topic}")
-            except Exception as e:
-                logging.error(f"Wikipedia search error: {str(e)}")
-                self.memory.add_research("Wikipedia", f"Wikipedia search failed for: {topic}")
+            # Every source is queried at once; per-host pacing lives in ResearchTools
+            queries = [
+                ("Wikipedia", ResearchTools.awikipedia_search, topic, "Wikipedia search failed"),
+                ("Latest News", ResearchTools.aweb_search, f"{topic} latest news 2024 2025", "All search engines failed"),
+                ("Government Schemes", ResearchTools.aweb_search, f"{topic} government schemes policies 2024 , 2025", "All search engines failed"),
+                ("Current Trends", ResearchTools.aweb_search, f"{topic} current trends developments 2025", "All search engines failed"),
+            ]
             
-            time.sleep(1)  # Rate limiting
+            remaining = time_left()
+            if remaining is not None and remaining < self.full_research_min:
+                logging.info(f"Only {remaining:.0f}s left, skipping optional research sources")
+                queries = [query for query in queries if query[0] not in OPTIONAL_SOURCES]
             
-            # Try web search with error handling
+            limit = asyncio.Semaphore(self.research_workers)
+            # Queries run under research's own, shorter deadline so their timeouts leave room to generate
+            token = current_deadline.set(Deadline(remaining * self.research_share)) if remaining is not None else None
             try:
-                web_result = ResearchTools.web_search(f"{topic} latest news 2024 2025")
-                if web_result and not web_result.startswith("All search engines failed"):
-                    self.memory.add_research("Latest News", web_result)
-                else:
-                    self.memory.add_research("Latest News", f"Web search failed for: {topic}")
-            except Exception as e:
-                logging.error(f"Web search error: {str(e)}")
-                self.memory.add_research("Latest News", f"Web search failed for: {topic}")
+                tasks = [
+                    asyncio.ensure_future(self._run_research_query(limit, source, search, query, failure_prefix, topic))
+                    for source, search, query, failure_prefix in queries
+                ]
+            finally:
+                if token is not None:
+                    current_deadline.reset(token)
             
-            time.sleep(1)
+            done, pending = await asyncio.wait(tasks, timeout=remaining * self.research_share if remaining is not None else None)
+            for task in pending:
+                task.cancel()
             
-            # Try another web search with error handling
-            try:
-                schemes_result = ResearchTools.web_search(f"{topic} government schemes policies 2024 , 2025")
-                if schemes_result and not schemes_result.startswith("All search engines failed"):
-                    self.memory.add_research("Government Schemes", schemes_result)
+            # Results are stored in submission order, so memory layout never depends on timing
+            for (source, _, _, _), task in zip(queries, tasks):
+                if task in done:
+                    context.add_research(source, task.result())
                 else:
-                    self.memory.add_research("Government Schemes", f"Web search failed for: {topic}")
-            except Exception as e:
-                logging.error(f"Government schemes search error: {str(e)}")
-                self.memory.add_research("Government Schemes", f"Web search failed for: {topic}")
-            
-            time.sleep(1)
-            
-            # Try trends search with error handling
-            try:
-                trends_result = ResearchTools.web_search(f"{topic} current trends developments 2025")
-                if trends_result and not trends_result.startswith("All search engines failed"):
-                    self.memory.add_research("Current Trends", trends_result)
-                else:
-                    self.memory.add_research("Current Trends", f"Web search failed for: {topic}")
-            except Exception as e:
-                logging.error(f"Trends search error: {str(e)}")
-                self.memory.add_research("Current Trends", f"Web search failed for: {topic}")
+                    logging.warning(f"{source} research ran out of time")
+                    context.add_research(source, f"{'Wikipedia' if source == 'Wikipedia' else 'Web'} search failed for: {topic}")
             
             logging.info("Research completed successfully")
         except Exception as e:
             logging.error(f"Research failed: {str(e)}")
-            self.memory.add_research("Error", f"Could not complete research for {topic}")
+            context.add_research("Error", f"Could not complete research for {topic}")
+        return context
     
-    def generate_blog(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2):
-        """Generate a complete blog post"""
-        # Fix common spelling mistakes
-        if "Fianance" in topic:
-            topic = topic.replace("Fianance", "Finance")
-            
-        self.research_topic(topic)
-        research_context = self.memory.get_all_research()
+    async def _run_research_query(self, limit, source, search, query, failure_prefix, topic):
+        """Run one research query, mapping failures to the placeholder text stored in memory"""
+        failure_message = f"{'Wikipedia' if source == 'Wikipedia' else 'Web'} search failed for: {topic}"
+        with span("research_source", RESEARCH_SECONDS, source=source) as labels:
+            try:
+                # The local index answers in milliseconds when it already covers this topic well enough
+                if research_index is not None:
+                    local = await in_thread(research_index.lookup, source, topic)
+                    if local:
+                        logging.info(f"{source} answered from the local research index")
+                        labels["outcome"] = "local"
+                        return local
+                
+                async with limit:
+                    result = await search(query)
+                if result and not result.startswith(failure_prefix):
+                    if research_index is not None:
+                        await in_thread(research_index.add_research, source, result)
+                    return result
+                labels["outcome"] = "failed"
+                return failure_message
+            except Exception as e:
+                logging.error(f"{source} search error: {str(e)}")
+                labels["outcome"] = "error"
+                return failure_message
+    
+    def generate_blog(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2,
+                      context: ResearchContext = None, progress=None, deadline: Deadline = None, force_refresh: bool = False):
+        """Generate a complete blog post, researching first unless a context is supplied
+
+        progress, if given, is called as progress(stage, detail) at each pipeline stage.
+        deadline, if given, bounds the whole generation; DeadlineExceeded is raised when it runs out.
+        A blog cached for the same canonical topic and size is returned unless force_refresh is set.
+        """
+        return run_sync(self.agenerate_blog(topic, intro_sentences, content_paragraphs, summary_sentences, context, progress, deadline,
+                                            force_refresh))
+    
+    def generate_blog_result(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2,
+                             context: ResearchContext = None, progress=None, deadline: Deadline = None, force_refresh: bool = False):
+        """Like generate_blog, but returns (blog_content, document) so other formats can be rendered later"""
+        return run_sync(self.agenerate_blog_result(topic, intro_sentences, content_paragraphs, summary_sentences, context, progress, deadline,
+                                                   force_refresh))
+    
+    async def agenerate_blog(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2,
+                             context: ResearchContext = None, progress=None, deadline: Deadline = None, force_refresh: bool = False):
+        """Async generate_blog; the sync API is a thin wrapper over this"""
+        blog_content, _ = await self.agenerate_blog_result(topic, intro_sentences, content_paragraphs, summary_sentences, context, progress, deadline,
+                                                           force_refresh)
+        return blog_content
+    
+    async def agenerate_blog_result(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2,
+                                    context: ResearchContext = None, progress=None, deadline: Deadline = None, force_refresh: bool = False):
+        """Async generate_blog_result; document is None for errors and for the mock blog"""
+        if not force_refresh:
+            cached = await in_thread(self.cached_blog_result, topic, intro_sentences, content_paragraphs, summary_sentences)
+            if cached:
+                return cached
+        
+        if deadline is None:
+            blog_content, document = await self._agenerate_blog_result(topic, intro_sentences, content_paragraphs, summary_sentences, context, progress)
+        else:
+            blog_content, document = await self._agenerate_blog_result_by(deadline, topic, intro_sentences, content_paragraphs, summary_sentences,
+                                                                          context, progress)
+        # Only real generations are kept; errors and the mock blog have no document
+        if blog_cache is not None and document is not None:
+            await in_thread(blog_cache.set, canonical_topic(topic), blog_size_name(intro_sentences, content_paragraphs, summary_sentences),
+                            blog_content, document.to_dict())
+        return blog_content, document
+    
+    def cached_blog_result(self, topic, intro_sentences, content_paragraphs, summary_sentences):
+        """(blog_content, document) of a fresh cached blog for this topic and size, or None"""
+        if blog_cache is None:
+            return None
+        cached = blog_cache.get(canonical_topic(topic), blog_size_name(intro_sentences, content_paragraphs, summary_sentences))
+        if cached is None:
+            return None
+        logging.info(f"Serving cached blog for topic: {topic}")
+        return cached[0], BlogDocument.from_dict(cached[1])
+    
+    async def _agenerate_blog_result_by(self, deadline, topic, intro_sentences, content_paragraphs, summary_sentences, context=None, progress=None):
+        """_agenerate_blog_result bounded by deadline"""
+        # Every stage below reads the deadline to size its timeouts; wait_for is the backstop
+        current_deadline.set(deadline)
+        try:
+            return await asyncio.wait_for(
+                self._agenerate_blog_result(topic, intro_sentences, content_paragraphs, summary_sentences, context, progress),
+                deadline.remaining()
+            )
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while generating")
+    
+    async def _agenerate_blog_result(self, topic, intro_sentences, content_paragraphs, summary_sentences, context=None, progress=None):
+        """agenerate_blog_result without the deadline wrapper"""
+        if progress:
+            progress("researching")
+        # Researched here rather than in _aprepare_prompt so the generation can be stored with its research
+        if context is None:
+            with span("research"):
+                context = await self.aresearch_topic(correct_topic(topic))
+        topic, blog_prompt, research_context = await self._aprepare_prompt(topic, intro_sentences, content_paragraphs, summary_sentences, context)
+        
+        logging.info("Generating blog post...")
+        
+        if self.use_openrouter:
+            target_word_count = self._get_target_word_count(intro_sentences, content_paragraphs, summary_sentences)
+            document = None
+            if self.generation_strategy == "sections" and content_paragraphs >= self.sections_min_paragraphs:
+                with span("generation", strategy="sections") as labels:
+                    document = await self._agenerate_sections(topic, blog_prompt, research_context, intro_sentences,
+                                                              content_paragraphs, summary_sentences, target_word_count, progress)
+                    if document is None:
+                        labels["outcome"] = "failed"
+                if document is None:
+                    logging.warning("Section-parallel generation failed, falling back to a single call")
+            if document is None:
+                with span("generation", strategy="single") as labels:
+                    document = await self._agenerate_with_openrouter(blog_prompt, topic, target_word_count, progress)
+                    if document is None:
+                        labels["outcome"] = "failed"
+            if document is None:
+                return ALL_MODELS_FAILED, None
+            if research_index is not None:
+                await in_thread(research_index.add_blog, topic, document)
+            await self._astore_generation(topic, (intro_sentences, content_paragraphs, summary_sentences), context, document)
+            return document.to_html(), document
+        else:
+            return self._generate_mock_blog(topic, research_context, intro_sentences, content_paragraphs, summary_sentences), None
+    
+    def _prepare_prompt(self, topic, intro_sentences, content_paragraphs, summary_sentences, context=None, deadline=None):
+        """Research the topic (unless already done) and build the generation prompt"""
+        return run_sync(self._aprepare_prompt(topic, intro_sentences, content_paragraphs, summary_sentences, context, deadline))
+    
+    async def _aprepare_prompt(self, topic, intro_sentences, content_paragraphs, summary_sentences, context=None, deadline=None):
+        """Async _prepare_prompt"""
+        topic = correct_topic(topic)
+        
+        if context is None:
+            context = await self.aresearch_topic(topic, deadline=deadline)
+        research_context = context.get_packed_research(self._get_context_budget(content_paragraphs))
         
         # Check if we have any valid research data
-        all_failed = True
-        for item in self.memory.research_data:
-            content = item.get('content', '')
-            if "failed" not in content.lower() and "error" not in content.lower():
-                all_failed = False
-                break
-        
-        if all_failed:
+        if context.all_failed():
             logging.warning("All research sources failed, using fallback content")
             research_context = f"Basic information about {topic}. This is a fallback due to research failures."
         
@@ -214,13 +413,7 @@ CRITICAL QUALITY STANDARDS:
 
 Write the blog now:
 """
-        
-        logging.info("Generating blog post...")
-        
-        if self.use_openrouter:
-            return self._generate_with_openrouter(blog_prompt, topic)
-        else:
-            return self._generate_mock_blog(topic, research_context, intro_sentences, content_paragraphs, summary_sentences)
+        return topic, blog_prompt, research_context
     
     def _get_target_word_count(self, intro_sentences, content_paragraphs, summary_sentences):
         """Calculate target word count based on blog size"""
@@ -232,175 +425,565 @@ Write the blog now:
         else:  # Large (6 paragraphs)
             return 1800  # 1800 words
     
-    def _generate_with_openrouter(self, prompt, topic):
+    def _get_context_budget(self, content_paragraphs):
+        """Token budget for packed research, by blog size"""
+        if content_paragraphs == 3:  # Small
+            return self.context_budgets['small']
+        elif content_paragraphs == 4:  # Medium
+            return self.context_budgets['medium']
+        else:  # Large
+            return self.context_budgets['large']
+    
+    def _generate_with_openrouter(self, prompt, topic, target_word_count=None, progress=None):
         """Generate blog using OpenRouter API with enhanced error handling"""
-        import re
-        models = [
-            "google/gemini-2.0-flash-exp:free",
-            "mistralai/mistral-7b-instruct:free",
-            "qwen/qwen3-coder:free",
-            "meta-llama/llama-3.2-3b-instruct:free",
-            "z-ai/glm-4.5-air:free",
-            "google/gemma-2-9b-it:free",
-            "huggingfaceh4/zephyr-7b-beta:free"
-        ]
-        
-        for model in models:
-            try:
-                response = requests.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "HTTP-Referer": "http://localhost:5000",
-                        "X-Title": "Blog Generation System",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [
-                            {"role": "system", "content": "You are a factual, structured blog generator. Write accurate, well-researched content."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.5
-                    },
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    content = response.json()["choices"][0]["message"]["content"]
-                    
-                    # Clean up formatting
-                    content = content.replace('**', '').replace('*', '')
-                    content = re.sub(r'===\s*(.*?)\s*===', r'\n\n\1\n\n', content)
-                    content = re.sub(r'\n+Note:.*$', '', content, flags=re.IGNORECASE | re.DOTALL)
-                    content = re.sub(r'\n+\d+:.*picture.*$', '', content, flags=re.MULTILINE)
-                    content = re.sub(r'(A |The )?(photo|screenshot|picture|image) of.*?\n', '', content, flags=re.IGNORECASE)
-                    content = re.sub(r'Screenshot:.*?\n', '', content, flags=re.IGNORECASE)
-                    content = re.sub(r'\[Caption:.*?\]', '', content, flags=re.IGNORECASE)
-                    content = re.sub(r'\n{3,}', '\n\n', content)
-                    content = content.strip()
-                    
-                    # Validate content quality
-                    if self._validate_content(content, prompt):
-                        # Remove all image tags
-                        content = re.sub(r'\[IMAGE:[^\]]+\]', '', content)
-                        content = self._format_blog_html(content)
-                        content = self._add_sources(content)
-                        logging.info(f"Blog generated successfully using {model}")
-                        return content
-                    else:
-                        logging.warning(f"Content validation failed for {model}, trying next model")
-                        continue
-                else:
-                    logging.warning(f"Model {model} failed: {response.status_code}")
-            except Exception as e:
-                logging.error(f"Model {model} error: {str(e)}")
+        document = run_sync(self._agenerate_with_openrouter(prompt, topic, target_word_count, progress))
+        return document.to_html() if document else ALL_MODELS_FAILED
+    
+    async def _agenerate_with_openrouter(self, prompt, topic, target_word_count=None, progress=None, finalize=None):
+        """Return the first usable BlogDocument, or None; sequential fallback, or hedged when parallelism > 1
+
+        finalize(model, content, latency), if given, replaces _finalize_content for partial generations.
+        """
+        models = self.model_health.order(self.models)
+        
+        if self.hedge_parallelism > 1:
+            document = await self._agenerate_hedged(models, prompt, target_word_count, progress, finalize)
+        else:
+            document = None
+            for model in models:
+                check("generating")
+                document = await self._aattempt_model(model, prompt, target_word_count, progress, finalize)
+                if document:
+                    break
+        
+        if document:
+            return document
         
         logging.error("All models failed")
-        return "Error: All OpenRouter models failed. Please check your API key and try again."
+        return None
     
-    def _format_blog_html(self, content):
-        """Format the blog content with proper HTML structure and styling"""
-        import re
+    async def _agenerate_hedged(self, models, prompt, target_word_count=None, progress=None, finalize=None):
+        """Race models: start the next one whenever the hedge delay passes without a usable answer"""
+        remaining = iter(models)
+        pending = set()
         
-        # Remove section labels
-        content = re.sub(r'^(HEADING|SUBTITLE|INTRODUCTION|CONTENT SECTION|SUMMARY|SOURCES)\s*$', '', content, flags=re.MULTILINE)
-        content = re.sub(r'\n{3,}', '\n\n', content).strip()
-        
-        lines = content.split('\n')
-        formatted = '<div class="blog-container">'
-        
-        # Add CSS styling
-        css = '<style>'
-        css += '.blog-container { max-width: 900px; margin: 0 auto; font-family: "Segoe UI", Arial, sans-serif; line-height: 1.8; color: #333; }'
-        css += '.blog-title { text-align: center; font-size: 32px; font-weight: bold; color: #1a1a1a; margin: 30px 0 20px 0; padding: 0 20px; text-decoration: none; }'
-        css += '.blog-subtitle { font-size: 20px; font-weight: bold; color: #2c3e50; margin: 25px 0 15px 0; border-left: 4px solid #3498db; padding-left: 15px; text-decoration: none; }'
-        css += '.section-heading { font-size: 20px; font-weight: bold; color: #2c3e50; margin: 25px 0 15px 0; border-left: 4px solid #3498db; padding-left: 15px; text-decoration: none; }'
-        css += '.blog-container p { font-size: 16px; margin: 15px 0; text-align: justify; line-height: 1.8; text-decoration: none; }'
-        css += '.blog-container * { text-decoration: none !important; }'
-        css += '.sources-section { margin-top: 40px; padding-top: 20px; border-top: 2px solid #e0e0e0; }'
-        css += '</style>\n'
-        formatted += css
-        
-        line_count = 0
-        current_para = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                if current_para:
-                    formatted += f'<p>{" ".join(current_para)}</p>\n'
-                    current_para = []
-                continue
+        def launch():
+            model = next(remaining, None)
+            if model is None:
+                return False
+            pending.add(asyncio.ensure_future(self._aattempt_model(model, prompt, target_word_count, progress, finalize)))
+            return True
+        
+        try:
+            launch()
+            while pending:
+                # Only wait out the hedge delay while there is still room to hedge
+                can_hedge = len(pending) < self.hedge_parallelism
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED)
+                pending -= done
+                
+                for task in done:
+                    document = task.result()
+                    if document:
+                        return document
+                
+                if not done:
+                    logging.info(f"No response within {self.hedge_delay}s, hedging with next model")
+                    launch()
+                else:
+                    # Failed attempts are replaced straight away, like the sequential fallback
+                    for _ in done:
+                        if len(pending) >= self.hedge_parallelism or not launch():
+                            break
+                if not pending:
+                    launch()
+            return None
+        finally:
+            # Cancelling a task closes its HTTP stream, which aborts the upstream generation
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _aattempt_model(self, model, prompt, target_word_count=None, progress=None, finalize=None):
+        """Call one model and return its BlogDocument, or None if it failed, was rejected or was cancelled"""
+        with span("model_attempt", MODEL_SECONDS, model=model) as labels:
+            result = await self._acall_model(model, prompt, target_word_count, progress, finalize)
+            if result is None:
+                labels["outcome"] = "failed"
+            return result
+    
+    async def _acall_model(self, model, prompt, target_word_count=None, progress=None, finalize=None):
+        """_aattempt_model without the timing span"""
+        if progress:
+            progress("generating", model)
+        if not self.model_health.begin(model):
+            logging.info(f"Skipping {model}: circuit breaker is open")
+            return None
+        try:
+            check("generating")
+            throttled = not await scheduler.aacquire(f"openrouter:model:{model}", self.model_max_wait)
+            if not throttled:
+                await scheduler.aacquire("openrouter:key")
+        except (asyncio.CancelledError, DeadlineExceeded):
+            self.model_health.release(model)
+            raise
+        if throttled:
+            logging.info(f"Skipping {model}: its rate limit quota is used up")
+            self.model_health.release(model)
+            return None
+        
+        started = time.monotonic()
+        try:
+            async with async_http_client.stream(
+                "POST",
+                OPENROUTER_URL,
+                headers=self._openrouter_headers(),
+                json=self._openrouter_payload(model, prompt, stream=self.early_abort),
+                read_timeout=budget(self.stall_timeout if self.early_abort else 60, "generating"),
+                total_timeout=time_left()
+            ) as response:
+                if not self._check_response(model, response):
+                    return None
+                
+                if self.early_abort:
+                    # Validate while streaming so a bad answer is dropped mid-generation
+                    validator = StreamValidator(prompt, target_word_count)
+                    async for delta in self._aiter_stream_deltas(response):
+                        validator.feed(delta)
+                    content = validator.text
+                else:
+                    content = json.loads(await response.aread())["choices"][0]["message"]["content"]
+            self._count_tokens(model, prompt, content)
             
-            # First line is title
-            if line_count == 0:
-                formatted += f'<h1 class="blog-title">{line}</h1>\n'
-                line_count += 1
-            # Second line is subtitle
-            elif line_count == 1:
-                formatted += f'<div class="blog-subtitle">{line}</div>\n'
-                line_count += 1
-            # Check for section headings (subheadings within content)
-            elif (line.startswith(('###', '##', '#')) or 
-                  (len(line.split()) <= 10 and ':' in line and any(keyword in line.lower() for keyword in 
-                   ['policies', 'technology', 'challenges', 'future', 'outlook', 'reforms', 'transformation', 'data', 'summary']))):
-                if current_para:
-                    formatted += f'<p>{" ".join(current_para)}</p>\n'
-                    current_para = []
-                clean_line = line.replace('###', '').replace('##', '').replace('#', '').strip()
-                formatted += f'<h2 class="section-heading">{clean_line}</h2>\n'
-            # Skip image lines
-            elif '<div style="text-align:center' in line or '<img' in line:
-                if current_para:
-                    formatted += f'<p>{" ".join(current_para)}</p>\n'
-                    current_para = []
-                continue
-            # Regular content
-            else:
-                current_para.append(line)
+            if finalize:
+                return finalize(model, content, time.monotonic() - started)
+            return self._finalize_content(model, content, prompt, time.monotonic() - started, progress)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            self.model_health.release(model)
+            raise
+        except StreamAborted as e:
+            remaining = time_left()
+            if remaining is not None and remaining < 1.0:
+                # A stall timeout the deadline shortened is not the model's fault either
+                self.model_health.release(model)
+                raise DeadlineExceeded(f"Deadline exceeded while waiting for {model}")
+            logging.warning(f"Aborted {model} mid-stream ({str(e)}), trying next model")
+            self.model_health.record_failure(model, VALIDATION_FAILED, time.monotonic() - started, str(e))
+            return None
+        except Exception as e:
+            remaining = time_left()
+            if remaining is not None and remaining < 1.0:
+                # A timeout cut short by the request's deadline says nothing about the model
+                self.model_health.release(model)
+                raise DeadlineExceeded(f"Deadline exceeded while waiting for {model}")
+            logging.error(f"Model {model} error: {str(e)}")
+            self.model_health.record_failure(model, ERROR, time.monotonic() - started, str(e))
+            return None
+    
+    def _openrouter_headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "HTTP-Referer": "http://localhost:5000",
+            "X-Title": "Blog Generation System",
+            "Content-Type": "application/json"
+        }
+    
+    def _openrouter_payload(self, model, prompt, stream=False):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": "You are a factual, structured blog generator. Write accurate, well-researched content."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.5
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def _post_openrouter(self, model, prompt, stream=False, read_timeout=None, total_timeout=None):
+        """Send a chat completion request; the body is always read lazily by the caller"""
+        return http_client.post(
+            OPENROUTER_URL,
+            headers=self._openrouter_headers(),
+            json=self._openrouter_payload(model, prompt, stream),
+            # A streamed read timeout is the gap between chunks, so it doubles as stall detection
+            read_timeout=read_timeout or (self.stall_timeout if stream else 60),
+            total_timeout=total_timeout,
+            stream=True
+        )
+    
+    def _check_response(self, model, response):
+        """Record non-200 responses against the model's health and report whether to continue"""
+        if response.status_code == 200:
+            return True
+        logging.warning(f"Model {model} failed: {response.status_code}")
+        if response.status_code == 429:
+            # Pause the model for every worker instead of letting each one find out with its own 429
+            scheduler.block(f"openrouter:model:{model}", parse_retry_after(response.headers.get("Retry-After")))
+        kind = RATE_LIMITED if response.status_code == 429 else HTTP_ERROR
+        self.model_health.record_failure(model, kind, detail=f"HTTP {response.status_code}")
+        return False
+    
+    def _count_tokens(self, model, prompt, content):
+        """Estimated, since streamed responses carry no usage block"""
+        TOKENS.inc(estimate_tokens(prompt), model=model, direction="in")
+        TOKENS.inc(estimate_tokens(content), model=model, direction="out")
+    
+    def _finalize_content(self, model, content, prompt, latency, progress=None):
+        """Clean, validate and parse raw model output into a BlogDocument; returns None if validation fails"""
+        # Clean up formatting
+        content = clean_model_output(content)
         
-        # Add any remaining paragraph
-        if current_para:
-            formatted += f'<p>{" ".join(current_para)}</p>\n'
+        # Validate content quality
+        with span("validation", model=model) as labels:
+            valid = self._validate_content(content, prompt)
+            if not valid:
+                labels["outcome"] = "rejected"
+        if valid:
+            self.model_health.record_success(model, latency)
+            if progress:
+                progress("formatting", model)
+            with span("formatting"):
+                document = parse_blog(content)
+            logging.info(f"Blog generated successfully using {model}")
+            return document
         
-        formatted += '</div>'
-        return formatted
+        logging.warning(f"Content validation failed for {model}, trying next model")
+        self.model_health.record_failure(model, VALIDATION_FAILED, latency)
+        return None
     
-    def _add_sources(self, content: str) -> str:
-        """Format and enhance sources section"""
-        import re
+    async def _agenerate_sections(self, topic, blog_prompt, research_context, intro_sentences, content_paragraphs, summary_sentences,
+                                  target_word_count, progress=None):
+        """Plan the blog in one short call, then write every body section concurrently; None if any part fails
+
+        Each section falls back through the models on its own, so a rejected section
+        is regenerated without redoing the others.
+        """
+        headings = section_headings(content_paragraphs)
+        plan = await self._agenerate_with_openrouter(
+            plan_prompt(topic, research_context, headings, intro_sentences, summary_sentences), topic, progress=progress,
+            finalize=lambda model, content, latency: self._finalize_part(model, parse_plan(clean_model_output(content), headings), latency, "plan")
+        )
+        if plan is None:
+            return None
         
-        # Extract sources section
-        sources_match = re.search(r'(===\s*SOURCES\s*===|Sources:|References:)(.*?)$', content, re.IGNORECASE | re.DOTALL)
+        # Intro and summary come from the plan, so the sections share the rest of the word target
+        words = self._section_word_target(target_word_count, len(headings))
+        logging.info(f"Writing {len(headings)} sections concurrently")
+        sections = await asyncio.gather(*[
+            self._agenerate_section(topic, research_context, plan, headings, index, words, progress)
+            for index in range(len(headings))
+        ])
+        if not all(sections):
+            return None
         
-        if sources_match:
-            sources_text = sources_match.group(2).strip()
-            # Extract only the main site names from URLs
-            sources = re.findall(r'(?:Source: )?([^-\n]+)', sources_text)
-            clean_sources = []
-            
-            for source in sources:
-                # Extract just the domain name
-                if '://' in source:
-                    domain = source.split('://')[1].split('/')[0]
-                    clean_sources.append(domain)
-                else:
-                    clean_sources.append(source.strip())
+        content = clean_model_output(stitch(plan, headings, sections))
+        if not self._validate_content(content, blog_prompt):
+            return None
+        if progress:
+            progress("formatting", "sections")
+        return parse_blog(content)
+    
+    def _section_word_target(self, target_word_count, sections):
+        return max(200, (target_word_count - 150) // sections)
+    
+    async def _agenerate_section(self, topic, research_context, plan, headings, index, words, progress=None):
+        """Body text of one section, falling back through the models on its own; None if every model failed"""
+        return await self._agenerate_with_openrouter(
+            section_prompt(topic, research_context, plan, headings, index, words), topic, words, progress,
+            finalize=lambda model, content, latency: self._finalize_part(model, self._clean_section(content, words), latency, "section")
+        )
+    
+    async def _agenerate_passage(self, topic, research_context, plan, headings, part, sentences, progress=None):
+        """A fresh intro or summary paragraph; None if every model failed"""
+        def finalize(model, content, latency):
+            passage = ' '.join(clean_model_output(content).split())
+            if 'lorem ipsum' in passage.lower() or '[insert' in passage.lower() or len(passage.split()) < 5 * sentences:
+                passage = None
+            return self._finalize_part(model, passage, latency, part)
+        
+        return await self._agenerate_with_openrouter(
+            passage_prompt(topic, research_context, plan, headings, part, sentences), topic, progress=progress, finalize=finalize
+        )
+    
+    async def _astore_generation(self, topic, sizes, context, document, parent_id=None):
+        """Keep the generation and its research for later revisions; sets document.generation_id"""
+        if generation_store is None:
+            return
+        try:
+            document.generation_id = await in_thread(generation_store.create, topic, sizes, context.research_data,
+                                                     document.to_dict(), parent_id)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not store generation for {topic}: {str(e)}")
+    
+    def revise_blog_result(self, generation_id: str, intro_sentences: int = None, content_paragraphs: int = None, summary_sentences: int = None,
+                           sections: list = None, progress=None, deadline: Deadline = None):
+        """Resize a stored generation or redo some of its parts, reusing its research and every unchanged part
+
+        Sizes left as None keep the stored generation's. sections names the parts to
+        rewrite even if they would otherwise be kept: section headings, "intro" or
+        "summary". Returns (blog_content, document) for a new generation; raises
+        GenerationNotFound for an unknown id and ValueError for unknown section names.
+        """
+        return run_sync(self.arevise_blog_result(generation_id, intro_sentences, content_paragraphs, summary_sentences, sections, progress, deadline))
+    
+    async def arevise_blog_result(self, generation_id: str, intro_sentences: int = None, content_paragraphs: int = None,
+                                  summary_sentences: int = None, sections: list = None, progress=None, deadline: Deadline = None):
+        """Async revise_blog_result"""
+        if generation_store is None:
+            raise GenerationNotFound("The generation store is disabled")
+        generation = await in_thread(generation_store.get, generation_id)
+        stored_intro, stored_content, stored_summary = generation["sizes"]
+        intro_sentences = intro_sentences or stored_intro
+        content_paragraphs = content_paragraphs or stored_content
+        summary_sentences = summary_sentences or stored_summary
+        
+        headings = section_headings(content_paragraphs)
+        redo = set(heading_key(name) for name in sections or [])
+        unknown = redo - {"intro", "summary"} - {heading_key(heading) for heading in headings}
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+        if not self.use_openrouter:
+            return "Error: Revising a blog needs an OpenRouter API key.", None
+        
+        if deadline is None:
+            blog_content, document = await self._arevise(generation, intro_sentences, content_paragraphs, summary_sentences, headings, redo, progress)
+        else:
+            current_deadline.set(deadline)
+            try:
+                blog_content, document = await asyncio.wait_for(
+                    self._arevise(generation, intro_sentences, content_paragraphs, summary_sentences, headings, redo, progress),
+                    deadline.remaining()
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("Deadline exceeded while revising")
+        # The revision is now the freshest blog for its topic and size
+        if blog_cache is not None and document is not None:
+            await in_thread(blog_cache.set, canonical_topic(generation["topic"]),
+                            blog_size_name(intro_sentences, content_paragraphs, summary_sentences), blog_content, document.to_dict())
+        return blog_content, document
+    
+    async def _arevise(self, generation, intro_sentences, content_paragraphs, summary_sentences, headings, redo, progress=None):
+        """Regenerate only the parts of a stored generation that change; the rest is kept verbatim"""
+        topic = generation["topic"]
+        context = ResearchContext(topic)
+        for item in generation["research"]:
+            context.add_research(item["source"], item["content"])
+        topic, blog_prompt, research_context = await self._aprepare_prompt(topic, intro_sentences, content_paragraphs, summary_sentences, context)
+        
+        stored_intro, _, stored_summary = generation["sizes"]
+        plan, old_headings, old_bodies = split_document(BlogDocument.from_dict(generation["document"]), stored_summary)
+        # Section angles are not stored; each rewritten section is steered by its heading
+        plan["angles"] = [''] * len(headings)
+        kept = {heading_key(heading): body for heading, body in zip(old_headings, old_bodies)}
+        words = self._section_word_target(self._get_target_word_count(intro_sentences, content_paragraphs, summary_sentences), len(headings))
+        
+        rewrites = {}
+        for index, heading in enumerate(headings):
+            key = heading_key(heading)
+            if key in redo or not kept.get(key):
+                rewrites[heading] = self._agenerate_section(topic, research_context, plan, headings, index, words, progress)
+        if "intro" in redo or intro_sentences != stored_intro or not plan["intro"]:
+            rewrites["intro"] = self._agenerate_passage(topic, research_context, plan, headings, "intro", intro_sentences, progress)
+        if "summary" in redo or summary_sentences != stored_summary or not plan["summary"]:
+            rewrites["summary"] = self._agenerate_passage(topic, research_context, plan, headings, "summary", summary_sentences, progress)
+        
+        logging.info(f"Revising generation {generation['id']}: rewriting {', '.join(rewrites) or 'nothing'}, "
+                     f"keeping {len(headings) - len(set(rewrites) & set(headings))} sections")
+        parts = dict(zip(rewrites, await asyncio.gather(*rewrites.values())))
+        if not all(parts.values()):
+            return ALL_MODELS_FAILED, None
+        
+        plan = dict(plan, intro=parts.get("intro", plan["intro"]), summary=parts.get("summary", plan["summary"]))
+        bodies = [parts.get(heading) or kept[heading_key(heading)] for heading in headings]
+        content = clean_model_output(stitch(plan, headings, bodies))
+        if not self._validate_content(content, blog_prompt):
+            logging.warning(f"Revision of generation {generation['id']} failed validation")
+            return ALL_MODELS_FAILED, None
+        if progress:
+            progress("formatting", "revision")
+        document = parse_blog(content)
+        await self._astore_generation(topic, (intro_sentences, content_paragraphs, summary_sentences), context, document, generation["id"])
+        return document.to_html(), document
+    
+    def _clean_section(self, content, words):
+        """Section text without a repeated heading, or None if it is too short or has placeholder text"""
+        lines = clean_model_output(content).split('\n')
+        # Models often restate the heading they were given despite being asked not to
+        if lines and (lines[0].startswith('#') or (lines[0].rstrip().endswith(':') and len(lines[0].split()) <= 10)):
+            lines = lines[1:]
+        body = '\n'.join(lines).strip()
+        lowered = body.lower()
+        if 'lorem ipsum' in lowered or '[insert' in lowered or len(body.split()) < words * self.section_min_word_ratio:
+            return None
+        return body
+    
+    def _finalize_part(self, model, part, latency, kind):
+        """Record a plan or section attempt against the model's health and pass the part through"""
+        if part:
+            self.model_health.record_success(model, latency)
+            return part
+        logging.warning(f"{kind.capitalize()} from {model} was rejected, trying next model")
+        self.model_health.record_failure(model, VALIDATION_FAILED, latency)
+        return None
+    
+    def generate_blog_stream(self, topic: str, intro_sentences: int = 3, content_paragraphs: int = 4, summary_sentences: int = 2,
+                             context: ResearchContext = None, deadline: Deadline = None):
+        """Generate a blog, yielding (event, payload) pairs as research and each HTML block complete
+
+        The finished blog is written to the blog cache; reading it is left to the caller, which can answer without streaming.
+        """
+        yield "status", {"stage": "researching"}
+        topic, blog_prompt, research_context = self._prepare_prompt(topic, intro_sentences, content_paragraphs, summary_sentences, context, deadline)
+        target_word_count = self._get_target_word_count(intro_sentences, content_paragraphs, summary_sentences)
+        
+        for model in self.model_health.order(self.models):
+            if deadline is not None:
+                deadline.check("generating")
+            if not self.model_health.begin(model):
+                continue
+            if not scheduler.acquire(f"openrouter:model:{model}", self.model_max_wait):
+                logging.info(f"Skipping {model}: its rate limit quota is used up")
+                self.model_health.release(model)
+                continue
+            if not scheduler.acquire("openrouter:key", deadline.remaining() if deadline is not None else None):
+                self.model_health.release(model)
+                raise DeadlineExceeded("Deadline exceeded waiting for OpenRouter quota")
             
-            # Format sources nicely
-            formatted_sources = "\n\n---\n\nSources & References:\n\n"
-            for source in clean_sources:
-                formatted_sources += f"• {source}\n"
+            yield "status", {"stage": "generating", "model": model}
+            renderer = IncrementalBlogRenderer()
+            validator = StreamValidator(blog_prompt, target_word_count)
+            emitted = False
+            started = time.monotonic()
+            try:
+                read_timeout = deadline.budget(self.stall_timeout, "generating") if deadline is not None else None
+                total_timeout = deadline.remaining() if deadline is not None else None
+                with self._post_openrouter(model, blog_prompt, stream=True, read_timeout=read_timeout,
+                                           total_timeout=total_timeout) as response:
+                    if not self._check_response(model, response):
+                        continue
+                    
+                    for delta in self._iter_stream_deltas(response, deadline):
+                        validator.feed(delta)
+                        for fragment in renderer.feed(delta):
+                            emitted = True
+                            yield "section", {"html": fragment}
+                
+                document = self._finalize_content(model, validator.text, blog_prompt, time.monotonic() - started)
+            except DeadlineExceeded:
+                # Leaving the with block closed the response; the request's time ran out, not the model
+                self.model_health.release(model)
+                raise
+            except StreamAborted as e:
+                logging.warning(f"Aborted {model} mid-stream ({str(e)}), trying next model")
+                self.model_health.record_failure(model, VALIDATION_FAILED, time.monotonic() - started, str(e))
+                document = None
+            except GeneratorExit:
+                # The client went away mid-stream; free the model's probe slot before unwinding
+                self.model_health.release(model)
+                raise
+            except Exception as e:
+                if deadline is not None and deadline.remaining() < 1.0:
+                    self.model_health.release(model)
+                    raise DeadlineExceeded(f"Deadline exceeded while waiting for {model}")
+                logging.error(f"Model {model} error: {str(e)}")
+                self.model_health.record_failure(model, ERROR, time.monotonic() - started, str(e))
+                document = None
+            # Spans cannot wrap a generator's yields, so the attempt is recorded by hand
+            MODEL_SECONDS.observe(time.monotonic() - started, model=model, outcome="ok" if document else "failed")
+            self._count_tokens(model, blog_prompt, validator.text)
             
-            content = content[:sources_match.start()] + formatted_sources
-        else:
-            # Add placeholder if no sources found
-            content += "\n\n---\n\nSources & References:\n\nBased on research data from Wikipedia and web sources."
+            if document:
+                for fragment in renderer.finish():
+                    yield "section", {"html": fragment}
+                if blog_cache is not None:
+                    blog_cache.set(canonical_topic(topic), blog_size_name(intro_sentences, content_paragraphs, summary_sentences),
+                                   document.to_html(), document.to_dict())
+                yield "done", {"blog_content": document.to_html(), "document": document.to_dict(), "topic": topic, "model": model}
+                return
+            if emitted:
+                # Tell the client to discard the preview from the rejected model
+                yield "reset", {"model": model}
         
-        return content
+        logging.error("All models failed")
+        yield "error", {"error": ALL_MODELS_FAILED[len("Error: "):]}
     
+    def _iter_stream_deltas(self, response, deadline: Deadline = None):
+        """Yield content deltas from an OpenRouter server-sent event stream
 
+        The deadline is checked on every line, so a model that keeps streaming cannot
+        hold the request past it; a read timeout shortened by the deadline is reported
+        as DeadlineExceeded rather than a stall.
+        """
+        # SSE is always UTF-8, but requests would otherwise assume ISO-8859-1 for text/* responses
+        response.encoding = 'utf-8'
+        last_delta = time.monotonic()
+        lines = response.iter_lines(decode_unicode=True)
+        while True:
+            try:
+                raw_line = next(lines)
+            except StopIteration:
+                return
+            except requests.exceptions.RequestException as e:
+                if deadline is not None and deadline.remaining() < 1.0:
+                    raise DeadlineExceeded("Deadline exceeded while streaming")
+                raise StreamAborted(f"stream stalled: {str(e)}")
+            
+            if deadline is not None and deadline.remaining() <= 0:
+                raise DeadlineExceeded("Deadline exceeded while streaming")
+            # Keep-alive comments reset the socket timeout but are not progress
+            if time.monotonic() - last_delta > self.stall_timeout:
+                raise StreamAborted(f"no content for {self.stall_timeout}s")
+            delta = self._parse_stream_line(raw_line)
+            if delta is self.STREAM_DONE:
+                return
+            if delta:
+                last_delta = time.monotonic()
+                yield delta
+    
+    async def _aiter_stream_deltas(self, response):
+        """Async _iter_stream_deltas for httpx responses, under the current request's deadline"""
+        last_delta = time.monotonic()
+        lines = response.aiter_lines()
+        while True:
+            try:
+                raw_line = await lines.__anext__()
+            except StopAsyncIteration:
+                return
+            except httpx.TransportError as e:
+                raise StreamAborted(f"stream stalled: {str(e)}")
+            
+            check("streaming")
+            if time.monotonic() - last_delta > self.stall_timeout:
+                raise StreamAborted(f"no content for {self.stall_timeout}s")
+            delta = self._parse_stream_line(raw_line)
+            if delta is self.STREAM_DONE:
+                return
+            if delta:
+                last_delta = time.monotonic()
+                yield delta
+    
+    STREAM_DONE = object()
+    
+    def _parse_stream_line(self, raw_line):
+        """Return the content delta carried by one SSE line, None if it has none, or STREAM_DONE"""
+        # Blank lines separate events and ':' lines are keep-alive comments
+        if not raw_line or not raw_line.startswith('data:'):
+            return None
+        data = raw_line[len('data:'):].strip()
+        if data == '[DONE]':
+            return self.STREAM_DONE
+        event = json.loads(data)
+        if 'error' in event:
+            raise Exception(event['error'].get('message', 'stream error'))
+        choices = event.get('choices') or [{}]
+        return choices[0].get('delta', {}).get('content')
+    
+    def _format_blog_html(self, content):
+        """Format the blog content with proper HTML structure, styling and a sources section"""
+        return render_blog_html(content)
     
     def _validate_content(self, content: str, prompt: str) -> bool:
         """Validate generated content for quality and relevance"""
@@ -454,5 +1037,5 @@ Write the blog now:
 """
     
     def clear_memory(self):
-        """Clear the agent's memory"""
-        self.memory.clear()
\ No newline at end of file
+        """Kept for backward compatibility; research now lives in a per-request ResearchContext"""
+        pass
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class BackgroundLoop:
+    """A process-wide event loop on a daemon thread that sync callers submit coroutines to
+
+    Keeping one long-lived loop (instead of asyncio.run per call) lets the async
+    HTTP client hold its keep-alive connections across sync requests.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="blog-agent-loop", daemon=True)
+                thread.start()
+                self.loop = loop
+            return self.loop
+
+    def run(self, coro):
+        """Run a coroutine to completion from synchronous code and return its result"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coro.close()
+            raise RuntimeError("Blocking wrapper called from async code; await the async API instead")
+
+        loop = self._ensure_loop()
+        # Carry the caller's context variables into the task, as asyncio.run would
+        context = contextvars.copy_context()
+        result = Future()
+
+        def start():
+            task = context.run(loop.create_task, coro)
+
+            def finished(task):
+                if task.cancelled():
+                    result.cancel()
+                elif task.exception() is not None:
+                    result.set_exception(task.exception())
+                else:
+                    result.set_result(task.result())
+
+            task.add_done_callback(finished)
+
+        loop.call_soon_threadsafe(start)
+        return result.result()
+
+
+background_loop = BackgroundLoop()
+
+
+def run_sync(coro):
+    """Blocking entry point used by the sync wrappers around the async pipeline"""
+    return background_loop.run(coro)
+
+
+async def in_thread(fn, *args):
+    """Run a blocking call in the default executor, keeping context variables"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, fn, *args))
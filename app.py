@@ -1,7 +1,23 @@
-from flask import Flask, render_template, request, jsonify
-from agent import BlogAgent
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
+from agent import BlogAgent, BLOG_SIZES
+from jobs import JobManager, JobQueueFull
+from batch import BatchRunner
+from canonical import canonical_topic
+from singleflight import SingleFlight
+from http_client import http_client, async_http_client
 from output import OutputManager
+from formatter import BlogDocument
+from research_index import research_index
+from cache import blog_cache, research_cache
+from telemetry import registry, start_trace, finish_trace, REQUEST_SECONDS
+from profiling import profiler
+from generations import GenerationNotFound
+from tools import search_racer
+from ratelimit import scheduler
+from deadline import Deadline, DeadlineExceeded, AdmissionRejected, admission
 import os
+import json
+import time
 import logging
 
 # Configure logging
@@ -17,6 +33,107 @@ except Exception as e:
     logger.error(f"Failed to initialize BlogAgent: {str(e)}")
     agent = None
 
+job_manager = JobManager(agent) if agent else None
+
+# Identical (topic, size) requests arriving together share one generation
+coalescer = SingleFlight()
+
+# Upper bound on the concurrency a /generate/batch client may ask for
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Upper bound on the results one /search request may ask for
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+
+# Time budget for an interactive generation when the client does not send one
+GENERATE_DEADLINE = float(os.getenv("GENERATE_DEADLINE", "120"))
+
+def deadline_seconds(data, default):
+    """The request's optional 'deadline' in seconds, else default; ValueError unless it is a positive number"""
+    seconds = float(data.get('deadline') or default)
+    if not seconds > 0:
+        raise ValueError(f"deadline must be positive, got {seconds}")
+    return seconds
+
+def request_deadline(data):
+    """Deadline from the request's optional 'deadline' (seconds), else the server default"""
+    return Deadline(deadline_seconds(data, GENERATE_DEADLINE))
+
+def busy_response(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+    return response, 503
+
+def run_admitted(deadline, generate):
+    """Run one generation under admission control; successful runs teach it how long generations take"""
+    admission.admit(deadline)
+    started = time.monotonic()
+    duration = None
+    try:
+        result = generate()
+        if not result[0].startswith("Error:"):
+            duration = time.monotonic() - started
+        return result
+    finally:
+        admission.release(duration)
+
+# Endpoints that can be profiled with the admin token or PROFILE_SAMPLE_PERCENT
+PROFILED_ENDPOINTS = {'generate_blog', 'generate_blog_stream', 'revise_generation', 'generate_batch'}
+
+@app.before_request
+def begin_trace():
+    g.trace, g.trace_token = start_trace(request.headers.get('X-Trace-Id'))
+    if request.endpoint in PROFILED_ENDPOINTS and profiler.wanted(request.headers.get('X-Profile-Token')):
+        g.profile = profiler.start(f"{request.endpoint}-{g.trace.trace_id}")
+
+@app.after_request
+def tag_response(response):
+    response.headers['X-Trace-Id'] = g.trace.trace_id
+    if g.get('profile'):
+        response.headers['X-Profile'] = g.profile.name
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(g.trace.duration(), endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.teardown_request
+def end_trace(error=None):
+    # Streamed responses tear down after the last chunk, so the profile covers the whole generation
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.stop(profile)
+    trace = g.pop('trace', None)
+    if trace is not None:
+        finish_trace(trace, g.trace_token)
+
+def register_gauges():
+    """Gauges read from their owners at scrape time"""
+    registry.gauge('blog_admission_in_flight', 'Generations admitted and still running', lambda: admission.stats()['in_flight'])
+    registry.gauge('blog_admission_typical_seconds', 'Typical generation time used by admission control',
+                   lambda: admission.stats()['typical_duration'])
+    registry.gauge('blog_job_queue_depth', 'Jobs queued or running in this process', lambda: job_manager.depth() if job_manager else 0)
+    registry.gauge('blog_coalescing_in_flight', 'Distinct generations being shared by coalesced requests',
+                   lambda: coalescer.stats()['in_flight'])
+    registry.gauge('blog_rate_limit_waiting', 'Callers queued for a rate limit token',
+                   lambda: {(key, priority): count for key, waiting in scheduler.snapshot().items() for priority, count in waiting.items()},
+                   ('bucket', 'priority'))
+    
+    def cache_stats():
+        caches = {'research': research_cache, 'blog': blog_cache}
+        return {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    
+    registry.gauge('blog_cache_hit_ratio', 'Cache hits per lookup, across every process sharing the cache',
+                   lambda: {(name,): round(stats['hit_rate'], 4) for name, stats in cache_stats().items()}, ('cache',))
+    registry.gauge('blog_cache_lookups', 'Cache lookups by result, across every process sharing the cache',
+                   lambda: {(name, result): stats[result] for name, stats in cache_stats().items() for result in ('hits', 'misses')},
+                   ('cache', 'result'))
+    if agent:
+        registry.gauge('blog_model_success_ratio', 'Share of attempts per model that produced a usable blog',
+                       lambda: {(model,): stats['success_rate'] for model, stats in agent.model_health.snapshot().items()}, ('model',))
+        registry.gauge('blog_model_latency_seconds', 'Moving average latency per model',
+                       lambda: {(model,): round(stats['ewma_latency'] or 0.0, 4) for model, stats in agent.model_health.snapshot().items()},
+                       ('model',))
+
+register_gauges()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -34,36 +151,356 @@ def generate_blog():
             return jsonify({'error': 'Topic is required'}), 400
         
         blog_size = data.get('blog_size', 'medium')
-        size_map = {
-            'small': {'intro': 2, 'content': 3, 'summary': 1},
-            'medium': {'intro': 3, 'content': 4, 'summary': 2},
-            'large': {'intro': 4, 'content': 6, 'summary': 3}
-        }
-        sizes = size_map.get(blog_size, size_map['medium'])
+        sizes = BLOG_SIZES.get(blog_size, BLOG_SIZES['medium'])
         intro_sentences = sizes['intro']
         content_paragraphs = sizes['content']
         summary_sentences = sizes['summary']
+        try:
+            deadline = request_deadline(data)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'deadline must be a number of seconds'}), 400
+        force_refresh = bool(data.get('force_refresh'))
         
         # Generate blog
         logger.info(f"Generating blog for topic: {topic}, size: {blog_size}")
-        blog_content = agent.generate_blog(
-            topic=topic,
-            intro_sentences=intro_sentences,
-            content_paragraphs=content_paragraphs,
-            summary_sentences=summary_sentences
+        # A refresh must not be answered by a caller that is reading the cache
+        key = (canonical_topic(topic), blog_size if blog_size in BLOG_SIZES else 'medium', force_refresh)
+        
+        def generate():
+            # A cached blog needs no slot, and its near-zero time must not teach admission control anything
+            cached = None if force_refresh else agent.cached_blog_result(topic, intro_sentences, content_paragraphs, summary_sentences)
+            if cached:
+                return cached
+            # Only the caller that actually generates is admitted; coalesced callers add no work
+            return run_admitted(deadline, lambda: agent.generate_blog_result(
+                topic=topic,
+                intro_sentences=intro_sentences,
+                content_paragraphs=content_paragraphs,
+                summary_sentences=summary_sentences,
+                deadline=deadline,
+                # The cache was already checked above
+                force_refresh=True
+            ))
+        
+        (blog_content, document), coalesced = coalescer.do(
+            key, generate, cacheable=lambda result: not result[0].startswith("Error:")
         )
+        if coalesced:
+            logger.info(f"Served coalesced result for topic: {topic}, size: {blog_size}")
         
         return jsonify({
             'success': True,
             'blog_content': blog_content,
+            'document': document.to_dict() if document else None,
+            'generation_id': document.generation_id if document else None,
             'topic': topic,
-            'blog_size': blog_size
+            'blog_size': blog_size,
+            'coalesced': coalesced
         })
         
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected generation for topic: {topic} ({str(e)})")
+        return busy_response(e)
+    except DeadlineExceeded as e:
+        logger.warning(f"Generation for topic: {topic} ran out of time: {str(e)}")
+        return jsonify({'error': f'The blog could not be generated within the deadline: {str(e)}'}), 504
     except Exception as e:
         logger.error(f"Error generating blog: {str(e)}", exc_info=True)
         return jsonify({'error': f'An error occurred while generating the blog: {str(e)}'}), 500
 
+@app.route('/generations/<generation_id>/revise', methods=['POST'])
+def revise_generation(generation_id):
+    if not agent:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    data = request.json or {}
+    blog_size = data.get('blog_size')
+    if blog_size is not None and blog_size not in BLOG_SIZES:
+        return jsonify({'error': f'blog_size must be one of {", ".join(BLOG_SIZES)}'}), 400
+    sizes = BLOG_SIZES.get(blog_size, {})
+    sections = data.get('sections') or []
+    if not isinstance(sections, list):
+        return jsonify({'error': 'sections must be a list of section headings, "intro" or "summary"'}), 400
+    if not blog_size and not sections:
+        return jsonify({'error': 'Give a new blog_size, sections to regenerate, or both'}), 400
+    try:
+        deadline = request_deadline(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'deadline must be a number of seconds'}), 400
+    
+    try:
+        logger.info(f"Revising generation {generation_id}: size {blog_size or 'unchanged'}, sections {sections}")
+        blog_content, document = run_admitted(deadline, lambda: agent.revise_blog_result(
+            generation_id,
+            intro_sentences=sizes.get('intro'),
+            content_paragraphs=sizes.get('content'),
+            summary_sentences=sizes.get('summary'),
+            sections=sections,
+            deadline=deadline
+        ))
+    except GenerationNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except DeadlineExceeded as e:
+        logger.warning(f"Revision of generation {generation_id} ran out of time: {str(e)}")
+        return jsonify({'error': f'The blog could not be revised within the deadline: {str(e)}'}), 504
+    except Exception as e:
+        logger.error(f"Error revising blog: {str(e)}", exc_info=True)
+        return jsonify({'error': f'An error occurred while revising the blog: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'blog_content': blog_content,
+        'document': document.to_dict() if document else None,
+        'generation_id': document.generation_id if document else None,
+        'parent_id': generation_id
+    })
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_blog_stream():
+    if not agent:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    data = request.json
+    topic = data.get('topic', '').strip()
+    
+    if not topic:
+        return jsonify({'error': 'Topic is required'}), 400
+    
+    blog_size = data.get('blog_size', 'medium')
+    sizes = BLOG_SIZES.get(blog_size, BLOG_SIZES['medium'])
+    try:
+        deadline = request_deadline(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'deadline must be a number of seconds'}), 400
+    
+    # A cached blog is sent as a single done event, without research, a model call or an admission slot
+    cached = None if data.get('force_refresh') else agent.cached_blog_result(topic, sizes['intro'], sizes['content'], sizes['summary'])
+    if cached:
+        blog_content, document = cached
+        payload = {'blog_content': blog_content, 'document': document.to_dict(), 'topic': topic, 'model': None,
+                   'success': True, 'blog_size': blog_size, 'cached': True}
+        return Response(f"event: done\ndata: {json.dumps(payload)}\n\n", mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    try:
+        admission.admit(deadline)
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    outcome = {'duration': None}
+    
+    def events():
+        logger.info(f"Streaming blog for topic: {topic}, size: {blog_size}")
+        started = time.monotonic()
+        try:
+            for event, payload in agent.generate_blog_stream(
+                topic=topic,
+                intro_sentences=sizes['intro'],
+                content_paragraphs=sizes['content'],
+                summary_sentences=sizes['summary'],
+                deadline=deadline
+            ):
+                if event == 'done':
+                    outcome['duration'] = time.monotonic() - started
+                    payload = dict(payload, success=True, blog_size=blog_size)
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except DeadlineExceeded as e:
+            logger.warning(f"Streaming blog for topic: {topic} ran out of time: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': f'The blog could not be generated within the deadline: {str(e)}'})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming blog: {str(e)}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'error': f'An error occurred while generating the blog: {str(e)}'})}\n\n"
+    
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs even if the client disconnects before the stream starts
+    response.call_on_close(lambda: admission.release(outcome['duration']))
+    return response
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    if not agent:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    data = request.json
+    items = data.get('items', [])
+    
+    if not items or not isinstance(items, list):
+        return jsonify({'error': 'items must be a non-empty list of {"topic", "blog_size"} objects'}), 400
+    
+    try:
+        concurrency = int(data['concurrency']) if data.get('concurrency') else None
+        rate_per_minute = float(data['rate_per_minute']) if data.get('rate_per_minute') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency and rate_per_minute must be numbers'}), 400
+    if (concurrency is not None and concurrency < 1) or (rate_per_minute is not None and not rate_per_minute > 0):
+        return jsonify({'error': 'concurrency and rate_per_minute must be positive'}), 400
+    
+    # The client may ask for less parallelism than the server allows, never more
+    if concurrency is not None:
+        concurrency = min(concurrency, BATCH_MAX_CONCURRENCY)
+    runner = BatchRunner(agent, concurrency, rate_per_minute, bool(data.get('force_refresh')))
+    
+    def results():
+        # One JSON object per line, written as each generation finishes
+        for record in runner.run(items):
+            yield json.dumps(record) + "\n"
+    
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson')
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    if not job_manager:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    data = request.json
+    topic = data.get('topic', '').strip()
+    
+    if not topic:
+        return jsonify({'error': 'Topic is required'}), 400
+    
+    blog_size = data.get('blog_size', 'medium')
+    sizes = BLOG_SIZES.get(blog_size, BLOG_SIZES['medium'])
+    try:
+        deadline = deadline_seconds(data, job_manager.deadline)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'deadline must be a number of seconds'}), 400
+    
+    try:
+        job_id = job_manager.submit({
+            'topic': topic,
+            'blog_size': blog_size,
+            'intro_sentences': sizes['intro'],
+            'content_paragraphs': sizes['content'],
+            'summary_sentences': sizes['summary'],
+            'force_refresh': bool(data.get('force_refresh'))
+        }, deadline=deadline)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    if not job_manager:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = {
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'detail': job['detail'],
+        'topic': job['params']['topic'],
+        'blog_size': job['params']['blog_size'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['result'] is not None:
+        response['blog_content'] = job['result']
+        response['document'] = job['document']
+        # ?format=markdown|text re-renders the stored document instead of returning HTML
+        format_type = request.args.get('format')
+        if format_type and job['document']:
+            try:
+                response['blog_content'] = BlogDocument.from_dict(job['document']).render(format_type)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            response['format'] = format_type
+    if job['error'] is not None:
+        response['error'] = job['error']
+    return jsonify(response)
+
+@app.route('/coalescing/stats', methods=['GET'])
+def coalescing_stats():
+    return jsonify({'success': True, 'coalescing': coalescer.stats()})
+
+@app.route('/search', methods=['GET'])
+def search_index():
+    if research_index is None:
+        return jsonify({'error': 'The research index is disabled'}), 503
+    
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'q is required'}), 400
+    
+    kind = request.args.get('kind')
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'limit must be a whole number'}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    return jsonify({'success': True, 'results': research_index.search(text, kind, limit)})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if blog_cache is None:
+        return jsonify({'error': 'The blog cache is disabled'}), 503
+    
+    return jsonify({'success': True, 'blogs': blog_cache.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/http/stats', methods=['GET'])
+def http_stats():
+    return jsonify({'success': True, 'hosts': http_client.stats(), 'async_hosts': async_http_client.stats()})
+
+@app.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    return jsonify({'success': True, 'admission': admission.stats()})
+
+@app.route('/ratelimit/stats', methods=['GET'])
+def ratelimit_stats():
+    return jsonify({'success': True, 'waiting': scheduler.snapshot()})
+
+@app.route('/search/engines', methods=['GET'])
+def search_engines():
+    return jsonify({'success': True, 'mode': search_racer.mode, 'engines': search_racer.snapshot()})
+
+@app.route('/models/health', methods=['GET'])
+def model_health():
+    if not agent:
+        return jsonify({'error': 'Blog generation service is not available. Please check server logs.'}), 503
+    
+    return jsonify({
+        'success': True,
+        'candidate_order': agent.model_health.order(agent.models),
+        'models': agent.model_health.snapshot()
+    })
+
+@app.route('/render', methods=['POST'])
+def render_document():
+    data = request.json
+    if not data.get('document'):
+        return jsonify({'error': 'document is required'}), 400
+    
+    format_type = data.get('format', 'markdown')
+    try:
+        content = BlogDocument.from_dict(data['document']).render(format_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (KeyError, TypeError, IndexError):
+        return jsonify({'error': 'document is malformed'}), 400
+    
+    return jsonify({'success': True, 'format': format_type, 'content': content})
+
 @app.route('/save', methods=['POST'])
 def save_blog():
     try:
@@ -71,11 +508,13 @@ def save_blog():
         blog_content = data.get('blog_content', '')
         topic = data.get('topic', '')
         format_type = data.get('format', 'markdown')
+        # With the parsed document the file gets real Markdown/text instead of the HTML
+        document = BlogDocument.from_dict(data['document']) if data.get('document') else None
         
         if format_type == 'text':
-            filepath = OutputManager.save_to_text(blog_content, topic)
+            filepath = OutputManager.save_to_text(blog_content, topic, document=document)
         else:
-            filepath = OutputManager.save_to_markdown(blog_content, topic)
+            filepath = OutputManager.save_to_markdown(blog_content, topic, document=document)
         
         return jsonify({
             'success': True,
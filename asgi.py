@@ -0,0 +1,193 @@
+"""
+ASGI entry point: POST /generate runs on the async pipeline, so one worker
+holds many in-flight generations without a thread each. Every other route is
+the Flask app, served through asgiref's WsgiToAsgi.
+
+Usage: uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import json
+import time
+import asyncio
+import logging
+from app import app as flask_app, agent, request_deadline
+from deadline import DeadlineExceeded, AdmissionRejected, admission
+from agent import BLOG_SIZES
+from aio import in_thread
+from canonical import canonical_topic
+from telemetry import registry, start_trace, finish_trace, trace_id, REQUEST_SECONDS
+from profiling import profiler
+from asgiref.wsgi import WsgiToAsgi
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+logger = logging.getLogger(__name__)
+
+# Identical (topic, size) requests arriving together share one generation task
+in_flight = {}
+registry.gauge('blog_asgi_in_flight', 'Distinct generation tasks running on the ASGI event loop', lambda: len(in_flight))
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_json(send, status: int, payload: dict, headers: list = None):
+    body = json.dumps(payload).encode("utf-8")
+    await send_body(send, status, body, b"application/json", headers)
+
+
+async def send_body(send, status: int, body: bytes, content_type: bytes, headers: list = None):
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())] + (headers or [])
+    if trace_id():
+        headers.append((b"x-trace-id", trace_id().encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def traced(handler, scope, receive, send):
+    """Run handler under a trace whose id is returned in X-Trace-Id, timing it into the request histogram
+
+    An X-Profile-Token header matching PROFILE_ADMIN_TOKEN profiles the request.
+    """
+    headers = dict(scope["headers"])
+    trace, token = start_trace(headers.get(b"x-trace-id", b"").decode("latin-1") or None)
+    profile_token = headers.get(b"x-profile-token", b"").decode("latin-1")
+    profile = profiler.start(f"asgi-generate-{trace.trace_id}") if profiler.wanted(profile_token) else None
+    status = {}
+
+    async def send_recording(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+            if profile is not None:
+                message = dict(message, headers=list(message["headers"]) + [(b"x-profile", profile.name.encode())])
+        await send(message)
+
+    try:
+        return await handler(receive, send_recording)
+    finally:
+        if profile is not None:
+            profiler.stop(profile)
+        REQUEST_SECONDS.observe(trace.duration(), endpoint=scope["path"], status=status.get("code", 500))
+        finish_trace(trace, token)
+
+
+async def generate(receive, send):
+    if not agent:
+        return await send_json(send, 503, {'error': 'Blog generation service is not available. Please check server logs.'})
+
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+    except ValueError:
+        return await send_json(send, 400, {'error': 'Request body must be JSON'})
+    if not isinstance(data, dict):
+        return await send_json(send, 400, {'error': 'Request body must be a JSON object'})
+
+    topic = data.get('topic')
+    if not isinstance(topic, str) or not topic.strip():
+        return await send_json(send, 400, {'error': 'Topic is required'})
+    topic = topic.strip()
+
+    blog_size = data.get('blog_size', 'medium')
+    if not isinstance(blog_size, str):
+        blog_size = 'medium'
+    sizes = BLOG_SIZES.get(blog_size, BLOG_SIZES['medium'])
+    try:
+        deadline = request_deadline(data)
+    except (TypeError, ValueError):
+        return await send_json(send, 400, {'error': 'deadline must be a number of seconds'})
+
+    logger.info(f"Generating blog for topic: {topic}, size: {blog_size}")
+    force_refresh = bool(data.get('force_refresh'))
+    # A refresh must not be answered by a caller that is reading the cache
+    key = (canonical_topic(topic), blog_size if blog_size in BLOG_SIZES else 'medium', force_refresh)
+    task = in_flight.get(key)
+    if task is None and not force_refresh:
+        # A cached blog needs no admission slot, and its near-zero time must not teach admission control anything
+        cached = await in_thread(agent.cached_blog_result, topic, sizes['intro'], sizes['content'], sizes['summary'])
+        if cached:
+            blog_content, document = cached
+            return await send_json(send, 200, {
+                'success': True,
+                'blog_content': blog_content,
+                'document': document.to_dict(),
+                'generation_id': document.generation_id,
+                'topic': topic,
+                'blog_size': blog_size,
+                'coalesced': False
+            })
+        task = in_flight.get(key)
+    coalesced = task is not None
+    if not coalesced:
+        # Only a request that starts a generation is admitted; coalesced ones add no work
+        try:
+            admission.admit(deadline)
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected generation for topic: {topic} ({str(e)})")
+            return await send_json(send, 503, {'error': str(e)}, [(b"retry-after", str(int(e.retry_after) + 1).encode())])
+        started = time.monotonic()
+        task = in_flight[key] = asyncio.ensure_future(agent.agenerate_blog_result(
+            topic=topic,
+            intro_sentences=sizes['intro'],
+            content_paragraphs=sizes['content'],
+            summary_sentences=sizes['summary'],
+            deadline=deadline,
+            # The cache was already checked above
+            force_refresh=True
+        ))
+
+        def finished(done):
+            in_flight.pop(key, None)
+            succeeded = not done.cancelled() and done.exception() is None and not done.result()[0].startswith("Error:")
+            admission.release(time.monotonic() - started if succeeded else None)
+
+        task.add_done_callback(finished)
+
+    try:
+        # shield() keeps one client disconnecting from cancelling the generation others share
+        blog_content, document = await asyncio.shield(task)
+    except DeadlineExceeded as e:
+        logger.warning(f"Generation for topic: {topic} ran out of time: {str(e)}")
+        return await send_json(send, 504, {'error': f'The blog could not be generated within the deadline: {str(e)}'})
+    except Exception as e:
+        logger.error(f"Error generating blog: {str(e)}", exc_info=True)
+        return await send_json(send, 500, {'error': f'An error occurred while generating the blog: {str(e)}'})
+
+    await send_json(send, 200, {
+        'success': True,
+        'blog_content': blog_content,
+        'document': document.to_dict() if document else None,
+        'generation_id': document.generation_id if document else None,
+        'topic': topic,
+        'blog_size': blog_size,
+        'coalesced': coalesced
+    })
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http":
+        if scope["path"] == "/generate" and scope["method"] == "POST":
+            return await traced(generate, scope, receive, send)
+        if scope["path"] == "/metrics":
+            return await send_body(send, 200, registry.render().encode("utf-8"), b"text/plain; version=0.0.4")
+        if scope["path"] == "/health":
+            return await send_json(send, 200, {'status': 'ok', 'in_flight': len(in_flight), 'admission': admission.stats()})
+        return await wsgi_app(scope, receive, send)
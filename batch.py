@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Batch blog generation: dedupes topics, shares research between them and
+streams results to JSONL as they finish. Re-running with the same output
+file resumes from where the last run stopped.
+
+Usage: python batch.py topics.jsonl results.jsonl [--concurrency 4] [--rate 20]
+Each input line looks like {"topic": "AI in Finance", "blog_size": "medium", "id": "optional"}
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from agent import BLOG_SIZES
+from ratelimit import TokenBucket, scheduler, request_priority, BATCH
+from canonical import canonical_topic
+from profiling import profiler
+
+
+# Bucket in the shared rate scheduler that every batch's generations draw from
+BATCH_BUDGET = "batch:generations"
+
+
+class BatchRunner:
+    """Runs many generations for throughput: bounded concurrency under a global rate budget
+
+    The global budget (BATCH_RATE_PER_MINUTE) is a scheduler bucket shared by all
+    batches and worker processes. rate_per_minute, if given, caps this batch alone
+    on top of it.
+    """
+
+    def __init__(self, agent, concurrency: int = None, rate_per_minute: float = None, force_refresh: bool = False):
+        self.agent = agent
+        self.force_refresh = force_refresh
+        self.concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "4"))
+        self.budget = TokenBucket(rate_per_minute / 60.0, max(1, self.concurrency)) if rate_per_minute else None
+        self.research = {}
+        self.research_lock = threading.Lock()
+
+    @staticmethod
+    def invalid(item) -> str:
+        """Why an input item cannot be generated, or None if it can"""
+        if not isinstance(item, dict):
+            return "Each item must be a {\"topic\", \"blog_size\"} object"
+        topic = item.get("topic")
+        if not isinstance(topic, str) or not topic.strip():
+            return "Topic is required"
+        return None
+
+    def run(self, items: list, completed_ids: set = None):
+        """Yield one result record per input item, in completion order
+
+        Malformed items get an error record up front; they never stop the rest of the batch.
+        """
+        completed_ids = completed_ids or set()
+        groups = {}
+        rejected = []
+        for index, item in enumerate(items):
+            item_id = str(item.get("id", index)) if isinstance(item, dict) else str(index)
+            if item_id in completed_ids:
+                continue
+            error = self.invalid(item)
+            if error:
+                topic = item.get("topic") if isinstance(item, dict) else None
+                rejected.append({"id": item_id, "topic": topic, "blog_size": None, "status": "error", "error": error, "elapsed": 0.0})
+                continue
+            blog_size = item.get("blog_size", "medium")
+            if not isinstance(blog_size, str) or blog_size not in BLOG_SIZES:
+                blog_size = "medium"
+            key = (canonical_topic(item["topic"]), blog_size)
+            groups.setdefault(key, []).append(dict(item, id=item_id, blog_size=blog_size))
+
+        skipped = len(items) - sum(len(group) for group in groups.values()) - len(rejected)
+        logging.info(f"Batch: {len(groups)} unique generations for {len(items)} items "
+                     f"({skipped} already done, {len(rejected)} invalid)")
+        for record in rejected:
+            yield record
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="blog-batch") as executor:
+            futures = {executor.submit(self._generate, key, group[0]["topic"]): key for key, group in groups.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                outcome = future.result()
+                for item in groups[key]:
+                    yield dict(outcome, id=item["id"], topic=item["topic"], blog_size=key[1], key=key[0])
+
+    def _research(self, topic: str):
+        """Research each canonical topic once, shared by every size and duplicate that needs it"""
+        key = canonical_topic(topic)
+        with self.research_lock:
+            future = self.research.get(key)
+            owner = future is None
+            if owner:
+                future = self.research[key] = Future()
+        if owner:
+            try:
+                future.set_result(self.agent.research_topic(topic))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def _generate(self, key, topic: str) -> dict:
+        started = time.monotonic()
+        # Batch items queue behind interactive requests for every rate-limited upstream
+        request_priority.set(BATCH)
+        try:
+            sizes = BLOG_SIZES[key[1]]
+            # A cached blog needs neither research nor a slot in the rate budget
+            cached = None if self.force_refresh else self.agent.cached_blog_result(topic, sizes["intro"], sizes["content"], sizes["summary"])
+            if cached:
+                blog_content, document = cached
+            else:
+                context = self._research(topic)
+                if self.budget is not None:
+                    self.budget.acquire()
+                scheduler.acquire(BATCH_BUDGET)
+                # The cache was already checked above
+                blog_content, document = self.agent.generate_blog_result(
+                    topic=topic,
+                    intro_sentences=sizes["intro"],
+                    content_paragraphs=sizes["content"],
+                    summary_sentences=sizes["summary"],
+                    context=context,
+                    force_refresh=True
+                )
+            if blog_content.startswith("Error:"):
+                return {"status": "error", "error": blog_content, "elapsed": round(time.monotonic() - started, 2)}
+            return {"status": "ok", "blog_content": blog_content, "document": document.to_dict() if document else None,
+                    "elapsed": round(time.monotonic() - started, 2)}
+        except Exception as e:
+            # One bad item must never take down the rest of the batch
+            logging.error(f"Batch item '{topic}' failed: {str(e)}")
+            return {"status": "error", "error": str(e), "elapsed": round(time.monotonic() - started, 2)}
+
+
+def read_jsonl(path: str) -> list:
+    """Parsed lines; one that is not valid JSON becomes None, which the runner reports as an invalid item"""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                logging.warning(f"{path}:{number} is not valid JSON: {str(e)}")
+                items.append(None)
+    return items
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids that already succeeded in a previous run of the same output file"""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+def end_partial_line(output_path: str):
+    """Terminate a partial last line left by a killed run, so the next record starts on a line of its own"""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate blogs in bulk from a JSONL file of topics")
+    parser.add_argument("input", help="JSONL file with one {\"topic\", \"blog_size\"} object per line")
+    parser.add_argument("output", help="JSONL file results are appended to; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, help="Generations in flight at once (default BATCH_CONCURRENCY or 4)")
+    parser.add_argument("--rate", type=float, help="Max generations this batch starts per minute; BATCH_RATE_PER_MINUTE still caps all batches")
+    parser.add_argument("--no-resume", action="store_true", help="Regenerate items that already succeeded in the output file")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached blogs and generate every topic afresh")
+    parser.add_argument("--profile", action="store_true", help="Sample the whole run and write a profile to PROFILE_DIR")
+    args = parser.parse_args()
+
+    from agent import BlogAgent
+
+    items = read_jsonl(args.input)
+    done = set() if args.no_resume else completed_ids(args.output)
+    runner = BatchRunner(BlogAgent(), args.concurrency, args.rate, args.refresh)
+
+    ok = failed = 0
+    session = profiler.start("batch") if args.profile else None
+    try:
+        end_partial_line(args.output)
+        with open(args.output, "a", encoding="utf-8") as out:
+            for record in runner.run(items, done):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if record["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                print(f"{'✅' if record['status'] == 'ok' else '❌'} [{record['id']}] {record.get('topic')} ({record.get('blog_size')})"
+                      + ("" if record["status"] == "ok" else f": {record['error']}"))
+    finally:
+        if session is not None:
+            print(f"Profile written to {profiler.stop(session)}")
+
+    print(f"\nBatch finished: {ok} succeeded, {failed} failed, {len(done)} skipped from checkpoint")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
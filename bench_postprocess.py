@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: legacy regex chain vs the single-pass post-processor on the
+golden corpus, with the large (6-paragraph) blog reported separately.
+
+Usage: python bench_postprocess.py [--repeat 200]
+"""
+
+import argparse
+import timeit
+
+from formatter import clean_model_output, render_blog_html
+from test_postprocess import golden_cases, legacy_clean, legacy_render
+
+
+def legacy_pipeline(raw):
+    return legacy_render(legacy_clean(raw))
+
+
+def new_pipeline(raw):
+    return render_blog_html(clean_model_output(raw))
+
+
+def best_of(fn, raw, repeat):
+    # Best of several rounds filters out scheduler noise better than a mean
+    return min(timeit.repeat(lambda: fn(raw), number=repeat, repeat=5)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blog post-processing")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per timing round")
+    args = parser.parse_args()
+
+    print(f"{'case':<26}{'size':>8}{'legacy µs':>12}{'new µs':>10}{'speedup':>9}")
+    total_legacy = total_new = 0.0
+    for case, raw, expected in golden_cases():
+        assert new_pipeline(raw) == legacy_pipeline(raw) == expected, case
+        legacy = best_of(legacy_pipeline, raw, args.repeat)
+        new = best_of(new_pipeline, raw, args.repeat)
+        total_legacy += legacy
+        total_new += new
+        print(f"{case:<26}{len(raw):>8}{legacy * 1e6:>12.1f}{new * 1e6:>10.1f}{legacy / new:>8.2f}x")
+
+    print(f"{'corpus total':<34}{total_legacy * 1e6:>12.1f}{total_new * 1e6:>10.1f}{total_legacy / total_new:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
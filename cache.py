@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import sqlite3
+import time
+import logging
+from storage import SQLiteStore
+
+
+class ResearchCache(SQLiteStore):
+    """On-disk research cache shared by every worker process through SQLite in WAL mode"""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "5000"))
+        self.ttls = {
+            "wikipedia": int(os.getenv("RESEARCH_CACHE_TTL_WIKIPEDIA", str(3 * 24 * 3600))),
+            "news": int(os.getenv("RESEARCH_CACHE_TTL_NEWS", "3600")),
+            "web": int(os.getenv("RESEARCH_CACHE_TTL_WEB", str(12 * 3600))),
+        }
+        super().__init__(path or os.getenv("RESEARCH_CACHE_PATH", os.path.join("cache", "research_cache.db")))
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS research_cache (
+                source TEXT NOT NULL,
+                query TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (source, query)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_research_cache_access ON research_cache (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO cache_counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lower-case and collapse whitespace so trivially different queries share an entry"""
+        return re.sub(r"\s+", " ", query).strip().lower()
+
+    def ttl_for(self, source: str, query: str) -> int:
+        """Wikipedia articles change slowly; news queries go stale within the hour"""
+        if source == "wikipedia":
+            return self.ttls["wikipedia"]
+        if "news" in query:
+            return self.ttls["news"]
+        return self.ttls["web"]
+
+    def get(self, source: str, query: str):
+        """Return cached content or None, counting the lookup as a hit or miss"""
+        key = self.normalize_query(query)
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT content FROM research_cache WHERE source = ? AND query = ? AND expires_at > ?",
+                (source, key, now)
+            ).fetchone()
+            with conn:
+                conn.execute("BEGIN")
+                if row:
+                    conn.execute("UPDATE research_cache SET last_access = ? WHERE source = ? AND query = ?", (now, source, key))
+                conn.execute("UPDATE cache_counters SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",))
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logging.warning(f"Research cache read failed: {str(e)}")
+            return None
+
+    def set(self, source: str, query: str, content: str):
+        """Store content and evict the least recently used entries beyond max_entries"""
+        key = self.normalize_query(query)
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO research_cache (source, query, content, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, key, content, now, now + self.ttl_for(source, key), now)
+                )
+                conn.execute("DELETE FROM research_cache WHERE expires_at <= ?", (now,))
+                overflow = conn.execute("SELECT COUNT(*) FROM research_cache").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM research_cache WHERE rowid IN "
+                        "(SELECT rowid FROM research_cache ORDER BY last_access LIMIT ?)",
+                        (overflow,)
+                    )
+                    conn.execute("UPDATE cache_counters SET value = value + ? WHERE name = 'evictions'", (overflow,))
+        except sqlite3.Error as e:
+            logging.warning(f"Research cache write failed: {str(e)}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters aggregated across every process sharing the database"""
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM cache_counters").fetchall())
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        counters["entries"] = conn.execute("SELECT COUNT(*) FROM research_cache").fetchone()[0]
+        counters["hit_rate"] = counters.get("hits", 0) / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        """Drop every cached entry"""
+        conn = self._connect()
+        conn.execute("DELETE FROM research_cache")
+
+
+research_cache = ResearchCache() if os.getenv("RESEARCH_CACHE_ENABLED", "1") == "1" else None
+
+
+class BlogCache(SQLiteStore):
+    """Finished blogs keyed by (canonical topic, blog size), so a repeated topic never reaches the models"""
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl: int = None):
+        self.max_entries = max_entries or int(os.getenv("BLOG_CACHE_MAX_ENTRIES", "500"))
+        self.ttl = ttl or int(os.getenv("BLOG_CACHE_TTL", str(24 * 3600)))
+        super().__init__(path or os.getenv("BLOG_CACHE_PATH", os.path.join("cache", "blog_cache.db")))
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blog_cache (
+                topic TEXT NOT NULL,
+                blog_size TEXT NOT NULL,
+                blog_content TEXT NOT NULL,
+                document TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (topic, blog_size)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_blog_cache_access ON blog_cache (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO cache_counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    def get(self, topic: str, blog_size: str):
+        """(blog_content, document dict) generated within the freshness window, or None"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT blog_content, document FROM blog_cache WHERE topic = ? AND blog_size = ? AND created_at > ?",
+                (topic, blog_size, now - self.ttl)
+            ).fetchone()
+            with conn:
+                conn.execute("BEGIN")
+                if row:
+                    conn.execute("UPDATE blog_cache SET last_access = ? WHERE topic = ? AND blog_size = ?", (now, topic, blog_size))
+                conn.execute("UPDATE cache_counters SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",))
+            return (row[0], json.loads(row[1])) if row else None
+        except sqlite3.Error as e:
+            logging.warning(f"Blog cache read failed: {str(e)}")
+            return None
+
+    def set(self, topic: str, blog_size: str, blog_content: str, document: dict):
+        """Store a blog, dropping stale entries and the least recently used ones beyond max_entries"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO blog_cache (topic, blog_size, blog_content, document, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (topic, blog_size, blog_content, json.dumps(document), now, now)
+                )
+                conn.execute("DELETE FROM blog_cache WHERE created_at <= ?", (now - self.ttl,))
+                overflow = conn.execute("SELECT COUNT(*) FROM blog_cache").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM blog_cache WHERE rowid IN "
+                        "(SELECT rowid FROM blog_cache ORDER BY last_access LIMIT ?)",
+                        (overflow,)
+                    )
+                    conn.execute("UPDATE cache_counters SET value = value + ? WHERE name = 'evictions'", (overflow,))
+        except sqlite3.Error as e:
+            logging.warning(f"Blog cache write failed: {str(e)}")
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM cache_counters").fetchall())
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        counters["entries"] = conn.execute("SELECT COUNT(*) FROM blog_cache").fetchone()[0]
+        counters["hit_rate"] = counters.get("hits", 0) / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM blog_cache")
+
+
+blog_cache = BlogCache() if os.getenv("BLOG_CACHE_ENABLED", "1") == "1" else None
@@ -0,0 +1,79 @@
+"""
+Topic canonicalization: "AI in Fianance", "ai in finance " and "AI for
+finance!" all map to one key, so caches and request coalescing treat them as
+the same topic. Only words that never change what a topic is about are
+dropped: "AI and Finance", "AI vs Finance" and "AI in Finance" stay apart, as
+do "Why X fails" and "How X fails", and "Impact of AI on Jobs" and "Impact of
+Jobs on AI", because word order is kept. Spelling corrections come from a
+built-in table plus an optional JSON file of {"misspelling": "correction"} pairs.
+"""
+
+import os
+import re
+import json
+import logging
+
+# Articles and prepositions that do not change the subject; conjunctions, question words and
+# directional prepositions ("to", "from") do, so they stay in the key
+STOP_WORDS = frozenset("a an the as at by for in of on with".split())
+
+# Misspellings seen in real requests; TOPIC_SPELLING_PATH adds to or overrides these
+CORRECTIONS = {
+    "fianance": "finance",
+    "finanace": "finance",
+    "goverment": "government",
+    "technlogy": "technology",
+    "agricuture": "agriculture",
+    "educaton": "education",
+}
+
+WORD = re.compile(r"[^\W_]+")
+
+
+def _match_case(word: str, replacement: str) -> str:
+    """replacement written the way word was: UPPER, Title or lower"""
+    if word.isupper() and len(word) > 1:
+        return replacement.upper()
+    if word[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+class TopicCanonicalizer:
+    def __init__(self, corrections: dict = None, spelling_path: str = None):
+        self.corrections = dict(CORRECTIONS)
+        spelling_path = spelling_path or os.getenv("TOPIC_SPELLING_PATH")
+        if spelling_path:
+            try:
+                with open(spelling_path, encoding="utf-8") as f:
+                    self.add_corrections(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not load spelling corrections from {spelling_path}: {str(e)}")
+        if corrections:
+            self.add_corrections(corrections)
+
+    def add_corrections(self, corrections: dict):
+        """Register more misspelling -> correction pairs; matching ignores case"""
+        self.corrections.update({wrong.casefold(): right.casefold() for wrong, right in corrections.items()})
+
+    def correct(self, topic: str) -> str:
+        """Topic as the user wrote it, with whitespace collapsed and known misspellings fixed"""
+        topic = " ".join(topic.split())
+        return WORD.sub(lambda m: _match_case(m.group(0), self.corrections.get(m.group(0).casefold(), m.group(0))), topic)
+
+    def key(self, topic: str) -> str:
+        """Cache key: case, punctuation, stop words and misspellings do not matter; word order does"""
+        words = [self.corrections.get(word, word) for word in WORD.findall(topic.casefold())]
+        # A topic made only of stop words keeps them rather than collapsing to an empty key
+        return " ".join(word for word in words if word not in STOP_WORDS) or " ".join(words)
+
+
+canonicalizer = TopicCanonicalizer()
+
+
+def canonical_topic(topic: str) -> str:
+    return canonicalizer.key(topic)
+
+
+def correct_topic(topic: str) -> str:
+    return canonicalizer.correct(topic)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe after the cooldown"""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 300):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Return True if a call could go through right now, without claiming anything"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                return time.time() - self.opened_at >= self.cooldown
+            return not self._probe_busy()
+
+    def allow(self) -> bool:
+        """Return True if a call may go through, claiming the probe slot when half-open"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_busy():
+                self.probe_in_flight = True
+                self.probe_started = time.time()
+                return True
+            return False
+
+    def force_probe(self) -> bool:
+        """Half-open an open breaker before its cooldown ends, so the next allow() claims the probe"""
+        with self.lock:
+            if self.state != OPEN:
+                return False
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+            return True
+
+    def release(self):
+        """Give back a probe slot whose call ended without a verdict (e.g. it was cancelled)"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def _probe_busy(self) -> bool:
+        # A probe that never reported back stops blocking others after one cooldown
+        return self.probe_in_flight and time.time() - self.probe_started < self.cooldown
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failure; a failed probe re-opens the breaker immediately"""
+        with self.lock:
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened_at": self.opened_at,
+        }
+
+    def load(self, data: dict):
+        """Restore persisted state; an interrupted probe comes back as open so it is retried"""
+        self.state = data.get("state", CLOSED)
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+        self.consecutive_failures = data.get("consecutive_failures", 0)
+        self.opened_at = data.get("opened_at", 0.0)
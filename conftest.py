@@ -0,0 +1,142 @@
+"""
+Shared test setup. Caches, stores, the rate scheduler and app's job manager
+are module-level singletons built from the environment on first import, so
+the environment is fixed here, before pytest imports any test module, and
+every file they could write lands in a throwaway directory.
+"""
+
+import os
+import json
+import random
+import asyncio
+import tempfile
+import time
+
+TEST_DIR = tempfile.mkdtemp(prefix="blog-agent-tests-")
+
+# A placeholder key is enough: model calls are replaced by FakeModel
+os.environ["OPENROUTER_API_KEY"] = "test-key-for-pipeline-checks"
+os.environ.update({
+    "RESEARCH_CACHE_ENABLED": "0",
+    "RESEARCH_INDEX_ENABLED": "0",
+    "BLOG_CACHE_ENABLED": "0",
+    "GENERATION_STORE_ENABLED": "0",
+    "RATE_LIMIT_SHARED": "0",
+    "RATE_LIMIT_STATE_PATH": os.path.join(TEST_DIR, "ratelimit.db"),
+    "JOB_DB_PATH": os.path.join(TEST_DIR, "jobs.db"),
+    "MODEL_HEALTH_PATH": os.path.join(TEST_DIR, "model_health.json"),
+    "PROFILE_DIR": os.path.join(TEST_DIR, "profiles"),
+})
+os.environ.pop("WIKIPEDIA_DUMP_PATH", None)
+os.environ.pop("PROFILE_ADMIN_TOKEN", None)
+
+import pytest
+
+import tools
+import agent as agent_module
+from agent import BlogAgent
+from formatter import BlogDocument
+
+# A manual script that drives a running server
+collect_ignore = ["test_api.py"]
+
+
+def fake_wikipedia_search(query):
+    time.sleep(random.uniform(0, 0.05))
+    return f"Title: {query}\nSummary: wiki facts about <<{query}>>"
+
+
+def fake_web_search(query):
+    time.sleep(random.uniform(0, 0.05))
+    topic = query.split(" latest")[0].split(" government")[0].split(" current")[0]
+    return f"Title: news\nSnippet: web facts about <<{topic}>>"
+
+
+async def fake_awikipedia_search(query):
+    return fake_wikipedia_search(query)
+
+
+async def fake_aweb_search(query):
+    return fake_web_search(query)
+
+
+class FakeModel:
+    """Stands in for BlogAgent._agenerate_with_openrouter: records each prompt and echoes it back
+
+    The echo lets a test see exactly which research a prompt was built from; the
+    call number makes every generation distinct.
+    """
+
+    def __init__(self):
+        self.prompts = []
+
+    async def __call__(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return BlogDocument([("paragraph", prompt), ("paragraph", f"generation {len(self.prompts)}")])
+
+
+class FakeOpenRouter:
+    """Stands in for async_http_client on the model path: each model streams the deltas scripted for it"""
+
+    def __init__(self):
+        self.scripts = {}
+        self.closed = []
+
+    def script(self, model, deltas, delay=0.0, status=200, error=None):
+        """model answers with status and, on a 200, sends deltas delay seconds apart, then raises error if given"""
+        self.scripts[model] = (deltas, delay, status, error)
+
+    def stream(self, method, url, json=None, **kwargs):
+        return FakeModelStream(self, json["model"])
+
+
+class FakeModelStream:
+    def __init__(self, openrouter, model):
+        self.openrouter = openrouter
+        self.model = model
+        self.deltas, self.delay, self.status_code, self.error = openrouter.scripts[model]
+        self.headers = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.openrouter.closed.append(self.model)
+
+    async def aiter_lines(self):
+        for delta in self.deltas:
+            await asyncio.sleep(self.delay)
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": delta}}]})
+        if self.error is not None:
+            raise self.error
+        yield "data: [DONE]"
+
+
+@pytest.fixture
+def fake_research(monkeypatch):
+    """Canned Wikipedia and web results that name the topic as <<topic>>, for the sync and async entry points"""
+    monkeypatch.setattr(tools.ResearchTools, "wikipedia_search", staticmethod(fake_wikipedia_search))
+    monkeypatch.setattr(tools.ResearchTools, "web_search", staticmethod(fake_web_search))
+    monkeypatch.setattr(tools.ResearchTools, "awikipedia_search", staticmethod(fake_awikipedia_search))
+    monkeypatch.setattr(tools.ResearchTools, "aweb_search", staticmethod(fake_aweb_search))
+
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
+
+
+@pytest.fixture
+def fake_agent(fake_research, fake_model):
+    """A BlogAgent on canned research whose model is fake_model"""
+    agent = BlogAgent()
+    agent._agenerate_with_openrouter = fake_model
+    return agent
+
+
+@pytest.fixture
+def fake_openrouter(monkeypatch):
+    """A FakeOpenRouter in place of the streamed model calls _acall_model makes"""
+    openrouter = FakeOpenRouter()
+    monkeypatch.setattr(agent_module, "async_http_client", openrouter)
+    return openrouter
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+import contextvars
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request or job runs out of its time budget"""
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away because its deadline cannot be met"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.time() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def check(self, stage: str = None):
+        """Raise DeadlineExceeded if the budget is spent"""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded{f' before {stage}' if stage else ''}")
+
+    def budget(self, timeout: float, stage: str = None) -> float:
+        """timeout shrunk to the time that is left, so one stage never outlives the request"""
+        self.check(stage)
+        return min(timeout, self.remaining())
+
+
+# The deadline of the request being served; run_sync and in_thread carry it into tasks and threads
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+def time_left(default: float = None) -> float:
+    """Seconds left for the current request, or default when it has no deadline"""
+    deadline = current_deadline.get()
+    return default if deadline is None else deadline.remaining()
+
+
+def budget(timeout: float, stage: str = None) -> float:
+    """Deadline.budget for the current request; timeout itself when there is no deadline"""
+    deadline = current_deadline.get()
+    return timeout if deadline is None else deadline.budget(timeout, stage)
+
+
+def check(stage: str = None):
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+class AdmissionController:
+    """Turns requests away up front when the work already in flight means their deadline cannot be met
+
+    A request is expected to finish after (in_flight // capacity + 1) typical
+    generations, where the typical duration is a moving average of recent ones.
+    """
+
+    def __init__(self, capacity: int = None, max_in_flight: int = None, initial_estimate: float = None):
+        self.capacity = capacity or int(os.getenv("ADMISSION_CAPACITY", "4"))
+        self.max_in_flight = max_in_flight or int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+        self.estimate = initial_estimate or float(os.getenv("ADMISSION_INITIAL_ESTIMATE", "30"))
+        self.in_flight = 0
+        self.counters = {"admitted": 0, "rejected": 0}
+        self.lock = threading.Lock()
+
+    def admit(self, deadline: Deadline):
+        """Take a slot for a request, or raise AdmissionRejected if it would only time out"""
+        with self.lock:
+            expected = (self.in_flight // self.capacity + 1) * self.estimate
+            if self.in_flight >= self.max_in_flight or expected > deadline.remaining():
+                self.counters["rejected"] += 1
+                # Roughly when one batch of the current work will have drained
+                raise AdmissionRejected(
+                    f"Server is busy: about {expected:.0f}s needed but only {deadline.remaining():.0f}s allowed",
+                    retry_after=self.estimate
+                )
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+
+    def release(self, duration: float = None):
+        """Free the slot; duration, for a completed generation, updates the typical duration"""
+        with self.lock:
+            self.in_flight -= 1
+            if duration is not None:
+                self.estimate = 0.8 * self.estimate + 0.2 * duration
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, in_flight=self.in_flight, capacity=self.capacity,
+                        typical_duration=round(self.estimate, 2))
+
+
+admission = AdmissionController()
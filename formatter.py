@@ -0,0 +1,385 @@
+import re
+
+BLOG_CSS = (
+    '<style>'
+    '.blog-container { max-width: 900px; margin: 0 auto; font-family: "Segoe UI", Arial, sans-serif; line-height: 1.8; color: #333; }'
+    '.blog-title { text-align: center; font-size: 32px; font-weight: bold; color: #1a1a1a; margin: 30px 0 20px 0; padding: 0 20px; text-decoration: none; }'
+    '.blog-subtitle { font-size: 20px; font-weight: bold; color: #2c3e50; margin: 25px 0 15px 0; border-left: 4px solid #3498db; padding-left: 15px; text-decoration: none; }'
+    '.section-heading { font-size: 20px; font-weight: bold; color: #2c3e50; margin: 25px 0 15px 0; border-left: 4px solid #3498db; padding-left: 15px; text-decoration: none; }'
+    '.blog-container p { font-size: 16px; margin: 15px 0; text-align: justify; line-height: 1.8; text-decoration: none; }'
+    '.blog-container * { text-decoration: none !important; }'
+    '.sources-section { margin-top: 40px; padding-top: 20px; border-top: 2px solid #e0e0e0; }'
+    '</style>\n'
+)
+
+HEADING_KEYWORDS = ['policies', 'technology', 'challenges', 'future', 'outlook', 'reforms', 'transformation', 'data', 'summary']
+
+SECTION_LABEL = re.compile(r'^(HEADING|SUBTITLE|INTRODUCTION|CONTENT SECTION|SUMMARY|SOURCES)\s*$')
+BANNER = re.compile(r'^===\s*(.*?)\s*===$')
+NOTE = re.compile(r'^Note:', re.IGNORECASE)
+NUMBERED_PICTURE = re.compile(r'^\d+:.*picture')
+IMAGE_DESCRIPTION = re.compile(r'(A |The )?(photo|screenshot|picture|image) of.*$', re.IGNORECASE)
+SCREENSHOT = re.compile(r'Screenshot:.*$', re.IGNORECASE)
+CAPTION = re.compile(r'\[Caption:.*?\]', re.IGNORECASE)
+IMAGE_TAG = re.compile(r'\[IMAGE:[^\]]+\]')
+SOURCES_START = re.compile(r'^(===\s*SOURCES\s*===|Sources:|References:)', re.IGNORECASE)
+
+# Patterns for the one-shot post-processor. Rare artifacts keep their original
+# whole-text regexes (they can join lines) but only run when a cheap substring check hits.
+BANNER_SPAN = re.compile(r'===\s*(.*?)\s*===')
+NOTE_PREFIX = 'note:'
+IMAGE_DESCRIPTION_LINE = re.compile(r'(A |The )?(photo|screenshot|picture|image) of.*?\n', re.IGNORECASE)
+SCREENSHOT_LINE = re.compile(r'Screenshot:.*?\n', re.IGNORECASE)
+IMAGE_TAG_SPAN = re.compile(r'\[IMAGE:[^\]]+\]')
+SOURCES_MARKER = re.compile(r'(===\s*SOURCES\s*===|Sources:|References:)', re.IGNORECASE)
+SOURCE_ITEM = re.compile(r'(?:Source: )?([^-\n]+)')
+SOURCE_SEPARATOR = re.compile(r'\n|(?:^|\s)[-•]\s+|\s+(?=Source:)', re.IGNORECASE)
+LABEL_INITIALS = frozenset('HSIC')
+# IGNORECASE also matches these against ASCII letters, but str.lower() does not fold them
+CASE_FOLD_EXTRAS = ('\u0130', '\u0131', '\u017f', '\u212a')
+SOURCES_HEADER = "\n\n---\n\nSources & References:\n\n"
+SOURCES_PLACEHOLDER = SOURCES_HEADER + "Based on research data from Wikipedia and web sources."
+
+
+def is_section_heading(line: str) -> bool:
+    """Markdown headings, or short 'Label: text' lines that mention a heading keyword"""
+    return (line.startswith('#') or
+            (':' in line and len(line.split()) <= 10 and any(keyword in line.lower() for keyword in HEADING_KEYWORDS)))
+
+
+def _may_contain(text: str, lowered: str, needles) -> bool:
+    """Cheap pre-check for case-insensitive patterns; errs on the side of running the regex"""
+    return any(needle in lowered for needle in needles) or any(char in text for char in CASE_FOLD_EXTRAS)
+
+
+def clean_model_output(content: str) -> str:
+    """Strip markdown emphasis, banners, trailing notes and image artifacts from raw model output
+
+    The result is the text that gets validated; render_blog_html turns it into HTML.
+    """
+    content = content.replace('*', '')
+    if '===' in content:
+        content = BANNER_SPAN.sub(r'\n\n\1\n\n', content)
+
+    lines = []
+    for index, line in enumerate(content.split('\n')):
+        # A line-initial "Note:" ends the post, together with the blank lines before it
+        if index and line[:5].lower() == NOTE_PREFIX:
+            while len(lines) > 1 and not lines[-1]:
+                lines.pop()
+            break
+        # Numbered picture captions go, and so do the blank lines in front of them
+        if index and 'picture' in line and NUMBERED_PICTURE.match(line):
+            while len(lines) > 1 and not lines[-1]:
+                lines.pop()
+            continue
+        lines.append(line)
+    content = '\n'.join(lines)
+
+    lowered = content.lower()
+    if _may_contain(content, lowered, ('photo of', 'screenshot of', 'picture of', 'image of')):
+        content = IMAGE_DESCRIPTION_LINE.sub('', content)
+        lowered = content.lower()
+    if _may_contain(content, lowered, ('screenshot:',)):
+        content = SCREENSHOT_LINE.sub('', content)
+        lowered = content.lower()
+    if _may_contain(content, lowered, ('[caption:',)):
+        content = CAPTION.sub('', content)
+
+    # Collapse runs of blank lines to one
+    lines = []
+    blank = False
+    for line in content.split('\n'):
+        if line:
+            blank = False
+        elif blank:
+            continue
+        else:
+            blank = True
+        lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def _extract_sources(sources_text: str) -> list:
+    """Site names from the text after a Sources:/References: marker, split the way the HTML output always has"""
+    sources = []
+    for source in SOURCE_ITEM.findall(sources_text):
+        if '://' in source:
+            sources.append(source.split('://')[1].split('/')[0])
+        else:
+            sources.append(source.strip())
+    return sources
+
+
+def _strip_heading_marks(text: str) -> str:
+    return text.lstrip('#').strip()
+
+
+class BlogDocument:
+    """A parsed blog: ordered (kind, text) blocks plus where the sources list starts
+
+    kind is title, subtitle, heading or paragraph. sources_at is (block index,
+    start, end) of the first Sources:/References: marker, or None. Rendering to
+    HTML, Markdown or plain text works from this without re-parsing.
+    generation_id names the stored generation it came from, if any.
+    """
+
+    HTML_TAGS = {
+        'title': ('<h1 class="blog-title">', '</h1>\n'),
+        'subtitle': ('<div class="blog-subtitle">', '</div>\n'),
+        'heading': ('<h2 class="section-heading">', '</h2>\n'),
+        'paragraph': ('<p>', '</p>\n'),
+    }
+
+    def __init__(self, blocks: list, sources_at: tuple = None, generation_id: str = None):
+        self.blocks = blocks
+        self.sources_at = sources_at
+        self.generation_id = generation_id
+
+    def title(self) -> str:
+        return self.blocks[0][1] if self.blocks else ''
+
+    def body(self) -> list:
+        """Blocks before the sources marker, with the marker's own block cut short"""
+        if self.sources_at is None:
+            return self.blocks
+        index, start, _ = self.sources_at
+        kind, text = self.blocks[index]
+        body = self.blocks[:index]
+        if text[:start].strip():
+            body = body + [(kind, text[:start].strip())]
+        return body
+
+    def sources(self) -> list:
+        """Cleaned source names; unlike the HTML bullets, hyphenated names are kept whole"""
+        if self.sources_at is None:
+            return []
+        index, _, end = self.sources_at
+        tail = [self.blocks[index][1][end:]] + [text for _, text in self.blocks[index + 1:]]
+        sources = []
+        for item in SOURCE_SEPARATOR.split('\n'.join(tail)):
+            item = item.strip()
+            if item.lower().startswith('source:'):
+                item = item[len('source:'):].strip()
+            if '://' in item:
+                item = item.split('://')[1].split('/')[0]
+            if item and item not in sources:
+                sources.append(item)
+        return sources
+
+    def to_html(self) -> str:
+        """Styled HTML, byte-identical to what the blog pipeline has always produced"""
+        parts = ['<div class="blog-container">', BLOG_CSS]
+        for kind, text in self.blocks:
+            opening, closing = self.HTML_TAGS[kind]
+            parts.append(f'{opening}{text}{closing}')
+        parts.append('</div>')
+
+        if self.sources_at is None:
+            parts.append(SOURCES_PLACEHOLDER)
+            return ''.join(parts)
+
+        # Everything after the first marker, markup included, is treated as the sources list
+        index, start, end = self.sources_at
+        split = index + 2
+        kind, text = self.blocks[index]
+        opening, closing = self.HTML_TAGS[kind]
+        sources_text = (text[end:] + closing + ''.join(parts[split + 1:])).strip()
+        head = parts[:split]
+        head.append(opening + text[:start])
+        head.append(SOURCES_HEADER)
+        head.extend(f"• {source}\n" for source in _extract_sources(sources_text))
+        return ''.join(head)
+
+    def to_markdown(self) -> str:
+        parts = []
+        for kind, text in self.body():
+            if kind == 'title':
+                parts.append(f"# {_strip_heading_marks(text)}")
+            elif kind == 'subtitle':
+                parts.append(f"_{_strip_heading_marks(text)}_")
+            elif kind == 'heading':
+                parts.append(f"## {text}")
+            else:
+                parts.append(text)
+        parts.append("---\n\n## Sources & References")
+        parts.append(self._sources_list("- "))
+        return '\n\n'.join(parts) + '\n'
+
+    def to_text(self) -> str:
+        parts = []
+        for kind, text in self.body():
+            if kind == 'title':
+                title = _strip_heading_marks(text)
+                parts.append(f"{title}\n{'=' * len(title)}")
+            elif kind == 'subtitle':
+                parts.append(_strip_heading_marks(text))
+            elif kind == 'heading':
+                parts.append(f"{text}\n{'-' * len(text)}")
+            else:
+                parts.append(text)
+        parts.append("Sources & References:")
+        parts.append(self._sources_list("• "))
+        return '\n\n'.join(parts) + '\n'
+
+    def _sources_list(self, bullet: str) -> str:
+        sources = self.sources()
+        if not sources:
+            return "Based on research data from Wikipedia and web sources."
+        return '\n'.join(bullet + source for source in sources)
+
+    def render(self, format_type: str) -> str:
+        """Render as 'html', 'markdown' or 'text'"""
+        renderers = {'html': self.to_html, 'markdown': self.to_markdown, 'text': self.to_text}
+        if format_type not in renderers:
+            raise ValueError(f"Unknown format: {format_type}")
+        return renderers[format_type]()
+
+    def to_dict(self) -> dict:
+        data = {"blocks": [list(block) for block in self.blocks], "sources_at": list(self.sources_at) if self.sources_at else None}
+        if self.generation_id:
+            data["generation_id"] = self.generation_id
+        return data
+
+    @staticmethod
+    def from_dict(data: dict) -> 'BlogDocument':
+        sources_at = data.get("sources_at")
+        return BlogDocument([tuple(block) for block in data["blocks"]], tuple(sources_at) if sources_at else None,
+                            data.get("generation_id"))
+
+
+def parse_blog(content: str) -> BlogDocument:
+    """Classify cleaned blog text into title, subtitle, heading and paragraph blocks in one pass"""
+    if '[IMAGE:' in content:
+        content = IMAGE_TAG_SPAN.sub('', content)
+
+    blocks = []
+    line_count = 0
+    current_para = []
+
+    for line in content.split('\n'):
+        # Section labels count as blank lines
+        if line and line[0] in LABEL_INITIALS and SECTION_LABEL.match(line):
+            line = ''
+        line = line.strip()
+        if not line:
+            if current_para:
+                blocks.append(('paragraph', " ".join(current_para)))
+                current_para = []
+        elif line_count == 0:
+            blocks.append(('title', line))
+            line_count = 1
+        elif line_count == 1:
+            blocks.append(('subtitle', line))
+            line_count = 2
+        elif is_section_heading(line):
+            if current_para:
+                blocks.append(('paragraph', " ".join(current_para)))
+                current_para = []
+            blocks.append(('heading', line.replace('#', '').strip()))
+        elif '<div style="text-align:center' in line or '<img' in line:
+            if current_para:
+                blocks.append(('paragraph', " ".join(current_para)))
+                current_para = []
+        else:
+            current_para.append(line)
+
+    if current_para:
+        blocks.append(('paragraph', " ".join(current_para)))
+
+    sources_at = None
+    for index, (_, text) in enumerate(blocks):
+        if ':' in text or '===' in text:
+            match = SOURCES_MARKER.search(text)
+            if match:
+                sources_at = (index, match.start(), match.end())
+                break
+    return BlogDocument(blocks, sources_at)
+
+
+def render_blog_html(content: str) -> str:
+    """Render cleaned blog text as styled HTML followed by the formatted sources list"""
+    return parse_blog(content).to_html()
+
+
+class IncrementalBlogRenderer:
+    """Turns a token stream into finished HTML blocks as soon as each block closes
+
+    The output is a preview: the final content still goes through the regular
+    cleanup, validation and formatting pipeline once the stream completes.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.line_count = 0
+        self.current_para = []
+        self.started = False
+        self.stopped = False
+
+    def feed(self, text: str) -> list:
+        """Add streamed text and return the HTML fragments it completed"""
+        if self.stopped:
+            return []
+        self.buffer += text
+        fragments = []
+        while '\n' in self.buffer and not self.stopped:
+            line, self.buffer = self.buffer.split('\n', 1)
+            fragments.extend(self._process_line(line))
+        return fragments
+
+    def finish(self) -> list:
+        """Flush whatever is left once the stream ends"""
+        fragments = []
+        if self.buffer and not self.stopped:
+            fragments.extend(self._process_line(self.buffer))
+        self.buffer = ''
+        fragments.extend(self._flush_paragraph())
+        return fragments
+
+    def _open(self) -> list:
+        if self.started:
+            return []
+        self.started = True
+        return ['<div class="blog-container">' + BLOG_CSS]
+
+    def _flush_paragraph(self) -> list:
+        if not self.current_para:
+            return []
+        paragraph = f'<p>{" ".join(self.current_para)}</p>\n'
+        self.current_para = []
+        return [paragraph]
+
+    def _process_line(self, line: str) -> list:
+        line = line.replace('*', '')
+        banner = BANNER.match(line.strip())
+        if banner:
+            line = banner.group(1)
+        line = line.strip()
+
+        if self.line_count and (NOTE.match(line) or SOURCES_START.match(line)):
+            # Trailing notes are dropped and sources are rendered by the final pipeline
+            self.stopped = True
+            return self._flush_paragraph()
+        if NUMBERED_PICTURE.match(line) or SECTION_LABEL.match(line):
+            return []
+        line = IMAGE_TAG.sub('', CAPTION.sub('', SCREENSHOT.sub('', IMAGE_DESCRIPTION.sub('', line)))).strip()
+
+        if not line:
+            return self._flush_paragraph()
+
+        fragments = self._open()
+        if self.line_count == 0:
+            fragments.append(f'<h1 class="blog-title">{line}</h1>\n')
+            self.line_count += 1
+        elif self.line_count == 1:
+            fragments.append(f'<div class="blog-subtitle">{line}</div>\n')
+            self.line_count += 1
+        elif is_section_heading(line):
+            fragments.extend(self._flush_paragraph())
+            clean_line = line.replace('###', '').replace('##', '').replace('#', '').strip()
+            fragments.append(f'<h2 class="section-heading">{clean_line}</h2>\n')
+        elif '<div style="text-align:center' in line or '<img' in line:
+            fragments.extend(self._flush_paragraph())
+        else:
+            self.current_para.append(line)
+        return fragments
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import uuid
+from storage import SQLiteStore
+
+
+class GenerationNotFound(Exception):
+    """Raised when a generation id is unknown or has been evicted"""
+
+
+class GenerationStore(SQLiteStore):
+    """Finished generations with the research behind them, so a blog can be resized or partly redone later"""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("GENERATION_STORE_MAX_ENTRIES", "1000"))
+        super().__init__(path or os.getenv("GENERATION_STORE_PATH", os.path.join("cache", "generations.db")))
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS generations (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT,
+                topic TEXT NOT NULL,
+                sizes TEXT NOT NULL,
+                research TEXT NOT NULL,
+                document TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_access ON generations (last_access)")
+
+    def create(self, topic: str, sizes: tuple, research: list, document: dict, parent_id: str = None) -> str:
+        """Store a generation and return its id; the least recently used ones beyond max_entries are dropped
+
+        sizes is (intro_sentences, content_paragraphs, summary_sentences); research is
+        the list of {"source", "content"} items the blog was written from.
+        """
+        generation_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO generations (id, parent_id, topic, sizes, research, document, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (generation_id, parent_id, topic, json.dumps(list(sizes)), json.dumps(research), json.dumps(document), now, now)
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM generations WHERE rowid IN "
+                    "(SELECT rowid FROM generations ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+        return generation_id
+
+    def get(self, generation_id: str) -> dict:
+        """The stored generation, or GenerationNotFound"""
+        conn = self._connect()
+        cursor = conn.execute("SELECT * FROM generations WHERE id = ?", (generation_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise GenerationNotFound(f"Generation {generation_id} not found")
+        conn.execute("UPDATE generations SET last_access = ? WHERE id = ?", (time.time(), generation_id))
+        generation = dict(zip([column[0] for column in cursor.description], row))
+        for field in ("sizes", "research", "document"):
+            generation[field] = json.loads(generation[field])
+        generation["sizes"] = tuple(generation["sizes"])
+        return generation
+
+
+generation_store = GenerationStore() if os.getenv("GENERATION_STORE_ENABLED", "1") == "1" else None
@@ -0,0 +1,191 @@
+import os
+import time
+import asyncio
+import contextlib
+import threading
+import logging
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _bound_stream(response: requests.Response, url: str, started: float, total_timeout: float):
+    """Make iterating a streamed response raise Timeout once total_timeout has passed since the request was sent"""
+    iter_content = response.iter_content
+
+    def bounded(*args, **kwargs):
+        for chunk in iter_content(*args, **kwargs):
+            if time.monotonic() - started > total_timeout:
+                response.close()
+                raise requests.exceptions.Timeout(f"Total deadline of {total_timeout}s exceeded for {url}")
+            yield chunk
+    # iter_lines reads through iter_content, so both are bounded
+    response.iter_content = bounded
+
+
+def _abound_stream(response: httpx.Response, url: str, started: float, total_timeout: float):
+    """_bound_stream for httpx: every body iterator reads through aiter_raw"""
+    aiter_raw = response.aiter_raw
+
+    async def bounded(*args, **kwargs):
+        async for chunk in aiter_raw(*args, **kwargs):
+            if time.monotonic() - started > total_timeout:
+                raise httpx.TimeoutException(f"Total deadline of {total_timeout}s exceeded for {url}")
+            yield chunk
+    response.aiter_raw = bounded
+
+
+class HttpClient:
+    """Shared keep-alive transport: per-host connection pools with connect, read and total timeouts"""
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None,
+                 connect_timeout: float = None, read_timeout: float = None, total_timeout: float = None):
+        self.pool_connections = pool_connections or int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+        self.pool_maxsize = pool_maxsize or int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+        self.connect_timeout = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+        self.total_timeout = total_timeout or float(os.getenv("HTTP_TOTAL_TIMEOUT", "60"))
+
+        self.session = requests.Session()
+        # Retries stay with the callers, which already know which failures are worth retrying
+        self.adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.lock = threading.Lock()
+
+    def request(self, method: str, url: str, read_timeout: float = None, total_timeout: float = None,
+                stream: bool = False, **kwargs) -> requests.Response:
+        """Send a request over the pooled session
+
+        Streamed responses are returned for the caller to consume. They have no total
+        deadline by default, since a long generation may stream for minutes; given one,
+        iterating past it closes the response and raises Timeout. Otherwise the body is
+        read here so total_timeout bounds the whole exchange, not just each read.
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        started = time.monotonic()
+        response = self.session.request(method, url, timeout=timeout, stream=True, **kwargs)
+        if stream:
+            if total_timeout:
+                _bound_stream(response, url, started, total_timeout)
+            return response
+
+        total_timeout = total_timeout or self.total_timeout
+        body = bytearray()
+        try:
+            for chunk in response.iter_content(chunk_size=16384):
+                body.extend(chunk)
+                if time.monotonic() - started > total_timeout:
+                    raise requests.exceptions.Timeout(f"Total deadline of {total_timeout}s exceeded for {url}")
+        finally:
+            response.close()
+        # Hand back a normal, fully-read response so .text/.json() work as usual
+        response._content = bytes(body)
+        response._content_consumed = True
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Per-host request and connection counts; reused = requests served without a new connection"""
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        with self.lock:
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                entry = hosts.setdefault(pool.host, {"requests": 0, "connections_opened": 0})
+                entry["requests"] += pool.num_requests
+                entry["connections_opened"] += pool.num_connections
+        for entry in hosts.values():
+            entry["reused"] = max(0, entry["requests"] - entry["connections_opened"])
+        return hosts
+
+
+class AsyncHttpClient:
+    """Async counterpart of HttpClient with the same pool and timeout settings
+
+    httpx connections belong to the event loop that opened them, so one
+    AsyncClient is kept per running loop. httpx keeps no per-pool counters, so
+    requests are counted here and new connections through httpcore's trace hook.
+    """
+
+    def __init__(self, config: HttpClient):
+        self.config = config
+        self.clients = weakref.WeakKeyDictionary()
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=self.config.pool_connections * self.config.pool_maxsize,
+                max_keepalive_connections=self.config.pool_maxsize
+            )
+            client = self.clients[loop] = httpx.AsyncClient(limits=limits)
+        return client
+
+    def _timeout(self, read_timeout: float = None) -> httpx.Timeout:
+        return httpx.Timeout(read_timeout or self.config.read_timeout, connect=self.config.connect_timeout)
+
+    def _count(self, url: str, kwargs: dict) -> dict:
+        """Count a request to url's host and add a trace hook that counts the connections it opens"""
+        host = httpx.URL(url).host
+        with self.lock:
+            self.hosts.setdefault(host, {"requests": 0, "connections_opened": 0})["requests"] += 1
+
+        async def trace(event: str, info: dict):
+            # Only a request that needs a new connection gets this event; reused ones skip connecting
+            if event == "connection.connect_tcp.complete":
+                with self.lock:
+                    self.hosts[host]["connections_opened"] += 1
+        return dict(kwargs, extensions=dict(kwargs.get("extensions") or {}, trace=trace))
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, read_timeout: float = None, total_timeout: float = None, **kwargs):
+        """Async context manager yielding a streamed httpx response
+
+        As with HttpClient.request(stream=True), total_timeout is only enforced when
+        given: reading the body past it raises httpx.TimeoutException.
+        """
+        kwargs = self._count(url, kwargs)
+        started = time.monotonic()
+        async with self.client().stream(method, url, timeout=self._timeout(read_timeout), **kwargs) as response:
+            if total_timeout:
+                _abound_stream(response, url, started, total_timeout)
+            yield response
+
+    async def request(self, method: str, url: str, read_timeout: float = None, total_timeout: float = None, **kwargs) -> httpx.Response:
+        """Send a request and read the whole body within total_timeout"""
+        kwargs = self._count(url, kwargs)
+        total_timeout = total_timeout or self.config.total_timeout
+        try:
+            return await asyncio.wait_for(
+                self.client().request(method, url, timeout=self._timeout(read_timeout), **kwargs),
+                timeout=total_timeout
+            )
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"Total deadline of {total_timeout}s exceeded for {url}")
+
+    def stats(self) -> dict:
+        """Per-host request and connection counts across every loop's client, shaped like HttpClient.stats()"""
+        with self.lock:
+            hosts = {host: dict(entry) for host, entry in self.hosts.items()}
+        for entry in hosts.values():
+            entry["reused"] = max(0, entry["requests"] - entry["connections_opened"])
+        return hosts
+
+
+# httpx logs every request at INFO, which drowns out the pipeline logs
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+http_client = HttpClient()
+async_http_client = AsyncHttpClient(http_client)
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from storage import SQLiteStore
+from deadline import Deadline, DeadlineExceeded
+from telemetry import start_trace, finish_trace
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+EXPIRED = "expired"
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class JobStore(SQLiteStore):
+    """Durable job records so finished results survive a restart"""
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT,
+                detail TEXT,
+                params TEXT NOT NULL,
+                result TEXT,
+                document TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                deadline REAL NOT NULL,
+                owner INTEGER NOT NULL
+            )
+        """)
+        # Stores created before documents were kept lack the column
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "document" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN document TEXT")
+
+    def create(self, job_id: str, params: dict, deadline: float):
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, stage, params, created_at, updated_at, deadline, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, QUEUED, json.dumps(params), now, now, deadline, os.getpid())
+        )
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str):
+        conn = self._connect()
+        cursor = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([column[0] for column in cursor.description], row))
+        job["params"] = json.loads(job["params"])
+        job["document"] = json.loads(job["document"]) if job["document"] else None
+        return job
+
+    def recover_orphaned(self, reason: str):
+        """Take over the jobs of processes that have died: running ones fail, queued ones are adopted
+
+        A queued job never started, so running it here is safe; a job that was
+        running may be what brought its process down. Live sibling workers keep
+        theirs. Returns (failed count, adopted jobs).
+        """
+        conn = self._connect()
+        owners = [row[0] for row in conn.execute(
+            "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        )]
+        failed = 0
+        adopted = []
+        for owner in owners:
+            if owner != os.getpid() and _process_alive(owner):
+                continue
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE owner = ? AND status = ?",
+                (FAILED, reason, time.time(), owner, RUNNING)
+            )
+            failed += cursor.rowcount
+            queued = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE owner = ? AND status = ?", (owner, QUEUED))]
+            for job_id in queued:
+                if job_id in adopted:
+                    continue
+                # A sibling restarting at the same time may adopt the job first
+                cursor = conn.execute("UPDATE jobs SET owner = ?, updated_at = ? WHERE id = ? AND owner = ? AND status = ?",
+                                      (os.getpid(), time.time(), job_id, owner, QUEUED))
+                if cursor.rowcount:
+                    adopted.append(job_id)
+        return failed, [self.get(job_id) for job_id in adopted]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """Runs blog generations in a bounded in-process worker pool, decoupled from HTTP requests"""
+
+    def __init__(self, agent, store: JobStore = None, workers: int = None, queue_depth: int = None, deadline: float = None):
+        self.agent = agent
+        self.store = store or JobStore(os.getenv("JOB_DB_PATH", os.path.join("cache", "jobs.db")))
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.queue_depth = queue_depth or int(os.getenv("JOB_QUEUE_DEPTH", "20"))
+        self.deadline = deadline or float(os.getenv("JOB_DEADLINE", "600"))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="blog-job")
+        # Progress arrives on the shared event loop, which must never wait on SQLite's busy timeout.
+        # One writer thread applies job updates in order, so a late progress write cannot undo a final status.
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blog-job-writer")
+        self.active = 0
+        self.lock = threading.Lock()
+
+        # A job that was running when the last process died will never finish; queued ones are run here
+        interrupted, adopted = self.store.recover_orphaned("Interrupted by server restart")
+        if interrupted:
+            logging.warning(f"Marked {interrupted} interrupted jobs as failed")
+        for job in adopted:
+            with self.lock:
+                self.active += 1
+            # The job keeps its original deadline; one that ran out while the server was down expires at start
+            self.executor.submit(self._run, job["id"], job["params"], Deadline(job["deadline"] - time.time()))
+        if adopted:
+            logging.info(f"Re-queued {len(adopted)} jobs left queued by a previous process")
+
+    def submit(self, params: dict, deadline: float = None) -> str:
+        """Queue a generation and return its id; raises JobQueueFull when at capacity"""
+        with self.lock:
+            if self.active >= self.queue_depth:
+                raise JobQueueFull(f"Job queue is full ({self.queue_depth} jobs)")
+            self.active += 1
+
+        job_id = uuid.uuid4().hex
+        job_deadline = Deadline(deadline or self.deadline)
+        try:
+            self.store.create(job_id, params, job_deadline.expires_at)
+            self.executor.submit(self._run, job_id, params, job_deadline)
+        except Exception:
+            with self.lock:
+                self.active -= 1
+            raise
+        logging.info(f"Queued job {job_id} for topic: {params.get('topic')}")
+        return job_id
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def depth(self) -> int:
+        """Jobs queued or running in this process"""
+        with self.lock:
+            return self.active
+
+    def _write(self, job_id: str, **fields):
+        try:
+            self.store.update(job_id, **fields)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not update job {job_id}: {str(e)}")
+
+    def _run(self, job_id: str, params: dict, deadline: Deadline):
+        def update(**fields):
+            """Queue a write behind any progress still pending and wait for it"""
+            self.writer.submit(self._write, job_id, **fields).result()
+
+        def progress(stage, detail=None):
+            # Called from the event loop: the deadline check is cheap, the write is queued
+            deadline.check(stage)
+            self.writer.submit(self._write, job_id, stage=stage, detail=detail)
+
+        # The job id doubles as the trace id, so a slow job's trace is easy to find in the logs
+        trace, trace_token = start_trace(job_id)
+        try:
+            deadline.check("start")
+            update(status=RUNNING, stage="starting")
+            blog_content, document = self.agent.generate_blog_result(
+                topic=params["topic"],
+                intro_sentences=params["intro_sentences"],
+                content_paragraphs=params["content_paragraphs"],
+                summary_sentences=params["summary_sentences"],
+                progress=progress,
+                deadline=deadline,
+                force_refresh=params.get("force_refresh", False)
+            )
+            if blog_content.startswith("Error:"):
+                update(status=FAILED, stage=FAILED, error=blog_content)
+            else:
+                update(status=DONE, stage=DONE, result=blog_content,
+                       document=json.dumps(document.to_dict()) if document else None)
+        except DeadlineExceeded as e:
+            logging.warning(f"Job {job_id} expired: {str(e)}")
+            update(status=EXPIRED, error=str(e))
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            update(status=FAILED, error=str(e))
+        finally:
+            finish_trace(trace, trace_token)
+            with self.lock:
+                self.active -= 1
@@ -1,7 +1,11 @@
+import os
+import re
+import zlib
+
 class ShortTermMemory:
-    def __init__(self):
+    def __init__(self, max_research_items: int = 3):
         self.research_data = []
-        self.max_research_items = 3  # Limit to 3 research sources
+        self.max_research_items = max_research_items  # Limit the number of research sources
     
     def add_research(self, source: str, content: str):
         """Add research data to memory with size limit"""
@@ -39,4 +43,215 @@ class ShortTermMemory:
     
     def clear(self):
         """Clear all memory"""
-        self.research_data = []
\ No newline at end of file
+        self.research_data = []
+
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their this to was were will with
+""".split())
+
+WORD = re.compile(r"[a-z0-9]+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+FIELD = re.compile(r"^(Title|Summary|Snippet|URL):\s*(.*)$")
+FAILURE = re.compile(r"(Wikipedia|Web) search failed for:|All search engines failed|Could not complete research")
+
+
+def parse_records(content: str) -> list:
+    """Split a research result into (title, body, url) records"""
+    records = []
+    for block in re.split(r"\n\s*\n", content):
+        title, url, body = '', '', []
+        for line in block.split('\n'):
+            field = FIELD.match(line.strip())
+            if field and field.group(1) == 'Title':
+                title = field.group(2)
+            elif field and field.group(1) == 'URL':
+                url = field.group(2)
+            elif field:
+                body.append(field.group(2))
+            elif line.strip():
+                body.append(line.strip())
+        if body:
+            records.append((title, ' '.join(body), url))
+    return records
+
+
+class Snippet:
+    """One sentence-sized piece of a research result"""
+
+    def __init__(self, source: str, record: int, position: int, title: str, url: str, text: str):
+        self.source = source
+        self.record = record
+        self.position = position
+        self.title = title
+        self.url = url
+        self.text = text
+        self.words = WORD.findall(text.lower())
+        self.score = 0.0
+
+
+class ContextPacker:
+    """Packs research into a token budget: snippets, near-duplicate removal, relevance ranking
+
+    Near-duplicates are found with bottom-k MinHash over word shingles, so the
+    same fact reported by several search results is only paid for once.
+    """
+
+    def __init__(self, shingle_size: int = None, sketch_size: int = None, duplicate_threshold: float = None,
+                 max_snippet_words: int = None):
+        self.shingle_size = shingle_size or int(os.getenv("CONTEXT_SHINGLE_SIZE", "3"))
+        self.sketch_size = sketch_size or int(os.getenv("CONTEXT_SKETCH_SIZE", "32"))
+        self.duplicate_threshold = duplicate_threshold or float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.5"))
+        self.max_snippet_words = max_snippet_words or int(os.getenv("CONTEXT_MAX_SNIPPET_WORDS", "60"))
+
+    def pack(self, topic: str, research_data: list, token_budget: int) -> str:
+        """Best snippets for the topic that fit in token_budget, formatted like get_all_research"""
+        snippets = self.split(research_data)
+        if not snippets:
+            return "No research data available."
+
+        terms = [word for word in WORD.findall(topic.lower()) if word not in STOPWORDS]
+        for snippet in snippets:
+            snippet.score = self.score(snippet, terms)
+        ranked = self.dedupe(sorted(snippets, key=lambda snippet: -snippet.score))
+        chosen = self.fill(ranked, token_budget)
+        return self.format(chosen, [item['source'] for item in research_data])
+
+    def split(self, research_data: list) -> list:
+        """Break each source's results into sentence-sized snippets, skipping failure placeholders"""
+        snippets = []
+        for item in research_data:
+            content = item.get('content') or ''
+            if FAILURE.match(content):
+                continue
+            for record, (title, body, url) in enumerate(parse_records(content)):
+                position = 0
+                for sentence in SENTENCE_END.split(body):
+                    words = sentence.split()
+                    # Very long sentences are cut into pieces so one of them cannot eat the budget
+                    for start in range(0, len(words), self.max_snippet_words):
+                        text = ' '.join(words[start:start + self.max_snippet_words])
+                        if text:
+                            snippets.append(Snippet(item['source'], record, position, title, url, text))
+                            position += 1
+        return snippets
+
+    def score(self, snippet: Snippet, terms: list) -> float:
+        """Topic coverage and density, plus small bonuses for concrete figures and lead sentences"""
+        if not snippet.words:
+            return 0.0
+        present = set(snippet.words)
+        hits = sum(1 for word in snippet.words if word in terms)
+        coverage = sum(1 for term in set(terms) if term in present) / len(set(terms)) if terms else 0.0
+        density = min(1.0, 5.0 * hits / len(snippet.words))
+        figures = min(3, sum(1 for word in snippet.words if word[0].isdigit()))
+        # Very short fragments rarely carry a usable fact
+        brevity = 0.5 if len(snippet.words) < 5 else 1.0
+        return brevity * (coverage + 0.5 * density + 0.1 * figures + 0.2 / (1 + snippet.position))
+
+    def sketch(self, snippet: Snippet) -> set:
+        """Bottom-k MinHash sketch of the snippet's word shingles"""
+        words = snippet.words
+        k = self.shingle_size
+        shingles = {' '.join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = sorted({zlib.crc32(shingle.encode('utf-8')) for shingle in shingles})
+        return set(hashes[:self.sketch_size])
+
+    def similarity(self, a: set, b: set) -> float:
+        """Jaccard estimate from two bottom-k sketches"""
+        union = sorted(a | b)[:self.sketch_size]
+        if not union:
+            return 0.0
+        return sum(1 for value in union if value in a and value in b) / len(union)
+
+    def dedupe(self, ranked: list) -> list:
+        """Drop snippets that nearly repeat a better-scored one"""
+        kept = []
+        sketches = []
+        for snippet in ranked:
+            sketch = self.sketch(snippet)
+            if any(self.similarity(sketch, other) >= self.duplicate_threshold for other in sketches):
+                continue
+            kept.append(snippet)
+            sketches.append(sketch)
+        return kept
+
+    def fill(self, ranked: list, token_budget: int) -> list:
+        """Greedy fill by score, after first giving every source its best snippet"""
+        chosen = []
+        records = set()
+        used = 0
+
+        def cost(snippet):
+            # A record's title and URL are paid for once, with its first snippet
+            header = 0 if (snippet.source, snippet.record) in records else estimate_tokens(snippet.title + snippet.url) + 4
+            return estimate_tokens(snippet.text) + header
+
+        best_per_source = {}
+        for snippet in ranked:
+            best_per_source.setdefault(snippet.source, snippet)
+        first_pass = list(best_per_source.values())
+        leaders = set(first_pass)
+
+        for snippet in first_pass + [snippet for snippet in ranked if snippet not in leaders]:
+            needed = cost(snippet)
+            if used + needed > token_budget:
+                continue
+            chosen.append(snippet)
+            records.add((snippet.source, snippet.record))
+            used += needed
+        return chosen
+
+    def format(self, chosen: list, source_order: list) -> str:
+        """Group chosen snippets by source and record, in their original reading order"""
+        if not chosen:
+            return "No research data available."
+        formatted_data = []
+        for source in source_order:
+            picked = sorted((snippet for snippet in chosen if snippet.source == source),
+                            key=lambda snippet: (snippet.record, snippet.position))
+            if not picked:
+                continue
+            lines = [f"Source: {source}"]
+            record = None
+            for snippet in picked:
+                if snippet.record != record:
+                    if record is not None and url:
+                        lines.append(f"URL: {url}")
+                    record, url = snippet.record, snippet.url
+                    if snippet.title:
+                        lines.append(f"Title: {snippet.title}")
+                lines.append(snippet.text)
+            if url:
+                lines.append(f"URL: {url}")
+            formatted_data.append("\n".join(lines))
+        return "\n\n" + "\n\n".join(formatted_data)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text"""
+    return (len(text) + 3) // 4
+
+
+context_packer = ContextPacker()
+
+
+class ResearchContext(ShortTermMemory):
+    """Research gathered for a single generation request"""
+
+    def __init__(self, topic: str):
+        # Every source of a request is kept; the packer decides what reaches the prompt
+        super().__init__(max_research_items=int(os.getenv("RESEARCH_MAX_ITEMS", "8")))
+        self.topic = topic
+
+    def get_packed_research(self, token_budget: int) -> str:
+        """The most relevant, de-duplicated research for this topic within token_budget"""
+        return context_packer.pack(self.topic, self.research_data, token_budget)
+
+    def all_failed(self) -> bool:
+        """True when no source returned usable data"""
+        for item in self.research_data:
+            content = item.get('content', '')
+            if "failed" not in content.lower() and "error" not in content.lower():
+                return False
+        return True
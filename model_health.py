@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from circuit import CircuitBreaker, OPEN
+
+# Failure kinds reported by BlogAgent._attempt_model
+RATE_LIMITED = "rate_limited"
+HTTP_ERROR = "http_error"
+VALIDATION_FAILED = "validation_failed"
+ERROR = "error"
+
+
+class ModelStats:
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.attempts = 0
+        self.successes = 0
+        self.validation_failures = 0
+        self.rate_limited = 0
+        self.http_errors = 0
+        self.errors = 0
+        self.ewma_latency = None
+        self.last_error = None
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+
+    def success_rate(self) -> float:
+        # Laplace smoothing keeps unseen models competitive with proven ones
+        return (self.successes + 1) / (self.attempts + 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "validation_failures": self.validation_failures,
+            "rate_limited": self.rate_limited,
+            "http_errors": self.http_errors,
+            "errors": self.errors,
+            "ewma_latency": self.ewma_latency,
+            "last_error": self.last_error,
+            "success_rate": round(self.success_rate(), 4),
+            "validation_failure_rate": round(self.validation_failures / self.attempts, 4) if self.attempts else 0.0,
+            "breaker": self.breaker.to_dict(),
+        }
+
+    def load(self, data: dict):
+        for field in ("attempts", "successes", "validation_failures", "rate_limited", "http_errors", "errors", "ewma_latency", "last_error"):
+            if field in data:
+                setattr(self, field, data[field])
+        self.breaker.load(data.get("breaker", {}))
+
+
+class ModelHealthTracker:
+    """Per-model latency/success scoreboard that orders candidates and trips circuit breakers
+
+    The scoreboard is per process. The file only gives the next process a warm
+    start: it is written at most every save_interval seconds and at exit, and
+    when several workers share it the last one to write wins.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("MODEL_HEALTH_PATH", os.path.join("cache", "model_health.json"))
+        self.alpha = float(os.getenv("MODEL_HEALTH_EWMA_ALPHA", "0.3"))
+        self.failure_threshold = int(os.getenv("MODEL_BREAKER_FAILURES", "3"))
+        self.cooldown = float(os.getenv("MODEL_BREAKER_COOLDOWN", "600"))
+        # Latency assumed for models we have never timed, roughly a typical free-model response
+        self.default_latency = float(os.getenv("MODEL_HEALTH_DEFAULT_LATENCY", "30"))
+        self.save_interval = float(os.getenv("MODEL_HEALTH_SAVE_INTERVAL", "30"))
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        self._load()
+        atexit.register(self.flush)
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats(self.failure_threshold, self.cooldown)
+        return stats
+
+    def score(self, model: str) -> float:
+        """Expected successes per second of waiting; higher is better"""
+        stats = self._get(model)
+        latency = stats.ewma_latency if stats.ewma_latency is not None else self.default_latency
+        return stats.success_rate() / max(latency, 0.1)
+
+    def order(self, models: list) -> list:
+        """Return the models whose breaker lets traffic through, best score first"""
+        with self.lock:
+            candidates = [model for model in models if self._get(model).breaker.available()]
+            if not candidates:
+                # Every breaker is open: half-open the one that has been resting the longest, so begin() lets one probe through
+                resting = sorted((model for model in models if self._get(model).breaker.state == OPEN),
+                                 key=lambda model: self._get(model).breaker.opened_at)
+                if resting and self._get(resting[0]).breaker.force_probe():
+                    candidates = resting[:1]
+            # sorted() is stable, so ties keep the configured preference order
+            return sorted(candidates, key=self.score, reverse=True)
+
+    def begin(self, model: str) -> bool:
+        """Claim permission to call a model; False means its breaker is open or already probing"""
+        with self.lock:
+            breaker = self._get(model).breaker
+        return breaker.allow()
+
+    def release(self, model: str):
+        """End an attempt that produced no verdict, such as a cancelled hedge"""
+        with self.lock:
+            breaker = self._get(model).breaker
+        breaker.release()
+
+    def record_success(self, model: str, latency: float):
+        with self.lock:
+            stats = self._get(model)
+            stats.attempts += 1
+            stats.successes += 1
+            self._observe_latency(stats, latency)
+            stats.breaker.record_success()
+        self._changed()
+
+    def record_failure(self, model: str, kind: str, latency: float = None, detail: str = None):
+        with self.lock:
+            stats = self._get(model)
+            stats.attempts += 1
+            if kind == RATE_LIMITED:
+                stats.rate_limited += 1
+            elif kind == VALIDATION_FAILED:
+                stats.validation_failures += 1
+            elif kind == HTTP_ERROR:
+                stats.http_errors += 1
+            else:
+                stats.errors += 1
+            if latency is not None:
+                self._observe_latency(stats, latency)
+            stats.last_error = f"{kind}: {detail}" if detail else kind
+            was_open = stats.breaker.state == OPEN
+            stats.breaker.record_failure()
+            if not was_open and stats.breaker.state == OPEN:
+                logging.warning(f"Circuit opened for {model} after {stats.breaker.consecutive_failures} consecutive failures")
+        self._changed()
+
+    def _observe_latency(self, stats: ModelStats, latency: float):
+        if stats.ewma_latency is None:
+            stats.ewma_latency = latency
+        else:
+            stats.ewma_latency = self.alpha * latency + (1 - self.alpha) * stats.ewma_latency
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                model: dict(stats.to_dict(), score=round(self.score(model), 6))
+                for model, stats in self.stats.items()
+            }
+
+    def _changed(self):
+        """Note an update, persisting it if the last save is save_interval old; flush() at exit writes the rest"""
+        self.dirty = True
+        if time.monotonic() - self.last_saved >= self.save_interval:
+            self.save()
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def save(self):
+        """Persist the scoreboard atomically so a crash never leaves a truncated file"""
+        with self.lock:
+            data = {model: stats.to_dict() for model, stats in self.stats.items()}
+            self.dirty = False
+            self.last_saved = time.monotonic()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not persist model health: {str(e)}")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for model, entry in data.items():
+                self._get(model).load(entry)
+            logging.info(f"Loaded health for {len(data)} models from {self.path}")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable model health file: {str(e)}")
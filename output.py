@@ -12,8 +12,8 @@ class OutputManager:
         print("="*80)
     
     @staticmethod
-    def save_to_markdown(blog_content: str, topic: str, filename: str = None):
-        """Save blog content to markdown file"""
+    def save_to_markdown(blog_content: str, topic: str, filename: str = None, document=None):
+        """Save blog content to markdown file; a BlogDocument, if given, is written as real Markdown"""
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             safe_topic = "".join(c for c in topic if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -27,14 +27,14 @@ class OutputManager:
             f.write(f"# Blog: {topic}\n\n")
             f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
             f.write("---\n\n")
-            f.write(blog_content)
+            f.write(document.to_markdown() if document else blog_content)
         
         print(f"💾 Blog saved to: {filepath}")
         return filepath
     
     @staticmethod
-    def save_to_text(blog_content: str, topic: str, filename: str = None):
-        """Save blog content to text file"""
+    def save_to_text(blog_content: str, topic: str, filename: str = None, document=None):
+        """Save blog content to text file; a BlogDocument, if given, is written as plain text"""
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             safe_topic = "".join(c for c in topic if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -48,7 +48,7 @@ class OutputManager:
             f.write(f"Blog: {topic}\n")
             f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write("-" * 50 + "\n\n")
-            f.write(blog_content)
+            f.write(document.to_text() if document else blog_content)
         
         print(f"💾 Blog saved to: {filepath}")
         return filepath
\ No newline at end of file
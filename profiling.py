@@ -0,0 +1,167 @@
+"""
+On-demand profiling: a sampling profiler that snapshots every thread's stack
+at a fixed interval while a request (or a batch run) is in flight. The
+pipeline spreads one request over the event loop thread, executor threads
+and search threads, so a profiler attached to the calling thread alone would
+miss most of the work. On Linux, only threads that used CPU since the last
+sample are counted, so idle threads blocked on I/O or locks do not drown out
+the hot spots.
+
+Each session writes <dir>/<name>.txt (top functions by self and cumulative
+samples) and <dir>/<name>.folded (collapsed stacks for flamegraph tools).
+"""
+
+import os
+import sys
+import time
+import hmac
+import random
+import logging
+import threading
+from collections import Counter
+
+# Frames kept per sample; deeper stacks are cut at the root end
+MAX_DEPTH = 128
+
+
+def _thread_cpu(native_id):
+    """Nanoseconds the thread has spent on CPU, or None where the kernel does not say"""
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat", "r") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _stack(frame) -> tuple:
+    """(file, first line, function) frames from root to leaf"""
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _describe(frame: tuple) -> str:
+    filename, line, name = frame
+    # The parent directory tells re/__init__.py from json/__init__.py
+    short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    return f"{name} ({short}:{line})"
+
+
+class ProfileSession:
+    """One sampling run; stop() writes the profile and returns the summary path"""
+
+    def __init__(self, name: str, directory: str, interval: float, top: int):
+        self.name = name
+        self.directory = directory
+        self.interval = interval
+        self.top = top
+        self.stacks = Counter()
+        self.samples = 0
+        self.skipped_idle = 0
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        cpu = {}
+        while not self.done.wait(self.interval):
+            native_ids = {thread.ident: thread.native_id for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                used = _thread_cpu(native_ids.get(ident))
+                if used is not None:
+                    if used == cpu.get(ident):
+                        self.skipped_idle += 1
+                        continue
+                    cpu[ident] = used
+                self.stacks[_stack(frame)] += 1
+                self.samples += 1
+
+    def stop(self) -> str:
+        self.done.set()
+        self.thread.join()
+        duration = time.monotonic() - self.started
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.name)
+
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(";".join(_describe(frame) for frame in stack) + f" {count}\n")
+
+        own, cumulative = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            if stack:
+                own[stack[-1]] += count
+            # A recursive function counts once per sample
+            for frame in set(stack):
+                cumulative[frame] += count
+
+        total = max(self.samples, 1)
+        lines = [
+            f"Profile {self.name}: {duration:.2f}s, {self.samples} CPU samples every {self.interval * 1000:.0f}ms "
+            f"({self.skipped_idle} idle thread samples skipped)",
+            "",
+            f"Top {self.top} functions by self samples:",
+            f"{'self %':>8} {'cum %':>8}  function",
+        ]
+        for frame, count in own.most_common(self.top):
+            lines.append(f"{100.0 * count / total:8.1f} {100.0 * cumulative[frame] / total:8.1f}  {_describe(frame)}")
+        lines += ["", f"Top {self.top} functions by cumulative samples:", f"{'cum %':>8} {'self %':>8}  function"]
+        for frame, count in cumulative.most_common(self.top):
+            lines.append(f"{100.0 * count / total:8.1f} {100.0 * own[frame] / total:8.1f}  {_describe(frame)}")
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        hottest = own.most_common(1)
+        logging.info(f"Profile written to {base}.txt ({self.samples} samples"
+                     f"{f', hottest: {_describe(hottest[0][0])}' if hottest else ''})")
+        return f"{base}.txt"
+
+
+class Profiler:
+    """Decides which requests are profiled and runs one session at a time
+
+    The sampler sees every thread, so overlapping sessions would only blur each other.
+    """
+
+    def __init__(self, directory: str = None, admin_token: str = None, sample_percent: float = None,
+                 interval: float = None, top: int = None):
+        self.directory = directory or os.getenv("PROFILE_DIR", os.path.join("cache", "profiles"))
+        self.admin_token = admin_token if admin_token is not None else os.getenv("PROFILE_ADMIN_TOKEN", "")
+        self.sample_percent = sample_percent if sample_percent is not None else float(os.getenv("PROFILE_SAMPLE_PERCENT", "0"))
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL", "0.005"))
+        self.top = top or int(os.getenv("PROFILE_TOP", "25"))
+        self.active = None
+        self.lock = threading.Lock()
+
+    def wanted(self, token: str = None) -> bool:
+        """True for a request carrying the admin token, or one picked by PROFILE_SAMPLE_PERCENT"""
+        if token and self.admin_token and hmac.compare_digest(token.encode(), self.admin_token.encode()):
+            return True
+        return self.sample_percent > 0 and random.uniform(0, 100) < self.sample_percent
+
+    def start(self, label: str):
+        """Begin a session named after label, or None if another one is running"""
+        with self.lock:
+            if self.active is not None:
+                logging.info(f"Not profiling {label}: another profile is in progress")
+                return None
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}"
+            self.active = ProfileSession(name, self.directory, self.interval, self.top)
+            return self.active
+
+    def stop(self, session: ProfileSession) -> str:
+        try:
+            return session.stop()
+        finally:
+            with self.lock:
+                self.active = None
+
+
+profiler = Profiler()
@@ -0,0 +1,230 @@
+"""
+Web search racing: every engine whose circuit breaker is closed is queried at
+once and the first non-empty result wins. Failures are classified so only
+transient ones (timeouts, 5xx, 429) are retried. search() races in a thread
+pool; asearch() races tasks on the caller's event loop, using each engine's
+async variant when it has one.
+"""
+
+import os
+import time
+import asyncio
+import random
+import logging
+import contextvars
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import httpx
+import requests
+from ddgs.exceptions import DDGSException, RatelimitException, TimeoutException
+from aio import in_thread
+from circuit import CircuitBreaker
+from ratelimit import scheduler, parse_retry_after
+from deadline import DeadlineExceeded, budget, time_left
+from telemetry import span, SEARCH_SECONDS
+
+
+class SearchError(Exception):
+    """An engine failure; transient ones are worth retrying, after retry_after seconds when the engine said so"""
+
+    def __init__(self, message: str, transient: bool, retry_after: float = None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+
+def http_error(response) -> SearchError:
+    """SearchError for a non-200 response: 429 and 5xx are transient, other statuses are not
+
+    A 429 (or a 503 with Retry-After) also pauses the host in the shared scheduler,
+    so no process keeps hammering an engine that asked for a break.
+    """
+    status = response.status_code
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if status == 429 or (status == 503 and retry_after is not None):
+        scheduler.block(f"host:{urlparse(str(response.url)).hostname}", retry_after)
+    return SearchError(f"HTTP {status}", status == 429 or status >= 500, retry_after)
+
+
+def classify(error: Exception) -> SearchError:
+    if isinstance(error, SearchError):
+        return error
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, httpx.TransportError, TimeoutException, RatelimitException)):
+        return SearchError(str(error), True)
+    if isinstance(error, DDGSException):
+        # DDGS folds its backends' network errors into this one type
+        return SearchError(str(error), True)
+    return SearchError(f"{type(error).__name__}: {str(error)}", False)
+
+
+class SearchRacer:
+    """Runs named search engines concurrently (or in order) behind per-engine circuit breakers"""
+
+    def __init__(self, engines: list, mode: str = None, max_retries: int = None, timeout: float = None,
+                 max_retry_wait: float = None, failure_threshold: int = None, cooldown: float = None,
+                 async_engines: dict = None):
+        self.engines = engines
+        # name -> coroutine function used by asearch(); engines without one run in a worker thread there
+        self.async_engines = dict(async_engines or {})
+        self.mode = mode or os.getenv("SEARCH_MODE", "race")
+        self.max_retries = max_retries or int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+        self.timeout = timeout or float(os.getenv("SEARCH_RACE_TIMEOUT", "20"))
+        self.max_retry_wait = max_retry_wait or float(os.getenv("SEARCH_MAX_RETRY_WAIT", "10"))
+        failure_threshold = failure_threshold or int(os.getenv("SEARCH_BREAKER_FAILURES", "3"))
+        cooldown = cooldown or float(os.getenv("SEARCH_BREAKER_COOLDOWN", "120"))
+        self.breakers = {name: CircuitBreaker(failure_threshold, cooldown) for name, _ in engines}
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_RACE_WORKERS", "16")), thread_name_prefix="search")
+
+    def _retry_wait(self, name: str, error: SearchError, attempt: int):
+        """Seconds to wait before retrying a failed attempt, or None when the failure should be raised"""
+        wait_time = error.retry_after if error.retry_after is not None else (2 ** attempt) + random.uniform(0, 1)
+        if (not error.transient or attempt == self.max_retries - 1 or wait_time > self.max_retry_wait
+                or wait_time >= time_left(wait_time + 1)):
+            return None
+        logging.info(f"{name} search failed ({str(error)}), retrying in {wait_time:.1f}s")
+        return wait_time
+
+    def _attempt(self, name: str, engine, query: str) -> str:
+        """One engine with retries for transient failures only; every verdict feeds its breaker"""
+        breaker = self.breakers[name]
+        for attempt in range(self.max_retries):
+            if not breaker.allow():
+                raise SearchError(f"{name} circuit is open", False)
+            try:
+                with span("search_engine", SEARCH_SECONDS, engine=name) as labels:
+                    result = engine(query)
+                    if not (result and result.strip()):
+                        labels["outcome"] = "empty"
+            except DeadlineExceeded:
+                # Running out of the request's time is not the engine's fault
+                breaker.release()
+                raise
+            except Exception as e:
+                error = classify(e)
+                breaker.record_failure()
+                wait_time = self._retry_wait(name, error, attempt)
+                if wait_time is None:
+                    raise error
+                with span("retry_wait", engine=name):
+                    time.sleep(wait_time)
+                continue
+            breaker.record_success()
+            return result
+
+    async def _aattempt(self, name: str, engine, query: str) -> str:
+        """Async _attempt; a cancelled attempt (a race loser) releases its breaker without a verdict"""
+        breaker = self.breakers[name]
+        for attempt in range(self.max_retries):
+            if not breaker.allow():
+                raise SearchError(f"{name} circuit is open", False)
+            try:
+                with span("search_engine", SEARCH_SECONDS, engine=name) as labels:
+                    result = await engine(query)
+                    if not (result and result.strip()):
+                        labels["outcome"] = "empty"
+            except (DeadlineExceeded, asyncio.CancelledError):
+                breaker.release()
+                raise
+            except Exception as e:
+                error = classify(e)
+                breaker.record_failure()
+                wait_time = self._retry_wait(name, error, attempt)
+                if wait_time is None:
+                    raise error
+                with span("retry_wait", engine=name):
+                    await asyncio.sleep(wait_time)
+                continue
+            breaker.record_success()
+            return result
+
+    def search(self, query: str):
+        """First non-empty result from any available engine, or None if they all failed or came back empty"""
+        engines = [(name, engine) for name, engine in self.engines if self.breakers[name].available()]
+        if self.mode == "sequential":
+            for name, engine in engines:
+                try:
+                    result = self._attempt(name, engine, query)
+                except (SearchError, DeadlineExceeded) as e:
+                    logging.info(f"{name} search failed: {str(e)}")
+                    continue
+                if result and result.strip():
+                    return result
+            return None
+
+        timeout = budget(self.timeout, "web search")
+        # Each engine runs in a copy of the caller's context so it keeps the request's priority and deadline
+        futures = {self.executor.submit(contextvars.copy_context().run, self._attempt, name, engine, query): name
+                   for name, engine in engines}
+        pending = set(futures)
+        deadline = time.monotonic() + timeout
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                logging.warning(f"Search race for '{query}' timed out after {timeout:.1f}s")
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except (SearchError, DeadlineExceeded) as e:
+                    logging.info(f"{futures[future]} search failed: {str(e)}")
+                    continue
+                if result and result.strip():
+                    logging.info(f"{futures[future]} won the search race for '{query}'")
+                    # Losers still running finish in the background and keep their breakers honest
+                    for other in pending:
+                        other.cancel()
+                    return result
+        return None
+
+    def _async_engine(self, name: str, engine):
+        if name in self.async_engines:
+            return self.async_engines[name]
+
+        async def threaded(query: str) -> str:
+            return await in_thread(engine, query)
+        return threaded
+
+    async def asearch(self, query: str):
+        """Async search(): engines race as tasks on the running loop and the losers are cancelled"""
+        engines = [(name, self._async_engine(name, engine)) for name, engine in self.engines
+                   if self.breakers[name].available()]
+        if self.mode == "sequential":
+            for name, engine in engines:
+                try:
+                    result = await self._aattempt(name, engine, query)
+                except (SearchError, DeadlineExceeded) as e:
+                    logging.info(f"{name} search failed: {str(e)}")
+                    continue
+                if result and result.strip():
+                    return result
+            return None
+
+        timeout = budget(self.timeout, "web search")
+        # Tasks copy the caller's context, so each engine keeps the request's priority and deadline
+        tasks = {asyncio.ensure_future(self._aattempt(name, engine, query)): name for name, engine in engines}
+        pending = set(tasks)
+        deadline = time.monotonic() + timeout
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logging.warning(f"Search race for '{query}' timed out after {timeout:.1f}s")
+                    break
+                for task in done:
+                    try:
+                        result = task.result()
+                    except (SearchError, DeadlineExceeded) as e:
+                        logging.info(f"{tasks[task]} search failed: {str(e)}")
+                        continue
+                    if result and result.strip():
+                        logging.info(f"{tasks[task]} won the search race for '{query}'")
+                        return result
+            return None
+        finally:
+            # Unlike threads, losing requests can be stopped, which frees their connections at once
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> dict:
+        return {name: breaker.to_dict() for name, breaker in self.breakers.items()}
@@ -0,0 +1,285 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import sqlite3
+import itertools
+import threading
+import contextvars
+from email.utils import parsedate_to_datetime
+from storage import SQLiteStore
+from deadline import DeadlineExceeded, time_left
+from aio import in_thread
+from telemetry import record, RATE_WAIT_SECONDS
+
+# Lower runs first: interactive requests overtake queued batch work for the same upstream
+INTERACTIVE = 0
+BATCH = 10
+
+request_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+# How often a caller that is not first in line checks again
+POLL_INTERVAL = 0.05
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token, returning how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        wait_time = self._reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def parse_retry_after(value: str):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _refill(row, rate: float, burst: int, now: float):
+    """(tokens, blocked_until) of a bucket brought up to now"""
+    if row is None:
+        return float(burst), 0.0
+    tokens, updated, blocked_until = row
+    return min(burst, tokens + max(0.0, now - updated) * rate), blocked_until
+
+
+class LocalBuckets:
+    """Bucket state for this process only"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token if one is available (0.0), otherwise say how long until one will be"""
+        with self.lock:
+            now = time.time()
+            tokens, blocked_until = _refill(self.buckets.get(key), rate, burst, now)
+            self.buckets[key] = (tokens, now, blocked_until)
+            if now < blocked_until:
+                return blocked_until - now
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now, blocked_until)
+                return 0.0
+            return (1 - tokens) / rate
+
+    def block(self, key: str, seconds: float):
+        with self.lock:
+            tokens, updated, blocked_until = self.buckets.get(key, (0.0, time.time(), 0.0))
+            self.buckets[key] = (tokens, updated, max(blocked_until, time.time() + seconds))
+
+
+class SharedBuckets(SQLiteStore):
+    """Bucket state in SQLite so every worker process draws from the same quota"""
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL
+            )
+        """)
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated, blocked_until FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, blocked_until = _refill(row, rate, burst, now)
+            if now < blocked_until:
+                return blocked_until - now
+            wait_time = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait_time == 0.0:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated, blocked_until) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now, blocked_until)
+            )
+            return wait_time
+
+    def block(self, key: str, seconds: float):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated, blocked_until) VALUES (?, 0, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                (key, now, now + seconds)
+            )
+
+
+class RateScheduler:
+    """Token buckets per upstream ('host:<name>', 'openrouter:key', 'openrouter:model:<id>')
+
+    Callers queue per upstream in priority order, so interactive work takes the
+    next free token ahead of batch work. A Retry-After from an upstream blocks
+    its bucket for that long, for every process sharing the state file.
+    """
+
+    def __init__(self, path: str = None, shared: bool = None):
+        self.limits = {
+            "host": (float(os.getenv("RESEARCH_RATE_PER_HOST", "1")), int(os.getenv("RESEARCH_BURST_PER_HOST", "3"))),
+            "openrouter:key": (float(os.getenv("OPENROUTER_RATE_PER_MINUTE", "20")) / 60.0, int(os.getenv("OPENROUTER_BURST", "5"))),
+            "openrouter:model": (float(os.getenv("OPENROUTER_MODEL_RATE_PER_MINUTE", "20")) / 60.0, int(os.getenv("OPENROUTER_MODEL_BURST", "3"))),
+            # Generations started by every batch in every process, so concurrent batches cannot multiply the budget
+            "batch": (float(os.getenv("BATCH_RATE_PER_MINUTE", "20")) / 60.0, int(os.getenv("BATCH_BURST", "4"))),
+        }
+        self.default_block = float(os.getenv("RATE_LIMIT_DEFAULT_RETRY_AFTER", "30"))
+        if shared is None:
+            shared = os.getenv("RATE_LIMIT_SHARED", "1") == "1"
+        self.state = LocalBuckets()
+        if shared:
+            try:
+                self.state = SharedBuckets(path or os.getenv("RATE_LIMIT_STATE_PATH", os.path.join("cache", "ratelimit.db")))
+            except sqlite3.Error as e:
+                logging.warning(f"Shared rate limit state unavailable, limiting per process: {str(e)}")
+        self.queues = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def limits_for(self, key: str):
+        """(rate per second, burst) for a bucket: the most specific configured prefix wins"""
+        parts = key.split(":")
+        for end in range(len(parts), 0, -1):
+            limits = self.limits.get(":".join(parts[:end]))
+            if limits:
+                return limits
+        return self.limits["host"]
+
+    def _enqueue(self, key: str):
+        ticket = (request_priority.get(), next(self.counter))
+        with self.lock:
+            heapq.heappush(self.queues.setdefault(key, []), ticket)
+        return ticket
+
+    def _leave(self, key: str, ticket):
+        """Drop ticket from the queue, whether it got its token or gave up"""
+        with self.lock:
+            queue = self.queues[key]
+            if ticket in queue:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+
+    def _first_in_line(self, key: str, ticket) -> bool:
+        with self.lock:
+            return self.queues[key][0] == ticket
+
+    def _take(self, key: str) -> float:
+        """0.0 if key's bucket granted a token; otherwise how long until it may"""
+        try:
+            return self.state.take(key, *self.limits_for(key))
+        except sqlite3.Error as e:
+            # Never let a locked or broken state file stop traffic altogether
+            logging.warning(f"Rate limit state error for {key}: {str(e)}")
+            return 0.0
+
+    def _poll(self, key: str, ticket) -> float:
+        """0.0 once ticket holds a token; otherwise how long to sleep before asking again"""
+        if not self._first_in_line(key, ticket):
+            return POLL_INTERVAL
+        return self._take(key)
+
+    async def _apoll(self, key: str, ticket) -> float:
+        """_poll for coroutines: the shared state's SQLite transaction can wait out busy_timeout, so it runs in a thread"""
+        if not self._first_in_line(key, ticket):
+            return POLL_INTERVAL
+        if isinstance(self.state, SharedBuckets):
+            return await in_thread(self._take, key)
+        return self._take(key)
+
+    def acquire(self, key: str, max_wait: float = None) -> bool:
+        """Block until key's bucket grants a token; False if that would take longer than max_wait
+
+        Raises DeadlineExceeded instead when the wait would outlast the current request's deadline.
+        """
+        started = time.monotonic()
+        deadline_left = time_left()
+        ticket = self._enqueue(key)
+        try:
+            while True:
+                wait_time = self._poll(key, ticket)
+                if wait_time == 0.0:
+                    return True
+                waited = time.monotonic() - started
+                if max_wait is not None and waited + wait_time > max_wait:
+                    return False
+                if deadline_left is not None and waited + wait_time > deadline_left:
+                    raise DeadlineExceeded(f"Deadline exceeded waiting for {key}")
+                time.sleep(wait_time)
+        finally:
+            self._leave(key, ticket)
+            record("rate_limit_wait", time.monotonic() - started, RATE_WAIT_SECONDS, bucket=key)
+
+    async def aacquire(self, key: str, max_wait: float = None) -> bool:
+        """acquire() for coroutines; a cancelled caller gives up its place in the queue"""
+        started = time.monotonic()
+        deadline_left = time_left()
+        ticket = self._enqueue(key)
+        try:
+            while True:
+                wait_time = await self._apoll(key, ticket)
+                if wait_time == 0.0:
+                    return True
+                waited = time.monotonic() - started
+                if max_wait is not None and waited + wait_time > max_wait:
+                    return False
+                if deadline_left is not None and waited + wait_time > deadline_left:
+                    raise DeadlineExceeded(f"Deadline exceeded waiting for {key}")
+                await asyncio.sleep(wait_time)
+        finally:
+            self._leave(key, ticket)
+            record("rate_limit_wait", time.monotonic() - started, RATE_WAIT_SECONDS, bucket=key)
+
+    def block(self, key: str, retry_after: float = None):
+        """Hold back key's bucket after the upstream said to slow down (429/503)"""
+        seconds = retry_after if retry_after is not None else self.default_block
+        logging.info(f"Rate limited by {key}, pausing it for {seconds:.0f}s")
+        try:
+            self.state.block(key, seconds)
+        except sqlite3.Error as e:
+            logging.warning(f"Rate limit state error for {key}: {str(e)}")
+
+    def snapshot(self) -> dict:
+        """Callers currently waiting per upstream, by priority"""
+        with self.lock:
+            waiting = {}
+            for key, queue in self.queues.items():
+                if queue:
+                    waiting[key] = {"interactive": sum(1 for p, _ in queue if p <= INTERACTIVE),
+                                    "batch": sum(1 for p, _ in queue if p > INTERACTIVE)}
+            return waiting
+
+
+scheduler = RateScheduler()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Local full-text index (SQLite FTS5, BM25 ranking) of every research result
+and generated blog. research_topic asks it first and only goes to the live
+search engines when local coverage for a query is thin or stale.
+
+Usage: python research_index.py search "solar power india" [--kind blog]
+       python research_index.py import-blogs blogs/
+       python research_index.py stats
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+from storage import SQLiteStore
+from memory import WORD, STOPWORDS, parse_records
+
+RESEARCH = "research"
+BLOG = "blog"
+
+
+def match_query(text: str) -> str:
+    """FTS5 query requiring every meaningful word of text; None when nothing is left to match"""
+    terms = [term for term in WORD.findall(text.lower()) if term not in STOPWORDS]
+    if not terms:
+        return None
+    return ' AND '.join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+class ResearchIndex(SQLiteStore):
+    """Full-text store of research snippets and blogs, shared by every worker process"""
+
+    def __init__(self, path: str = None, max_documents: int = None):
+        self.max_documents = max_documents or int(os.getenv("RESEARCH_INDEX_MAX_DOCUMENTS", "50000"))
+        self.max_ages = {
+            "wikipedia": int(os.getenv("RESEARCH_INDEX_MAX_AGE_WIKIPEDIA", str(30 * 24 * 3600))),
+            "news": int(os.getenv("RESEARCH_INDEX_MAX_AGE_NEWS", str(6 * 3600))),
+            "web": int(os.getenv("RESEARCH_INDEX_MAX_AGE_WEB", str(7 * 24 * 3600))),
+        }
+        self.min_hits = {
+            "wikipedia": int(os.getenv("RESEARCH_INDEX_MIN_HITS_WIKIPEDIA", "1")),
+            "web": int(os.getenv("RESEARCH_INDEX_MIN_HITS_WEB", "3")),
+        }
+        self.inserts = 0
+        super().__init__(path or os.getenv("RESEARCH_INDEX_PATH", os.path.join("cache", "research_index.db")))
+
+    def _init_db(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                digest TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_source ON documents (kind, source, fetched_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_fetched ON documents (fetched_at)")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "title, body, content='documents', content_rowid='id', tokenize='porter unicode61')"
+        )
+        # Keep the external-content FTS table in step with documents
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+            END
+        """)
+
+    def max_age_for(self, source: str) -> int:
+        if source == "Wikipedia":
+            return self.max_ages["wikipedia"]
+        if "news" in source.lower():
+            return self.max_ages["news"]
+        return self.max_ages["web"]
+
+    def add_research(self, source: str, content: str):
+        """Index every record of a live research result under its source label (e.g. 'Latest News')"""
+        self._add([(RESEARCH, source, title, body, url) for title, body, url in parse_records(content)])
+
+    def add_blog(self, topic: str, document):
+        """Index a generated blog's body text so past blogs are searchable"""
+        body = ' '.join(text for kind, text in document.body() if kind in ('heading', 'paragraph'))
+        if body:
+            self._add([(BLOG, topic, document.title(), body, '')])
+
+    def _add(self, rows: list):
+        if not rows:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for kind, source, title, body, url in rows:
+                    digest = hashlib.sha1(f"{kind}\0{source}\0{url}\0{body}".encode("utf-8")).hexdigest()
+                    # Seeing the same text again just makes it fresh again
+                    conn.execute(
+                        "INSERT INTO documents (digest, kind, source, title, body, url, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(digest) DO UPDATE SET fetched_at = excluded.fetched_at",
+                        (digest, kind, source, title, body, url, now)
+                    )
+                self.inserts += len(rows)
+                if self.inserts >= 100:
+                    self.inserts = 0
+                    self._trim(conn)
+        except sqlite3.Error as e:
+            logging.warning(f"Research index write failed: {str(e)}")
+
+    def _trim(self, conn):
+        """Drop the oldest documents beyond max_documents"""
+        overflow = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - self.max_documents
+        if overflow > 0:
+            conn.execute("DELETE FROM documents WHERE id IN (SELECT id FROM documents ORDER BY fetched_at LIMIT ?)", (overflow,))
+
+    def lookup(self, source: str, topic: str):
+        """Fresh local results for a research query formatted like the live tools, or None if coverage is thin"""
+        query = match_query(topic)
+        if query is None:
+            return None
+        wikipedia = source == "Wikipedia"
+        needed = self.min_hits["wikipedia" if wikipedia else "web"]
+        try:
+            rows = self._connect().execute(
+                "SELECT d.title, d.body, d.url FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+                "WHERE documents_fts MATCH ? AND d.kind = ? AND d.source = ? AND d.fetched_at > ? "
+                "ORDER BY bm25(documents_fts) LIMIT ?",
+                (query, RESEARCH, source, time.time() - self.max_age_for(source), max(needed, 1 if wikipedia else 3))
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Research index lookup failed: {str(e)}")
+            return None
+        if len(rows) < needed:
+            return None
+        field = "Summary" if wikipedia else "Snippet"
+        return "\n\n".join(f"Title: {title}\n{field}: {body}\nURL: {url}" for title, body, url in rows)
+
+    def search(self, text: str, kind: str = None, limit: int = 10) -> list:
+        """Ranked matches for free text across research and blogs"""
+        query = match_query(text)
+        if query is None:
+            return []
+        sql = ("SELECT d.kind, d.source, d.title, d.url, d.fetched_at, snippet(documents_fts, 1, '', '', '…', 24), "
+               "bm25(documents_fts) FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid WHERE documents_fts MATCH ?")
+        params = [query]
+        if kind:
+            sql += " AND d.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY bm25(documents_fts) LIMIT ?"
+        params.append(limit)
+        columns = ("kind", "source", "title", "url", "fetched_at", "snippet", "score")
+        return [dict(zip(columns, row)) for row in self._connect().execute(sql, params)]
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall())
+        return {"documents": sum(counts.values()), "research": counts.get(RESEARCH, 0), "blogs": counts.get(BLOG, 0)}
+
+
+def _open_index():
+    try:
+        return ResearchIndex()
+    except sqlite3.Error as e:
+        # Some SQLite builds ship without FTS5; research then always goes to the network
+        logging.warning(f"Research index unavailable: {str(e)}")
+        return None
+
+
+research_index = _open_index() if os.getenv("RESEARCH_INDEX_ENABLED", "1") == "1" else None
+
+
+def import_blogs(index: ResearchIndex, directory: str) -> int:
+    """Index blogs saved by OutputManager; the topic comes from their 'Blog:' header line"""
+    from formatter import clean_model_output, parse_blog
+
+    imported = 0
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith((".md", ".txt")):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            text = f.read()
+        header, _, content = text.partition("\n\n")
+        topic = re.sub(r"^#?\s*Blog:\s*", "", header.split("\n")[0]).strip()
+        # Strip the "Generated on" line and the separator OutputManager writes before the blog
+        content = re.sub(r"^(Generated on:.*\n+)?(-{3,}\n+)?", "", content.lstrip())
+        content = re.sub(r"<[^>]+>", "\n", content)
+        index.add_blog(topic, parse_blog(clean_model_output(content)))
+        imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and feed the local research index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search_parser = commands.add_parser("search", help="Full-text search across research and blogs")
+    search_parser.add_argument("text")
+    search_parser.add_argument("--kind", choices=[RESEARCH, BLOG])
+    search_parser.add_argument("--limit", type=int, default=10)
+    import_parser = commands.add_parser("import-blogs", help="Index blogs previously saved to a directory")
+    import_parser.add_argument("directory", nargs="?", default="blogs")
+    commands.add_parser("stats", help="Document counts")
+    args = parser.parse_args()
+
+    if research_index is None:
+        print("❌ Research index is disabled or FTS5 is not available")
+        return 1
+
+    if args.command == "search":
+        for result in research_index.search(args.text, args.kind, args.limit):
+            print(f"[{result['kind']}/{result['source']}] {result['title']} {result['url']}\n    {result['snippet']}")
+    elif args.command == "import-blogs":
+        print(f"Indexed {import_blogs(research_index, args.directory)} blogs from {args.directory}")
+    else:
+        print(research_index.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Section-parallel generation: one short call plans the blog (title, subtitle,
+intro, per-section angles, summary and sources), every body section is then
+written by its own concurrent call, and the parts are stitched back into the
+same plain-text layout a single-call generation produces.
+
+split_document turns a finished blog back into those parts, so a revision
+only rewrites the parts that change.
+"""
+
+import re
+
+# Body sections in blog order; Future Outlook always closes the body
+SECTION_HEADINGS = [
+    "Policies & Reforms",
+    "Technology & Digital Transformation",
+    "Current Challenges & Real Data",
+    "Case Studies & Real-World Examples",
+    "Opportunities & Recommendations",
+]
+FUTURE_OUTLOOK = "Future Outlook & Predictions"
+
+PLAN_FIELD = re.compile(r'^\s*(TITLE|SUBTITLE|INTRO|OUTLINE|SUMMARY|SOURCES)\s*:[ \t]*', re.MULTILINE | re.IGNORECASE)
+LIST_MARK = re.compile(r'^\s*(?:\d+[.)]|[-•])\s*')
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def section_headings(content_paragraphs: int) -> list:
+    """One heading per body paragraph, ending with Future Outlook"""
+    return SECTION_HEADINGS[:max(0, content_paragraphs - 1)] + [FUTURE_OUTLOOK]
+
+
+def plan_prompt(topic: str, research_context: str, headings: list, intro_sentences: int, summary_sentences: int) -> str:
+    outline = '\n'.join(f"{index}. {heading}: <one sentence: the angle and key facts this section covers>"
+                        for index, heading in enumerate(headings, 1))
+    return f"""
+You are an expert blog writer planning a professional blog about "{topic}" using ONLY the research data provided.
+Other writers will write the body sections from your outline, so make each section's angle distinct.
+
+Research Data:
+{research_context}
+
+Reply in exactly this format, with nothing before or after it:
+
+TITLE: <one impactful, professional title, 10-15 words max>
+SUBTITLE: <one compelling subtitle, 20-30 words, saying what readers will learn>
+INTRO: <EXACTLY {intro_sentences} short, punchy sentences, each under 20 words: a powerful opening statement or statistic, why it matters now, what the blog explores>
+OUTLINE:
+{outline}
+SUMMARY: <EXACTLY {summary_sentences} distinct sentences that synthesize key insights, include a forward-looking statement ("Over the next 3-5 years...") and end with an actionable insight>
+SOURCES:
+- <main site name only, e.g. Wikipedia, one per line, no URLs>
+"""
+
+
+def parse_plan(content: str, headings: list):
+    """dict(title, subtitle, intro, angles, summary, sources) from a plan reply, or None if a part is missing"""
+    fields = {}
+    matches = list(PLAN_FIELD.finditer(content))
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(content)
+        fields.setdefault(match.group(1).upper(), content[match.end():end].strip())
+
+    if not all(fields.get(name) for name in ("TITLE", "SUBTITLE", "INTRO", "SUMMARY")):
+        return None
+
+    angles = []
+    for line in fields.get("OUTLINE", "").split('\n'):
+        line = LIST_MARK.sub('', line).strip()
+        if line:
+            # "Heading: angle" -> angle; a bare line is the angle itself
+            angles.append(line.split(':', 1)[1].strip() if ':' in line else line)
+    angles = (angles + [''] * len(headings))[:len(headings)]
+
+    sources = [LIST_MARK.sub('', line).strip() for line in fields.get("SOURCES", "").split('\n')]
+    return {
+        "title": fields["TITLE"].split('\n')[0].strip(),
+        "subtitle": fields["SUBTITLE"].split('\n')[0].strip(),
+        "intro": ' '.join(fields["INTRO"].split()),
+        "angles": angles,
+        "summary": ' '.join(fields["SUMMARY"].split()),
+        "sources": [source for source in sources if source] or ["Wikipedia"],
+    }
+
+
+def section_prompt(topic: str, research_context: str, plan: dict, headings: list, index: int, words: int) -> str:
+    outline = '\n'.join(f"- {heading}: {angle}" if angle else f"- {heading}" for heading, angle in zip(headings, plan["angles"]))
+    heading = headings[index]
+    position = "the first body section, so transition smoothly from the introduction" if index == 0 else (
+        "the last body section, so end with implications for readers and stakeholders" if index == len(headings) - 1
+        else f"body section {index + 1} of {len(headings)}, so open with a transition from the previous section")
+    return f"""
+You are an expert blog writer. Write ONE section of a blog about "{topic}" using ONLY the research data provided.
+
+Blog title: {plan["title"]}
+Introduction: {plan["intro"]}
+
+Full outline (other writers cover the other sections; do not repeat their material):
+{outline}
+
+Research Data:
+{research_context}
+
+Write the "{heading}" section: {plan["angles"][index] or heading}.
+This is {position}.
+
+CRITICAL WORD COUNT REQUIREMENT: write AT LEAST {words} words of detailed, analytical prose.
+- Start with a clear topic sentence
+- Include specific examples, names, dates and data from the research, citing sources inline
+- Explain the real-world impact and add analytical commentary, not just facts
+- Output ONLY the section's paragraph text: no heading, no title, no sources list, no notes
+"""
+
+
+def stitch(plan: dict, headings: list, sections: list) -> str:
+    """Blog text in the single-call layout: title, subtitle, intro, headed sections, summary, sources"""
+    parts = [plan["title"], plan["subtitle"], '', plan["intro"], '']
+    for heading, body in zip(headings, sections):
+        parts += [f"## {heading}", body.strip(), '']
+    parts += [plan["summary"], '', "Sources:"] + [f"- {source}" for source in plan["sources"]]
+    return '\n'.join(parts)
+
+
+def passage_prompt(topic: str, research_context: str, plan: dict, headings: list, part: str, sentences: int) -> str:
+    """Prompt for the intro or summary alone; part is intro or summary"""
+    if part == "intro":
+        guidance = ("- Sentence 1: open with a powerful statement or statistic\n"
+                    "- Sentence 2: explain the immediate impact or \"why now\"\n"
+                    "- Then preview what the blog will explore\n"
+                    "- Keep each sentence under 20 words")
+    else:
+        guidance = ("- Synthesize key insights; do not repeat the introduction or body facts\n"
+                    "- Include a forward-looking statement (\"Over the next 3-5 years...\")\n"
+                    "- End with an actionable insight or thought-provoking statement")
+    outline = '\n'.join(f"- {heading}" for heading in headings)
+    return f"""
+You are an expert blog writer. Write the {"introduction" if part == "intro" else "closing summary"} of a blog about "{topic}" using ONLY the research data provided.
+
+Blog title: {plan["title"]}
+Subtitle: {plan["subtitle"]}
+
+Sections of the blog:
+{outline}
+
+Research Data:
+{research_context}
+
+Write EXACTLY {sentences} distinct sentences:
+{guidance}
+- Output ONLY those sentences as one paragraph: no heading, no labels, no sources, no notes
+"""
+
+
+def heading_key(heading: str) -> str:
+    """Headings compare without case, markup or a trailing colon"""
+    return ' '.join(heading.replace('#', '').replace('*', '').strip().rstrip(':').casefold().split())
+
+
+def split_document(document, summary_sentences: int = 2) -> tuple:
+    """(plan, headings, bodies) of a parsed blog; stitch(plan, headings, bodies) rebuilds it
+
+    The summary has no heading of its own, so it is taken to be the last paragraph
+    of the last section when that section has more than one and the paragraph is
+    no longer than the summary was asked to be, give or take a sentence. Otherwise
+    the blog has no summary and the paragraph stays in its section.
+    """
+    title = subtitle = ''
+    intro, headings, bodies = [], [], []
+    for kind, text in document.body():
+        if kind == 'title':
+            title = text
+        elif kind == 'subtitle':
+            subtitle = text
+        elif kind == 'heading':
+            headings.append(text.replace('#', '').strip().rstrip(':').strip())
+            bodies.append([])
+        elif bodies:
+            bodies[-1].append(text)
+        else:
+            intro.append(text)
+
+    last = bodies[-1] if bodies else []
+    is_summary = len(last) > 1 and len(SENTENCE_END.split(last[-1])) <= summary_sentences + 1
+    summary = last.pop() if is_summary else ''
+    plan = {
+        "title": title,
+        "subtitle": subtitle,
+        "intro": ' '.join(intro),
+        "angles": [''] * len(headings),
+        "summary": summary,
+        "sources": document.sources() or ["Wikipedia"],
+    }
+    return plan, headings, ['\n\n'.join(paragraphs) for paragraphs in bodies]
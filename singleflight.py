@@ -0,0 +1,66 @@
+import os
+import time
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight computation
+
+    Finished results can optionally be served for result_ttl seconds afterwards,
+    which absorbs the tail of a burst that arrives just after the first call ends.
+    """
+
+    def __init__(self, result_ttl: float = None):
+        self.result_ttl = result_ttl if result_ttl is not None else float(os.getenv("COALESCE_RESULT_TTL", "0"))
+        self.in_flight = {}
+        self.recent = {}
+        self.lock = threading.Lock()
+        self.counters = {"leaders": 0, "coalesced": 0, "recent_hits": 0}
+
+    def do(self, key, fn, cacheable=None):
+        """Run fn() once per key at a time; returns (result, shared) where shared means another caller computed it
+
+        cacheable(result) decides whether a finished result may be kept for result_ttl.
+        """
+        with self.lock:
+            recent = self.recent.get(key)
+            if recent is not None:
+                result, expires_at = recent
+                if time.monotonic() < expires_at:
+                    self.counters["recent_hits"] += 1
+                    return result, True
+                del self.recent[key]
+
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+                self.counters["leaders"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            with self.lock:
+                del self.in_flight[key]
+            raise
+
+        # Publish before unregistering so callers arriving in between still share this result
+        future.set_result(result)
+        with self.lock:
+            del self.in_flight[key]
+            if self.result_ttl > 0 and (cacheable is None or cacheable(result)):
+                now = time.monotonic()
+                self.recent = {k: v for k, v in self.recent.items() if v[1] > now}
+                self.recent[key] = (result, now + self.result_ttl)
+        return result, False
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.in_flight), cached_results=len(self.recent))
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base for the local SQLite stores: one WAL-mode connection per thread, shared by every process"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_db(self._connect())
+
+    def _connect(self):
+        """Return this thread's connection; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self.local.conn = conn
+        return conn
+
+    def _init_db(self, conn):
+        """Create tables; subclasses override"""
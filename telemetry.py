@@ -0,0 +1,225 @@
+"""
+Low-overhead instrumentation: timing spans collected into a per-request trace,
+and counters/histograms exported in the Prometheus text format at /metrics.
+
+A span costs two perf_counter() calls, one histogram update under a lock and
+an append to the current trace, so it is cheap enough to leave on everywhere.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import bisect
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans range from cache lookups to minute-long model calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    """A label value as the text format requires: backslash, double quote and newline escaped"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    bucket_labels = _format_labels(self.labels, key, 'le="' + str(bound) + '"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {round(total, 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics plus gauges that are read from their owners at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.gauges = []
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, read, labels: tuple = ()):
+        """read() returns a number, or {label values tuple: number} when labels are given"""
+        self.gauges.append((name, help_text, read, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, help_text, read, labels in self.gauges:
+            try:
+                values = read()
+            except Exception as e:
+                # One broken source must not take the whole scrape down
+                logging.warning(f"Could not read gauge {name}: {str(e)}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            if labels:
+                lines.extend(f"{name}{_format_labels(labels, key)} {value}" for key, value in sorted(values.items()))
+            else:
+                lines.append(f"{name} {values}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram("blog_stage_seconds", "Time spent per pipeline stage", ("stage", "outcome"))
+RESEARCH_SECONDS = registry.histogram("blog_research_source_seconds", "Time per research source query", ("source", "outcome"))
+SEARCH_SECONDS = registry.histogram("blog_search_engine_seconds", "Time per web search engine attempt", ("engine", "outcome"))
+MODEL_SECONDS = registry.histogram("blog_model_attempt_seconds", "Time per OpenRouter model attempt", ("model", "outcome"))
+RATE_WAIT_SECONDS = registry.histogram("blog_rate_limit_wait_seconds", "Time spent waiting for a rate limit token", ("bucket",))
+REQUEST_SECONDS = registry.histogram("blog_http_request_seconds", "HTTP request latency", ("endpoint", "status"))
+TOKENS = registry.counter("blog_model_tokens_total", "Estimated prompt (in) and completion (out) tokens per model",
+                          ("model", "direction"))
+
+
+class Trace:
+    """Spans recorded for one request or job"""
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name: str, started: float, duration: float, labels: dict):
+        self.spans.append(dict(labels, name=name, start=round(started - self.started, 4), duration=round(duration, 4)))
+
+    def duration(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {"trace_id": self.trace_id, "duration": round(self.duration(), 4), "spans": list(self.spans)}
+
+
+# The trace of the request being served; run_sync and in_thread carry it into tasks and threads
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# Traces at least this long are logged as one JSON line when they finish
+TRACE_LOG_THRESHOLD = float(os.getenv("TRACE_LOG_THRESHOLD", "1.0"))
+
+# Caller-supplied trace ids are accepted only if they look like one
+TRACE_ID = re.compile(r"^[\w-]{1,64}$")
+
+
+def start_trace(trace_id: str = None):
+    """Begin a trace in the current context, reusing trace_id if it is valid; returns (trace, token) for finish_trace"""
+    trace = Trace(trace_id if trace_id and TRACE_ID.match(trace_id) else None)
+    return trace, current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token):
+    try:
+        current_trace.reset(token)
+    except ValueError:
+        # Streamed responses can finish in a different context than they started in
+        current_trace.set(None)
+    if trace.spans and trace.duration() >= TRACE_LOG_THRESHOLD:
+        logging.info(f"trace {json.dumps(trace.to_dict())}")
+
+
+def trace_id() -> str:
+    trace = current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def record(name: str, duration: float, histogram: Histogram = None, **labels):
+    """Record a duration measured elsewhere as a span that ends now"""
+    labels.setdefault("outcome", "ok")
+    STAGE_SECONDS.observe(duration, stage=name, outcome=labels["outcome"])
+    if histogram is not None:
+        histogram.observe(duration, **labels)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, time.perf_counter() - duration, duration, labels)
+
+
+@contextmanager
+def span(name: str, histogram: Histogram = None, **labels):
+    """Time a block into blog_stage_seconds, the optional histogram and the current trace
+
+    Yields labels so the block can add to them, e.g. labels["outcome"] = "rejected".
+    """
+    started = time.perf_counter()
+    try:
+        yield labels
+        labels.setdefault("outcome", "ok")
+    except BaseException as e:
+        labels.setdefault("outcome", "cancelled" if isinstance(e, asyncio.CancelledError) else "error")
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, stage=name, outcome=labels["outcome"])
+        if histogram is not None:
+            histogram.observe(duration, **labels)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(name, started, duration, labels)
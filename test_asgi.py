@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import pytest
+
+import asgi
+from formatter import BlogDocument
+
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url="http://blog.test")
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b"null", b"42", b'"topic"', b"{not json"])
+def test_generate_rejects_a_body_that_is_not_a_json_object(body):
+    async def post():
+        async with client() as http:
+            return await http.post("/generate", content=body, headers={"Content-Type": "application/json"})
+
+    response = asyncio.run(post())
+    assert response.status_code == 400
+    assert "JSON" in response.json()["error"]
+
+
+@pytest.mark.parametrize("body", [{}, {"topic": 5}, {"topic": ["AI"]}, {"topic": "   "}])
+def test_generate_requires_a_topic_string(body):
+    async def post():
+        async with client() as http:
+            return await http.post("/generate", json=body)
+
+    response = asyncio.run(post())
+    assert response.status_code == 400
+    assert response.json()["error"] == "Topic is required"
+
+
+def test_identical_requests_share_one_generation_task(monkeypatch):
+    calls = []
+
+    async def agenerate_blog_result(**kwargs):
+        calls.append(kwargs["topic"])
+        # Stay in flight until every request has joined
+        await asyncio.sleep(0.2)
+        return "<p>shared</p>", BlogDocument([("paragraph", "shared")])
+    monkeypatch.setattr(asgi.agent, "agenerate_blog_result", agenerate_blog_result)
+
+    async def post_together():
+        async with client() as http:
+            return await asyncio.gather(*(http.post("/generate", json={"topic": topic, "blog_size": [1]})
+                                          for topic in ["AI in Finance", "ai in fianance", "AI for finance!", "AI in Finance"]))
+
+    responses = asyncio.run(post_together())
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [200] * 4
+    assert {response.json()["blog_content"] for response in responses} == {"<p>shared</p>"}
+    assert sorted(response.json()["coalesced"] for response in responses) == [False, True, True, True]
+    assert asgi.in_flight == {}
+
+
+def test_other_routes_are_served_by_the_flask_app():
+    async def get(path):
+        async with client() as http:
+            return await http.get(path)
+
+    assert asyncio.run(get("/coalescing/stats")).json()["success"] is True
+    assert asyncio.run(get("/health")).json()["status"] == "ok"
+    assert asyncio.run(get("/no-such-route")).status_code == 404
@@ -0,0 +1,123 @@
+import json
+import sys
+import threading
+
+import pytest
+
+import agent as agent_module
+import batch
+from batch import BatchRunner, completed_ids, read_jsonl
+from formatter import BlogDocument
+from ratelimit import scheduler
+
+
+class BatchAgent:
+    """Records research and generations; topics name their outcome: 'explode' raises, 'fail' returns an error"""
+
+    def __init__(self):
+        self.researched = []
+        self.generated = []
+        self.lock = threading.Lock()
+
+    def research_topic(self, topic):
+        with self.lock:
+            self.researched.append(topic)
+        return f"research on {topic}"
+
+    def cached_blog_result(self, *args):
+        return None
+
+    def generate_blog_result(self, topic, intro_sentences, content_paragraphs, summary_sentences, context=None, **kwargs):
+        with self.lock:
+            self.generated.append((topic, content_paragraphs, context))
+        if "explode" in topic:
+            raise RuntimeError("model client exploded")
+        if "fail" in topic:
+            return "Error: All models failed", None
+        return f"<p>{topic}</p>", BlogDocument([("paragraph", topic)])
+
+
+@pytest.fixture(autouse=True)
+def batch_budget(monkeypatch):
+    """A budget roomy enough that no test waits for it, recording every draw"""
+    monkeypatch.setitem(scheduler.limits, "batch", (1000.0, 1000))
+    draws = []
+    acquire = scheduler.acquire
+    monkeypatch.setattr(scheduler, "acquire", lambda key, *args: draws.append(key) or acquire(key, *args))
+    return draws
+
+
+def test_identical_topics_are_generated_once_and_share_research(batch_budget):
+    agent = BatchAgent()
+    items = [{"topic": "AI in Finance", "id": "a"}, {"topic": "ai in fianance ", "id": "b"},
+             {"topic": "AI for finance!", "blog_size": "small", "id": "c"}, {"topic": "Solar power", "id": "d"}]
+
+    records = {record["id"]: record for record in BatchRunner(agent, concurrency=2).run(items)}
+
+    assert sorted(records) == ["a", "b", "c", "d"]
+    assert {record["status"] for record in records.values()} == {"ok"}
+    # Every item keeps its own wording; a and b share one generation
+    assert records["b"]["topic"] == "ai in fianance " and records["b"]["blog_content"] == records["a"]["blog_content"]
+    assert len(agent.generated) == 3
+    assert len(agent.researched) == 2 and "Solar power" in agent.researched
+    finance = [context for topic, _, context in agent.generated if "inance" in topic]
+    assert len(set(finance)) == 1
+    assert batch_budget.count(batch.BATCH_BUDGET) == 3
+
+
+def test_one_bad_item_does_not_stop_the_batch():
+    agent = BatchAgent()
+    items = [{"topic": "explode please"}, {"topic": "fail please"}, None, {"topic": 5}, {"topic": "Solar power"}]
+
+    records = {record["id"]: record for record in BatchRunner(agent, concurrency=2).run(items)}
+
+    assert records["0"]["status"] == "error" and records["0"]["error"] == "model client exploded"
+    assert records["1"]["error"] == "Error: All models failed"
+    assert records["2"]["error"].startswith("Each item must be")
+    assert records["3"]["error"] == "Topic is required"
+    assert records["4"]["status"] == "ok"
+
+
+def test_a_per_batch_rate_caps_only_that_batch(batch_budget):
+    assert BatchRunner(BatchAgent()).budget is None
+    capped = BatchRunner(BatchAgent(), concurrency=2, rate_per_minute=6)
+    assert capped.budget.rate == 0.1 and capped.budget.burst == 2
+
+    list(capped.run([{"topic": "Solar power"}]))
+    assert batch_budget == [batch.BATCH_BUDGET]
+
+
+def run_cli(monkeypatch, agent, *args):
+    monkeypatch.setattr(agent_module, "BlogAgent", lambda: agent)
+    monkeypatch.setattr(sys, "argv", ["batch.py", *map(str, args)])
+    return batch.main()
+
+
+def test_cli_resumes_from_its_output_file(monkeypatch, tmp_path):
+    source, output = tmp_path / "topics.jsonl", tmp_path / "results.jsonl"
+    source.write_text('{"topic": "Solar power", "id": "solar"}\n{"topic": "fail first", "id": "flaky"}\nnot json\n')
+
+    first = BatchAgent()
+    assert run_cli(monkeypatch, first, source, output) == 1
+    assert completed_ids(str(output)) == {"solar"}
+
+    # A run killed mid-write leaves a partial line; the next run ignores it
+    with open(output, "a") as out:
+        out.write('{"id": "flaky", "sta')
+    source.write_text('{"topic": "Solar power", "id": "solar"}\n{"topic": "fine now", "id": "flaky"}\n')
+    second = BatchAgent()
+    assert run_cli(monkeypatch, second, source, output) == 0
+
+    assert [topic for topic, _, _ in second.generated] == ["fine now"]
+    assert completed_ids(str(output)) == {"solar", "flaky"}
+    assert len(read_jsonl(str(source))) == 2
+
+
+def test_read_jsonl_keeps_bad_lines_as_invalid_items(tmp_path):
+    source = tmp_path / "topics.jsonl"
+    source.write_text('{"topic": "A"}\n\n{broken\n[1]\n')
+
+    items = read_jsonl(str(source))
+    assert items == [{"topic": "A"}, None, [1]]
+    records = list(BatchRunner(BatchAgent()).run(items))
+    assert [record["status"] for record in sorted(records, key=lambda record: record["id"])] == ["ok", "error", "error"]
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+import agent as agent_module
+import cache
+from cache import BlogCache, ResearchCache
+
+
+class Clock:
+    """Stands in for the time module so entries can be aged without sleeping"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+def test_research_cache_keys_on_source_and_normalized_query(tmp_path):
+    research = ResearchCache(str(tmp_path / "research.db"))
+    research.set("wikipedia", "  AI   in Finance ", "facts")
+
+    assert research.get("wikipedia", "ai in finance") == "facts"
+    assert research.get("web", "ai in finance") is None
+    assert research.get("wikipedia", "ai finance") is None
+    stats = research.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_research_cache_ttl_depends_on_source_and_query(tmp_path):
+    research = ResearchCache(str(tmp_path / "research.db"))
+
+    assert research.ttl_for("wikipedia", "ai news") == research.ttls["wikipedia"]
+    assert research.ttl_for("web", "ai finance news") == research.ttls["news"]
+    assert research.ttl_for("web", "ai finance") == research.ttls["web"]
+
+
+def test_research_cache_entries_expire_after_their_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    research = ResearchCache(str(tmp_path / "research.db"))
+    research.set("web", "ai finance news", "headlines")
+    research.set("web", "ai finance", "analysis")
+
+    clock.now += research.ttls["news"] + 1
+    assert research.get("web", "ai finance news") is None
+    assert research.get("web", "ai finance") == "analysis"
+
+    clock.now += research.ttls["web"]
+    assert research.get("web", "ai finance") is None
+    # Expired rows are swept on the next write
+    research.set("wikipedia", "ai", "article")
+    assert research.stats()["entries"] == 1
+
+
+def test_research_cache_evicts_least_recently_used(tmp_path):
+    research = ResearchCache(str(tmp_path / "research.db"), max_entries=2)
+    research.set("web", "first", "1")
+    research.set("web", "second", "2")
+    research.get("web", "first")
+    research.set("web", "third", "3")
+
+    assert research.get("web", "second") is None
+    assert research.get("web", "first") == "1"
+    assert research.stats()["evictions"] == 1
+
+
+def test_blog_cache_hit_and_miss(tmp_path):
+    blogs = BlogCache(str(tmp_path / "blogs.db"), ttl=60)
+
+    assert blogs.get("ai finance", "medium") is None
+    blogs.set("ai finance", "medium", "<p>blog</p>", {"blocks": [["paragraph", "blog"]], "sources_at": None})
+
+    assert blogs.get("ai finance", "medium") == ("<p>blog</p>", {"blocks": [["paragraph", "blog"]], "sources_at": None})
+    assert blogs.get("ai finance", "large") is None
+    stats = blogs.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_blog_cache_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    blogs = BlogCache(str(tmp_path / "blogs.db"), ttl=60)
+    blogs.set("ai finance", "medium", "<p>blog</p>", {"blocks": []})
+
+    clock.now += 59
+    assert blogs.get("ai finance", "medium") is not None
+    clock.now += 2
+    assert blogs.get("ai finance", "medium") is None
+
+
+def test_blog_cache_evicts_least_recently_used(tmp_path):
+    blogs = BlogCache(str(tmp_path / "blogs.db"), max_entries=2)
+    blogs.set("first", "medium", "1", {})
+    blogs.set("second", "medium", "2", {})
+    blogs.get("first", "medium")
+    blogs.set("third", "medium", "3", {})
+
+    assert blogs.get("second", "medium") is None
+    assert blogs.get("first", "medium") is not None
+    assert blogs.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def cached_agent(monkeypatch, tmp_path, fake_agent):
+    """fake_agent with a blog cache of its own"""
+    monkeypatch.setattr(agent_module, "blog_cache", BlogCache(str(tmp_path / "blogs.db")))
+    return fake_agent
+
+
+def test_repeated_topic_is_served_from_cache(cached_agent, fake_model):
+    first = cached_agent.generate_blog("AI in Finance")
+    second = cached_agent.generate_blog("ai in fianance ")
+
+    assert len(fake_model.prompts) == 1
+    assert second == first
+    # Another size is another blog
+    cached_agent.generate_blog("AI in Finance", 4, 6, 3)
+    assert len(fake_model.prompts) == 2
+
+
+def test_force_refresh_bypasses_and_replaces_cached_blog(cached_agent, fake_model):
+    first = cached_agent.generate_blog("AI in Finance")
+    refreshed = cached_agent.generate_blog("AI in Finance", force_refresh=True)
+
+    assert len(fake_model.prompts) == 2
+    assert refreshed != first
+    assert cached_agent.generate_blog("AI in Finance") == refreshed
+    assert len(fake_model.prompts) == 2
@@ -0,0 +1,33 @@
+from canonical import TopicCanonicalizer, canonical_topic, correct_topic
+
+
+def test_variants_of_one_topic_share_a_key():
+    variants = ["AI in Fianance", "ai in finance ", "AI  for finance!", "The AI of Finance"]
+    assert {canonical_topic(topic) for topic in variants} == {"ai finance"}
+
+
+def test_words_that_change_the_subject_tell_topics_apart():
+    for group in [["AI vs Finance", "AI and Finance", "AI in Finance", "AI or Finance"],
+                  ["Why startups fail", "How startups fail", "What startups fail"],
+                  ["Migration to the cloud", "Migration from the cloud", "Migration into the cloud"]]:
+        assert len({canonical_topic(topic) for topic in group}) == len(group), group
+
+
+def test_a_topic_of_only_stop_words_still_has_a_key():
+    assert canonical_topic("The Of") == "the of"
+    assert canonical_topic("The Of") != canonical_topic("In")
+
+
+def test_word_order_tells_topics_apart():
+    assert canonical_topic("Impact of AI on Jobs") != canonical_topic("Impact of Jobs on AI")
+    assert canonical_topic("Java to Python migration") != canonical_topic("Python to Java migration")
+
+
+def test_correct_topic_keeps_the_users_wording():
+    assert correct_topic("  AI in  Fianance ") == "AI in Finance"
+    assert correct_topic("GOVERMENT technlogy") == "GOVERNMENT technology"
+
+
+def test_extra_corrections_apply_to_keys():
+    canonicalizer = TopicCanonicalizer({"Agriculure": "agriculture"})
+    assert canonicalizer.key("AI in Agriculure") == canonicalizer.key("ai for agriculture")
@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app as app_module
+from formatter import BlogDocument
+
+TOPICS = [f"Topic {i}" for i in range(16)]
+
+
+def test_concurrent_requests_are_isolated(fake_agent):
+    with ThreadPoolExecutor(max_workers=len(TOPICS)) as executor:
+        prompts = list(executor.map(fake_agent.generate_blog, TOPICS))
+
+    for topic, prompt in zip(TOPICS, prompts):
+        mentioned = {other for other in TOPICS if f"<<{other}>>" in prompt}
+        assert mentioned == {topic}, f"{topic} saw research for {sorted(mentioned)}"
+
+
+def test_research_contexts_are_independent(fake_agent):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        contexts = list(executor.map(fake_agent.research_topic, TOPICS[:4]))
+
+    assert len({id(context) for context in contexts}) == 4
+    for topic, context in zip(TOPICS, contexts):
+        assert context.topic == topic
+        assert all(f"<<{topic}>>" in item['content'] for item in context.research_data)
+
+
+def post_together(bodies):
+    """POST every body to /generate at once, each from its own client"""
+    with ThreadPoolExecutor(max_workers=len(bodies)) as executor:
+        return list(executor.map(lambda body: app_module.app.test_client().post('/generate', json=body), bodies))
+
+
+def wait_for_followers(coalescer, count, timeout=5.0):
+    """Hold the leader until count other callers are waiting on its result"""
+    target = coalescer.stats()["coalesced"] + count
+    give_up = time.monotonic() + timeout
+    while coalescer.stats()["coalesced"] < target and time.monotonic() < give_up:
+        time.sleep(0.01)
+
+
+def test_identical_generate_requests_share_one_generation(monkeypatch):
+    bodies = [{"topic": topic} for topic in ["AI in Finance", "ai in finance", "AI  in Fianance", "AI for finance!"] * 2]
+    calls = []
+
+    def generate_blog_result(**kwargs):
+        calls.append(kwargs["topic"])
+        wait_for_followers(app_module.coalescer, len(bodies) - 1)
+        return "<p>shared</p>", BlogDocument([("paragraph", "shared")])
+
+    monkeypatch.setattr(app_module.agent, "generate_blog_result", generate_blog_result)
+    responses = post_together(bodies)
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [200] * len(bodies)
+    assert {response.json["blog_content"] for response in responses} == {"<p>shared</p>"}
+    assert sorted(response.json["coalesced"] for response in responses) == [False] + [True] * (len(bodies) - 1)
+
+
+def test_generation_error_reaches_every_waiter(monkeypatch):
+    bodies = [{"topic": "Quantum Computing"}] * 6
+    calls = []
+
+    def generate_blog_result(**kwargs):
+        calls.append(kwargs["topic"])
+        wait_for_followers(app_module.coalescer, len(bodies) - 1)
+        raise RuntimeError("upstream exploded")
+
+    monkeypatch.setattr(app_module.agent, "generate_blog_result", generate_blog_result)
+    responses = post_together(bodies)
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [500] * len(bodies)
+    assert all("upstream exploded" in response.json["error"] for response in responses)
+    # A failed generation is not remembered; the next request tries again
+    assert app_module.coalescer.stats()["in_flight"] == 0
+
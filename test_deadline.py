@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+import app as app_module
+from deadline import AdmissionController, AdmissionRejected, Deadline, DeadlineExceeded
+
+
+@pytest.fixture
+def client(monkeypatch, fake_agent):
+    monkeypatch.setattr(app_module, "agent", fake_agent)
+    monkeypatch.setattr(app_module, "admission", AdmissionController(capacity=1, max_in_flight=4, initial_estimate=10))
+    return app_module.app.test_client()
+
+
+class FakeStream:
+    """A streamed OpenRouter response that sends a new delta every interval and never finishes on its own"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.status_code = 200
+        self.encoding = None
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        for i in range(1000):
+            time.sleep(self.interval)
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": f"word{i} "}}]})
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def test_admission_turns_away_requests_whose_deadline_cannot_be_met():
+    admission = AdmissionController(capacity=1, max_in_flight=4, initial_estimate=10)
+    admission.admit(Deadline(60))
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        # One generation is already running, so this one would finish in about 20s
+        admission.admit(Deadline(15))
+    assert rejected.value.retry_after == 10
+    admission.admit(Deadline(25))
+
+    admission.release(20)
+    admission.release()
+    assert admission.stats()["in_flight"] == 0
+    assert admission.stats()["typical_duration"] == 12.0
+
+
+@pytest.mark.parametrize("path", ["/generate", "/generate/stream"])
+def test_rejected_requests_get_503_with_retry_after(client, monkeypatch, path):
+    monkeypatch.setattr(app_module.agent, "generate_blog_result", lambda **kwargs: pytest.fail("generated"))
+
+    response = client.post(path, json={"topic": "AI in Finance", "deadline": 5})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "11"
+    assert app_module.admission.stats()["rejected"] == 1
+
+
+@pytest.mark.parametrize("path", ["/generate", "/generate/stream", "/jobs"])
+@pytest.mark.parametrize("deadline", ["soon", -5, [30]])
+def test_deadline_must_be_a_positive_number_of_seconds(client, path, deadline):
+    response = client.post(path, json={"topic": "AI in Finance", "deadline": deadline})
+
+    assert response.status_code == 400
+    assert "deadline" in response.json["error"]
+
+
+def test_generation_out_of_time_is_a_504(client, monkeypatch):
+    def generate_blog_result(**kwargs):
+        raise DeadlineExceeded("Deadline exceeded while generating")
+    monkeypatch.setattr(app_module.agent, "generate_blog_result", generate_blog_result)
+
+    response = client.post("/generate", json={"topic": "AI in Finance", "deadline": 30})
+
+    assert response.status_code == 504
+    assert "within the deadline" in response.json["error"]
+    # The slot is freed and a timed-out run teaches admission control nothing
+    assert app_module.admission.stats()["in_flight"] == 0
+    assert app_module.admission.stats()["typical_duration"] == 10
+
+
+def test_stream_stops_at_the_deadline_without_blaming_the_model(fake_agent):
+    stream = FakeStream(0.02)
+    fake_agent.models = ["stream/model"]
+    fake_agent._post_openrouter = lambda model, prompt, **kwargs: stream
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        for event, payload in fake_agent.generate_blog_stream("AI in Finance", deadline=Deadline(1.0)):
+            pass
+
+    assert time.monotonic() - started < 1.5
+    assert stream.closed
+    stats = fake_agent.model_health.snapshot()["stream/model"]
+    assert stats["attempts"] == 0 and stats["errors"] == 0 and stats["validation_failures"] == 0
+    assert fake_agent.model_health.begin("stream/model")
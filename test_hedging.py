@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from agent import BlogAgent
+
+
+def hedging_agent(models, delay):
+    agent = BlogAgent()
+    agent.models = models
+    agent.early_abort = True
+    agent.hedge_parallelism = 2
+    agent.hedge_delay = delay
+    # Try the models in the order given rather than by score
+    agent.model_health.order = lambda models: list(models)
+    return agent
+
+
+def finalize(model, content, latency):
+    return model, content
+
+
+def test_hedge_wins_over_a_stalled_model_and_the_loser_is_not_blamed(fake_openrouter):
+    fake_openrouter.script("slow/model", ["never ", "arrives"], delay=30)
+    fake_openrouter.script("fast/model", ["hedged ", "answer"], delay=0.01)
+    agent = hedging_agent(["slow/model", "fast/model"], delay=0.1)
+
+    started = time.monotonic()
+    result = asyncio.run(agent._agenerate_with_openrouter("prompt", "topic", finalize=finalize))
+
+    assert result == ("fast/model", "hedged answer")
+    assert time.monotonic() - started < 2
+    # Cancelling the stalled attempt closed its stream and left no mark on its health
+    assert "slow/model" in fake_openrouter.closed
+    stats = agent.model_health.snapshot()["slow/model"]
+    assert stats["attempts"] == 0 and stats["errors"] == 0 and stats["validation_failures"] == 0
+    assert agent.model_health.begin("slow/model")
+
+
+def test_no_hedge_before_the_delay(fake_openrouter):
+    fake_openrouter.script("first/model", ["first ", "answer"], delay=0.01)
+    fake_openrouter.script("second/model", ["second ", "answer"], delay=0.01)
+    agent = hedging_agent(["first/model", "second/model"], delay=5)
+
+    result = asyncio.run(agent._agenerate_with_openrouter("prompt", "topic", finalize=finalize))
+
+    assert result == ("first/model", "first answer")
+    assert fake_openrouter.closed == ["first/model"]
+
+
+def test_a_failed_model_is_replaced_at_once(fake_openrouter):
+    fake_openrouter.script("broken/model", [], status=500)
+    fake_openrouter.script("backup/model", ["backup ", "answer"], delay=0.01)
+    agent = hedging_agent(["broken/model", "backup/model"], delay=5)
+
+    started = time.monotonic()
+    result = asyncio.run(agent._agenerate_with_openrouter("prompt", "topic", finalize=finalize))
+
+    assert result == ("backup/model", "backup answer")
+    assert time.monotonic() - started < 2
+    assert agent.model_health.snapshot()["broken/model"]["http_errors"] == 1
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+import requests
+
+from http_client import HttpClient, AsyncHttpClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowStreamHandler(KeepAliveHandler):
+    """Sends ten lines 0.1s apart: no single read is slow, but the whole body takes a second"""
+
+    def do_GET(self):
+        # Chunked, like a model's event stream, so each line can be read as it arrives
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(10):
+            line = b"line %d\n" % i
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            time.sleep(0.1)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(handler=KeepAliveHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_sync_client_reuses_its_connection():
+    server, url = serve()
+    try:
+        client = HttpClient()
+        for _ in range(3):
+            assert client.get(url).text == "ok"
+        assert client.stats()["127.0.0.1"] == {"requests": 3, "connections_opened": 1, "reused": 2}
+    finally:
+        server.shutdown()
+
+
+def test_async_client_counts_requests_and_new_connections():
+    server, url = serve()
+    client = AsyncHttpClient(HttpClient())
+
+    async def fetch():
+        for _ in range(3):
+            response = await client.request("GET", url)
+            assert response.text == "ok"
+        async with client.stream("GET", url) as response:
+            await response.aread()
+        await client.client().aclose()
+
+    try:
+        asyncio.run(fetch())
+        assert client.stats()["127.0.0.1"] == {"requests": 4, "connections_opened": 1, "reused": 3}
+    finally:
+        server.shutdown()
+
+
+def test_sync_stream_is_cut_off_at_its_total_timeout():
+    server, url = serve(SlowStreamHandler)
+    try:
+        client = HttpClient()
+        with client.get(url, stream=True) as response:
+            assert len(list(response.iter_lines())) == 10
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout, match="Total deadline"):
+            with client.get(url, stream=True, total_timeout=0.3) as response:
+                list(response.iter_lines())
+        assert time.monotonic() - started < 0.8
+    finally:
+        server.shutdown()
+
+
+def test_async_stream_is_cut_off_at_its_total_timeout():
+    server, url = serve(SlowStreamHandler)
+    client = AsyncHttpClient(HttpClient())
+
+    async def read(total_timeout=None):
+        async with client.stream("GET", url, total_timeout=total_timeout) as response:
+            return [line async for line in response.aiter_lines()]
+
+    async def fetch():
+        assert len(await read()) == 10
+        started = time.monotonic()
+        with pytest.raises(httpx.TimeoutException, match="Total deadline"):
+            await read(total_timeout=0.3)
+        assert time.monotonic() - started < 0.8
+        await client.client().aclose()
+
+    try:
+        asyncio.run(fetch())
+    finally:
+        server.shutdown()
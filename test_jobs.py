@@ -0,0 +1,175 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from formatter import BlogDocument
+from jobs import JobManager, JobQueueFull, JobStore, QUEUED, RUNNING, DONE, FAILED, EXPIRED
+
+PARAMS = {"topic": "AI in Finance", "blog_size": "medium", "intro_sentences": 3, "content_paragraphs": 4, "summary_sentences": 2}
+
+
+class GatedAgent:
+    """Generates only once its gate opens, reporting a generating stage first"""
+
+    def __init__(self, outcome=None):
+        self.gate = threading.Event()
+        self.outcome = outcome
+        self.topics = []
+
+    def generate_blog_result(self, topic, progress=None, deadline=None, **kwargs):
+        self.topics.append(topic)
+        progress("generating", "test/model")
+        self.gate.wait(5)
+        deadline.check("formatting")
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        if self.outcome is not None:
+            return self.outcome, None
+        return f"<p>{topic}</p>", BlogDocument([("paragraph", topic)])
+
+
+def wait_for(manager, job_id, status, stage=None):
+    for _ in range(500):
+        job = manager.get(job_id)
+        if job["status"] == status and stage in (None, job["stage"]):
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"job {job_id} stayed {job['status']} at {job['stage']}")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_job_lifecycle_from_queued_to_done(store):
+    agent = GatedAgent()
+    manager = JobManager(agent, store, workers=1, queue_depth=4)
+
+    first = manager.submit(dict(PARAMS, topic="first"))
+    second = manager.submit(dict(PARAMS, topic="second"))
+
+    assert wait_for(manager, first, RUNNING, "generating")["detail"] == "test/model"
+    # One worker: the second job waits its turn
+    assert manager.get(second)["status"] == QUEUED
+    assert manager.depth() == 2
+
+    agent.gate.set()
+    done = wait_for(manager, first, DONE)
+    assert done["result"] == "<p>first</p>"
+    assert done["document"] == {"blocks": [["paragraph", "first"]], "sources_at": None}
+    assert wait_for(manager, second, DONE)["result"] == "<p>second</p>"
+    assert manager.depth() == 0
+
+
+@pytest.mark.parametrize("outcome, error", [
+    ("Error: All models failed", "Error: All models failed"),
+    (RuntimeError("research exploded"), "research exploded"),
+])
+def test_failed_generations_are_reported(store, outcome, error):
+    agent = GatedAgent(outcome)
+    agent.gate.set()
+    manager = JobManager(agent, store, workers=1)
+
+    job = wait_for(manager, manager.submit(PARAMS), FAILED)
+    assert job["error"] == error and job["result"] is None
+
+
+def test_job_past_its_deadline_expires(store):
+    agent = GatedAgent()
+    manager = JobManager(agent, store, workers=1)
+
+    job_id = manager.submit(PARAMS, deadline=0.2)
+    time.sleep(0.3)
+    agent.gate.set()
+
+    assert "Deadline exceeded" in wait_for(manager, job_id, EXPIRED)["error"]
+
+
+def test_full_queue_rejects_new_jobs(store):
+    agent = GatedAgent()
+    manager = JobManager(agent, store, workers=1, queue_depth=1)
+    manager.submit(PARAMS)
+
+    with pytest.raises(JobQueueFull):
+        manager.submit(PARAMS)
+    agent.gate.set()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_restart_reruns_queued_jobs_and_fails_running_ones(store):
+    owner = dead_pid()
+    for job_id, status in [("queued-job", QUEUED), ("running-job", RUNNING)]:
+        store.create(job_id, dict(PARAMS, topic=job_id), time.time() + 60)
+        store.update(job_id, status=status, owner=owner)
+    # A sibling worker that is still alive keeps its jobs
+    store.create("sibling-job", PARAMS, time.time() + 60)
+    store.update("sibling-job", owner=os.getppid())
+    store.create("stale-job", dict(PARAMS, topic="stale-job"), time.time() - 1)
+    store.update("stale-job", owner=owner)
+
+    agent = GatedAgent()
+    agent.gate.set()
+    manager = JobManager(agent, store, workers=1)
+
+    assert wait_for(manager, "queued-job", DONE)["result"] == "<p>queued-job</p>"
+    # Still queued, but its deadline passed while no process was running it
+    assert wait_for(manager, "stale-job", EXPIRED)["error"] == "Deadline exceeded before start"
+    running = manager.get("running-job")
+    assert running["status"] == FAILED and running["error"] == "Interrupted by server restart"
+    assert manager.get("sibling-job")["status"] == QUEUED
+    assert agent.topics == ["queued-job"]
+
+
+@pytest.fixture
+def jobs_client(monkeypatch, store):
+    agent = GatedAgent()
+    monkeypatch.setattr(app_module, "job_manager", JobManager(agent, store, workers=1, queue_depth=1))
+    yield app_module.app.test_client(), agent
+    agent.gate.set()
+
+
+def test_jobs_api_polls_a_job_to_its_result(jobs_client):
+    client, agent = jobs_client
+
+    created = client.post("/jobs", json={"topic": "AI in Finance", "blog_size": "small"})
+    assert created.status_code == 202
+    status_url = created.json["status_url"]
+
+    for _ in range(500):
+        polled = client.get(status_url).json
+        if polled["stage"] == "generating":
+            break
+        time.sleep(0.01)
+    assert polled["status"] == RUNNING and polled["detail"] == "test/model"
+    assert "blog_content" not in polled
+
+    agent.gate.set()
+    for _ in range(500):
+        polled = client.get(status_url).json
+        if polled["status"] == DONE:
+            break
+        time.sleep(0.01)
+    assert polled["blog_content"] == "<p>AI in Finance</p>" and polled["blog_size"] == "small"
+    assert client.get(status_url + "?format=text").json["blog_content"].startswith("AI in Finance")
+    assert client.get("/jobs/no-such-job").status_code == 404
+
+
+def test_jobs_api_answers_503_when_the_queue_is_full(jobs_client):
+    client, agent = jobs_client
+
+    assert client.post("/jobs", json={"topic": "AI in Finance"}).status_code == 202
+    rejected = client.post("/jobs", json={"topic": "AI in Healthcare"})
+
+    assert rejected.status_code == 503
+    assert "queue is full" in rejected.json["error"]
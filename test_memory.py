@@ -0,0 +1,65 @@
+from memory import ContextPacker, estimate_tokens
+
+FACT = "Banks in Europe spent 12 billion euros on AI fraud detection in 2023, according to the central bank."
+
+
+def research(source, *sentences, title="Report", url="https://example.com/report"):
+    return {"source": source, "content": f"Title: {title}\nSummary: {' '.join(sentences)}\nURL: {url}"}
+
+
+def test_dedupe_drops_near_duplicates_across_sources():
+    packer = ContextPacker()
+    data = [
+        research("wikipedia", FACT),
+        research("web", FACT.replace("according to", "says"), "Regulators are drafting AI audit rules for lenders."),
+    ]
+
+    packed = packer.pack("AI in banking", data, 1000)
+
+    assert packed.count("fraud detection") == 1
+    assert "Regulators are drafting AI audit rules" in packed
+
+
+def test_distinct_snippets_survive_dedupe():
+    packer = ContextPacker()
+    snippets = packer.split([research("web", FACT, "Insurers use machine learning to price flood risk in coastal towns.")])
+
+    assert len(packer.dedupe(snippets)) == 2
+
+
+def test_fill_stays_within_the_token_budget():
+    packer = ContextPacker()
+    sentences = [f"Finance team {index} adopted AI forecasting tools in {2000 + index}." for index in range(40)]
+    snippets = packer.split([research("web", *sentences)])
+
+    for budget in (30, 60, 200):
+        chosen = packer.fill(snippets, budget)
+        # The record header is paid for once, with its first snippet
+        used = sum(estimate_tokens(snippet.text) for snippet in chosen) + estimate_tokens("Report" + "https://example.com/report") + 4
+        assert chosen and used <= budget
+    assert len(packer.fill(snippets, 10000)) == len(snippets)
+
+
+def test_every_source_gets_its_best_snippet_first():
+    packer = ContextPacker()
+    crowded = [f"AI in finance fact {index}: banks deployed {index} new AI finance models." for index in range(30)]
+    data = [
+        research("web", *crowded, title="Crowded"),
+        research("news", "A short note on markets today.", "AI finance startups raised funding this week.", title="Quiet"),
+    ]
+
+    packed = packer.pack("AI in finance", data, 120)
+
+    assert "Source: news" in packed
+    assert "AI finance startups raised funding this week." in packed
+    assert "A short note on markets today." not in packed
+
+
+def test_failed_sources_are_skipped():
+    packer = ContextPacker()
+    data = [{"source": "wikipedia", "content": "Wikipedia search failed for: AI in finance"}, research("web", FACT)]
+
+    packed = packer.pack("AI in finance", data, 1000)
+
+    assert "Source: wikipedia" not in packed
+    assert packer.pack("AI in finance", data[:1], 1000) == "No research data available."
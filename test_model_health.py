@@ -0,0 +1,101 @@
+import json
+
+from circuit import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from model_health import ModelHealthTracker, ERROR, VALIDATION_FAILED
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_breaker_lets_one_probe_through_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    breaker.opened_at -= 61
+
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # The probe slot is taken until it reports back
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.opened_at -= 61
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_released_probe_can_be_claimed_again():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    breaker.opened_at -= 61
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def make_tracker(tmp_path):
+    return ModelHealthTracker(str(tmp_path / "health.json"))
+
+
+def test_order_prefers_fast_reliable_models(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.record_success("slow", 60.0)
+    tracker.record_success("fast", 5.0)
+    tracker.record_failure("flaky", VALIDATION_FAILED, 5.0)
+
+    assert tracker.order(["slow", "flaky", "fast", "unseen"]) == ["fast", "flaky", "unseen", "slow"]
+
+
+def test_order_skips_models_with_open_breakers(tmp_path):
+    tracker = make_tracker(tmp_path)
+    for _ in range(tracker.failure_threshold):
+        tracker.record_failure("broken", ERROR)
+
+    assert tracker.order(["broken", "healthy"]) == ["healthy"]
+    assert not tracker.begin("broken")
+
+
+def test_all_open_breakers_still_probe_the_longest_resting_model(tmp_path):
+    tracker = make_tracker(tmp_path)
+    for model in ("a", "b"):
+        for _ in range(tracker.failure_threshold):
+            tracker.record_failure(model, ERROR)
+    tracker.stats["b"].breaker.opened_at -= 10
+
+    assert tracker.order(["a", "b"]) == ["b"]
+    assert tracker.begin("b")
+    # Only one caller gets the probe
+    assert not tracker.begin("b")
+
+    tracker.record_success("b", 1.0)
+    assert tracker.order(["a", "b"]) == ["b"]
+    assert tracker.stats["b"].breaker.state == CLOSED
+
+
+def test_scoreboard_is_saved_at_most_every_interval(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.save_interval = 3600
+    tracker.record_success("model", 1.0)
+    assert not (tmp_path / "health.json").exists()
+
+    tracker.flush()
+    with open(tmp_path / "health.json") as f:
+        assert json.load(f)["model"]["successes"] == 1
+    assert make_tracker(tmp_path).stats["model"].successes == 1
@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import random
+
+from formatter import BLOG_CSS, BlogDocument, is_section_heading, clean_model_output, parse_blog, render_blog_html
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+
+# The regex chain BlogAgent used before the single-pass engine, kept verbatim as the reference
+def legacy_clean(content):
+    content = content.replace('**', '').replace('*', '')
+    content = re.sub(r'===\s*(.*?)\s*===', r'\n\n\1\n\n', content)
+    content = re.sub(r'\n+Note:.*$', '', content, flags=re.IGNORECASE | re.DOTALL)
+    content = re.sub(r'\n+\d+:.*picture.*$', '', content, flags=re.MULTILINE)
+    content = re.sub(r'(A |The )?(photo|screenshot|picture|image) of.*?\n', '', content, flags=re.IGNORECASE)
+    content = re.sub(r'Screenshot:.*?\n', '', content, flags=re.IGNORECASE)
+    content = re.sub(r'\[Caption:.*?\]', '', content, flags=re.IGNORECASE)
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    return content.strip()
+
+
+def legacy_format(content):
+    content = re.sub(r'^(HEADING|SUBTITLE|INTRODUCTION|CONTENT SECTION|SUMMARY|SOURCES)\s*$', '', content, flags=re.MULTILINE)
+    content = re.sub(r'\n{3,}', '\n\n', content).strip()
+
+    lines = content.split('\n')
+    formatted = '<div class="blog-container">'
+    formatted += BLOG_CSS
+    line_count = 0
+    current_para = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if current_para:
+                formatted += f'<p>{" ".join(current_para)}</p>\n'
+                current_para = []
+            continue
+        if line_count == 0:
+            formatted += f'<h1 class="blog-title">{line}</h1>\n'
+            line_count += 1
+        elif line_count == 1:
+            formatted += f'<div class="blog-subtitle">{line}</div>\n'
+            line_count += 1
+        elif is_section_heading(line):
+            if current_para:
+                formatted += f'<p>{" ".join(current_para)}</p>\n'
+                current_para = []
+            clean_line = line.replace('###', '').replace('##', '').replace('#', '').strip()
+            formatted += f'<h2 class="section-heading">{clean_line}</h2>\n'
+        elif '<div style="text-align:center' in line or '<img' in line:
+            if current_para:
+                formatted += f'<p>{" ".join(current_para)}</p>\n'
+                current_para = []
+            continue
+        else:
+            current_para.append(line)
+
+    if current_para:
+        formatted += f'<p>{" ".join(current_para)}</p>\n'
+    formatted += '</div>'
+    return formatted
+
+
+def legacy_add_sources(content):
+    sources_match = re.search(r'(===\s*SOURCES\s*===|Sources:|References:)(.*?)$', content, re.IGNORECASE | re.DOTALL)
+    if sources_match:
+        sources_text = sources_match.group(2).strip()
+        sources = re.findall(r'(?:Source: )?([^-\n]+)', sources_text)
+        clean_sources = []
+        for source in sources:
+            if '://' in source:
+                domain = source.split('://')[1].split('/')[0]
+                clean_sources.append(domain)
+            else:
+                clean_sources.append(source.strip())
+        formatted_sources = "\n\n---\n\nSources & References:\n\n"
+        for source in clean_sources:
+            formatted_sources += f"• {source}\n"
+        content = content[:sources_match.start()] + formatted_sources
+    else:
+        content += "\n\n---\n\nSources & References:\n\nBased on research data from Wikipedia and web sources."
+    return content
+
+
+def legacy_render(cleaned):
+    return legacy_add_sources(legacy_format(re.sub(r'\[IMAGE:[^\]]+\]', '', cleaned)))
+
+
+def golden_cases():
+    for name in sorted(os.listdir(GOLDEN_DIR)):
+        if name.endswith(".input.txt"):
+            case = name[:-len(".input.txt")]
+            with open(os.path.join(GOLDEN_DIR, name), "r", encoding="utf-8", newline="") as f:
+                raw = f.read()
+            with open(os.path.join(GOLDEN_DIR, case + ".html"), "r", encoding="utf-8", newline="") as f:
+                expected = f.read()
+            yield case, raw, expected
+
+
+# Line fragments that exercise every cleanup rule, including the awkward interactions between them
+FUZZ_LINES = [
+    "", "", "", "  ", "AI in Finance: Risks and Rewards", "How machine learning is changing lending",
+    "=== HEADING ===", "=== SOURCES ===", "===", "=== Title", "SUMMARY", "INTRODUCTION  ", "  HEADING",
+    "## Regulatory Reforms", "# Outlook", "Future Outlook: What Comes Next", "Data: The New Oil",
+    "Banks are adopting **machine learning** for credit scoring.", "Regulators remain cautious; see Sources: below.",
+    "Note: this post was generated automatically.", "note: lowercase trailer", "  Note: indented note",
+    "1: A picture of a trading floor", "12: picture", "3: a photo", "An image of the dashboard shows growth",
+    "The photo of the CEO", "Screenshot: quarterly report", "Quote [Caption: chart] continues", "[IMAGE: market chart]",
+    "[IMAGE: broken", "tag end]", '<div style="text-align:center"><img src="x.png"></div>', "<img src='y.png'>",
+    "Sources:", "References:", "- https://en.wikipedia.org/wiki/Finance", "- reuters.com", "Source: economic-times.com",
+    "• Bullet — with “unicode” text", "Line with trailing spaces   ", "İmage of a dotted capital",
+]
+
+
+def fuzz_text(rng):
+    return "\n".join(rng.choice(FUZZ_LINES) for _ in range(rng.randint(0, 40)))
+
+
+def test_golden_corpus():
+    cases = list(golden_cases())
+    assert cases, "golden corpus is empty"
+    for case, raw, expected in cases:
+        assert render_blog_html(clean_model_output(raw)) == expected, f"golden case {case} differs"
+
+
+def test_document_round_trip():
+    for case, raw, expected in golden_cases():
+        document = BlogDocument.from_dict(json.loads(json.dumps(parse_blog(clean_model_output(raw)).to_dict())))
+        assert document.to_html() == expected, f"golden case {case} differs after a round trip"
+        markdown = document.to_markdown()
+        assert "<p>" not in markdown and "Sources & References" in markdown
+
+
+def test_matches_legacy_pipeline():
+    rng = random.Random(1234)
+    for _ in range(3000):
+        raw = fuzz_text(rng)
+        if rng.random() < 0.2:
+            raw = raw.replace("\n", "\r\n")
+        cleaned = clean_model_output(raw)
+        assert cleaned == legacy_clean(raw), repr(raw)
+        assert render_blog_html(cleaned) == legacy_render(cleaned), repr(raw)
+
+
+if __name__ == "__main__":
+    test_golden_corpus()
+    test_document_round_trip()
+    test_matches_legacy_pipeline()
+    print("✅ Post-processing engine matches the legacy pipeline")
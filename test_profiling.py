@@ -0,0 +1,94 @@
+import os
+import threading
+
+import pytest
+
+import app as app_module
+from formatter import BlogDocument
+from profiling import Profiler
+
+TOKEN = "profile-admin-token"
+
+
+@pytest.fixture
+def profiler(monkeypatch, tmp_path):
+    profiler = Profiler(directory=str(tmp_path / "profiles"), admin_token=TOKEN, sample_percent=0, interval=0.001)
+    monkeypatch.setattr(app_module, "profiler", profiler)
+    return profiler
+
+
+@pytest.fixture
+def client(monkeypatch, fake_agent):
+    monkeypatch.setattr(app_module, "agent", fake_agent)
+    monkeypatch.setattr(fake_agent, "generate_blog_result",
+                        lambda **kwargs: ("<p>profiled</p>", BlogDocument([("paragraph", "profiled")])))
+    return app_module.app.test_client()
+
+
+def generate(client, headers=None):
+    return client.post("/generate", json={"topic": "AI in Finance", "force_refresh": True}, headers=headers or {})
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile-Token": "wrong-token"}, {"X-Profile-Token": TOKEN[:-1]}])
+def test_requests_without_the_admin_token_are_not_profiled(client, profiler, headers):
+    response = generate(client, headers)
+
+    assert response.status_code == 200
+    assert "X-Profile" not in response.headers
+    assert not os.path.exists(profiler.directory)
+
+
+def test_the_admin_token_profiles_the_request(client, profiler, tmp_path):
+    response = generate(client, {"X-Profile-Token": TOKEN})
+
+    name = response.headers["X-Profile"]
+    assert name.endswith(f"-generate_blog-{response.headers['X-Trace-Id']}")
+    summary = (tmp_path / "profiles" / f"{name}.txt").read_text()
+    assert summary.startswith(f"Profile {name}: ")
+    assert (tmp_path / "profiles" / f"{name}.folded").exists()
+    assert profiler.active is None
+
+
+def test_only_generation_endpoints_are_profiled(client, profiler):
+    response = client.get("/coalescing/stats", headers={"X-Profile-Token": TOKEN})
+
+    assert "X-Profile" not in response.headers
+
+
+def test_no_token_is_accepted_when_none_is_configured(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), admin_token="", sample_percent=0)
+
+    assert not profiler.wanted("")
+    assert not profiler.wanted("anything")
+    assert Profiler(directory=str(tmp_path), admin_token="", sample_percent=100).wanted(None)
+
+
+def test_one_session_at_a_time(profiler):
+    session = profiler.start("first")
+
+    assert profiler.start("second") is None
+    profiler.stop(session)
+    profiler.stop(profiler.start("third"))
+
+
+def busy_loop(stop):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(200))
+
+
+def test_samples_find_the_busy_thread(profiler, tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    session = profiler.start("busy")
+    worker.start()
+    try:
+        stop.wait(0.3)
+    finally:
+        stop.set()
+        worker.join()
+    summary = profiler.stop(session)
+
+    assert session.samples > 0
+    assert "busy_loop" in open(summary).read()
+    assert any("busy_loop" in line for line in open(summary[:-len(".txt")] + ".folded"))
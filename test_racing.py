@@ -0,0 +1,169 @@
+import time
+import asyncio
+import threading
+
+import httpx
+import requests
+from ddgs.exceptions import DDGSException
+
+from racing import SearchRacer, SearchError, classify, http_error, scheduler
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, url="https://search.example.com/q"):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.url = url
+
+
+def after(seconds, result):
+    def engine(query):
+        time.sleep(seconds)
+        return result
+    return engine
+
+
+def failing(error, calls):
+    def engine(query):
+        calls.append(query)
+        raise error
+    return engine
+
+
+def test_race_returns_the_first_non_empty_result():
+    racer = SearchRacer([("slow", after(0.5, "slow result")), ("empty", after(0.0, "  ")), ("fast", after(0.05, "fast result"))])
+
+    started = time.monotonic()
+    assert racer.search("ai") == "fast result"
+    assert time.monotonic() - started < 0.4
+
+
+def test_race_is_none_when_every_engine_fails_or_is_empty():
+    calls = []
+    racer = SearchRacer([("empty", after(0.0, "")), ("broken", failing(ValueError("bad markup"), calls))])
+
+    assert racer.search("ai") is None
+
+
+def test_sequential_mode_tries_engines_in_order():
+    calls = []
+    racer = SearchRacer([("broken", failing(ValueError("bad markup"), calls)), ("slow", after(0.1, "slow result")),
+                         ("fast", after(0.0, "fast result"))], mode="sequential")
+
+    assert racer.search("ai") == "slow result"
+    assert calls == ["ai"]
+
+
+def test_non_transient_errors_are_not_retried():
+    calls = []
+    racer = SearchRacer([("broken", failing(ValueError("bad markup"), calls))], max_retries=3)
+
+    assert racer.search("ai") is None
+    assert len(calls) == 1
+
+
+def test_transient_errors_are_retried():
+    calls = []
+
+    def flaky(query):
+        calls.append(query)
+        if len(calls) < 3:
+            raise SearchError("HTTP 503", True, retry_after=0.0)
+        return "recovered"
+    racer = SearchRacer([("flaky", flaky)], max_retries=3)
+
+    assert racer.search("ai") == "recovered"
+    assert len(calls) == 3
+
+
+def test_open_breaker_takes_an_engine_out_of_the_race():
+    calls = []
+    racer = SearchRacer([("broken", failing(ValueError("bad markup"), calls)), ("backup", after(0.0, "backup result"))],
+                        failure_threshold=2)
+    racer.search("one")
+    racer.search("two")
+
+    assert not racer.breakers["broken"].available()
+    assert racer.search("three") == "backup result"
+    assert calls == ["one", "two"]
+
+
+def test_classify_separates_transient_errors():
+    assert classify(requests.Timeout("read timed out")).transient
+    assert classify(requests.ConnectionError("reset")).transient
+    assert classify(DDGSException("backend failed")).transient
+    assert classify(httpx.ConnectError("refused")).transient
+    assert classify(httpx.ReadTimeout("read timed out")).transient
+    assert not classify(ValueError("bad markup")).transient
+
+    error = SearchError("HTTP 404", False)
+    assert classify(error) is error
+
+
+def test_http_error_statuses():
+    assert http_error(FakeResponse(500)).transient
+    assert http_error(FakeResponse(503)).transient
+    assert not http_error(FakeResponse(404)).transient
+    assert not http_error(FakeResponse(403)).transient
+
+
+def test_http_429_pauses_the_host():
+    error = http_error(FakeResponse(429, {"Retry-After": "120"}, url="https://throttled.example.com/search"))
+
+    assert error.transient and error.retry_after == 120.0
+    assert scheduler.state.take("host:throttled.example.com", *scheduler.limits_for("host:throttled.example.com")) > 100
+
+
+def test_async_race_cancels_the_losers_without_blaming_them():
+    cancelled = []
+
+    async def fast(query):
+        await asyncio.sleep(0.05)
+        return "fast result"
+
+    async def stalled(query):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+    racer = SearchRacer([("stalled", None), ("fast", None)], async_engines={"stalled": stalled, "fast": fast},
+                        failure_threshold=1)
+
+    started = time.monotonic()
+    assert asyncio.run(racer.asearch("ai")) == "fast result"
+    assert time.monotonic() - started < 1
+    assert cancelled == ["ai"]
+    assert racer.breakers["stalled"].available()
+
+
+def test_async_race_runs_engines_without_an_async_variant_in_a_thread():
+    threads = []
+
+    def blocking(query):
+        threads.append(threading.current_thread())
+        return "threaded result"
+    racer = SearchRacer([("blocking", blocking)])
+
+    assert asyncio.run(racer.asearch("ai")) == "threaded result"
+    assert threads[0] is not threading.main_thread()
+
+
+def test_async_race_retries_transient_errors_and_feeds_breakers():
+    calls = []
+
+    async def flaky(query):
+        calls.append(query)
+        if len(calls) < 2:
+            raise SearchError("HTTP 503", True, retry_after=0.0)
+        return "recovered"
+
+    async def broken(query):
+        raise ValueError("bad markup")
+    racer = SearchRacer([("broken", None), ("flaky", None)], async_engines={"flaky": flaky, "broken": broken},
+                        max_retries=3, mode="sequential")
+
+    assert asyncio.run(racer.asearch("ai")) == "recovered"
+    assert len(calls) == 2
+    assert racer.snapshot()["broken"]["consecutive_failures"] == 1
+    assert racer.snapshot()["flaky"]["consecutive_failures"] == 0
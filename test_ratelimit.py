@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+
+from ratelimit import RateScheduler, TokenBucket, parse_retry_after, request_priority, BATCH
+
+
+def drained_scheduler(key, rate=2.0):
+    """A per-process scheduler whose bucket for key holds one token, already taken"""
+    scheduler = RateScheduler(shared=False)
+    scheduler.limits[key] = (rate, 1)
+    assert scheduler.acquire(key)
+    return scheduler
+
+
+def test_interactive_waiter_overtakes_queued_batch_work():
+    scheduler = drained_scheduler("host:example.com")
+    served = []
+
+    def wait_for_token(name, priority):
+        request_priority.set(priority)
+        scheduler.acquire("host:example.com")
+        served.append(name)
+
+    batch = threading.Thread(target=wait_for_token, args=("batch", BATCH))
+    batch.start()
+    time.sleep(0.1)
+    assert scheduler.snapshot() == {"host:example.com": {"interactive": 0, "batch": 1}}
+    interactive = threading.Thread(target=wait_for_token, args=("interactive", 0))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+
+    assert served == ["interactive", "batch"]
+    assert scheduler.snapshot() == {}
+
+
+def test_async_waiters_are_served_in_priority_order():
+    scheduler = drained_scheduler("openrouter:key", rate=5.0)
+    served = []
+
+    async def wait_for_token(name, priority, delay):
+        request_priority.set(priority)
+        await asyncio.sleep(delay)
+        await scheduler.aacquire("openrouter:key")
+        served.append(name)
+
+    async def main():
+        await asyncio.gather(wait_for_token("batch 1", BATCH, 0.0), wait_for_token("batch 2", BATCH, 0.01),
+                             wait_for_token("interactive", 0, 0.05))
+
+    asyncio.run(main())
+    assert served == ["interactive", "batch 1", "batch 2"]
+
+
+def test_acquire_gives_up_after_max_wait():
+    scheduler = drained_scheduler("host:example.com", rate=0.1)
+
+    started = time.monotonic()
+    assert not scheduler.acquire("host:example.com", max_wait=1.0)
+    assert time.monotonic() - started < 0.5
+
+
+def test_block_holds_back_a_bucket():
+    scheduler = RateScheduler(shared=False)
+    scheduler.block("host:throttled.example.com", 60)
+
+    assert not scheduler.acquire("host:throttled.example.com", max_wait=1.0)
+    assert scheduler.acquire("host:other.example.com", max_wait=1.0)
+
+
+def test_limits_for_uses_the_most_specific_prefix():
+    scheduler = RateScheduler(shared=False)
+
+    assert scheduler.limits_for("openrouter:model:some/model") == scheduler.limits["openrouter:model"]
+    assert scheduler.limits_for("openrouter:key") == scheduler.limits["openrouter:key"]
+    assert scheduler.limits_for("host:example.com") == scheduler.limits["host"]
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=10.0, burst=2)
+
+    assert bucket._reserve() == 0.0
+    assert bucket._reserve() == 0.0
+    assert 0.05 < bucket._reserve() <= 0.1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 55 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
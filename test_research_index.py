@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import agent as agent_module
+import research_index as research_index_module
+from formatter import BlogDocument
+from research_index import ResearchIndex, match_query
+
+
+class Clock:
+    """Stands in for the time module so documents can be aged without sleeping"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(research_index_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def index(tmp_path, clock):
+    return ResearchIndex(str(tmp_path / "index.db"))
+
+
+def records(*entries):
+    return "\n\n".join(f"Title: {title}\nSnippet: {body}\nURL: https://example.com/{n}" for n, (title, body) in enumerate(entries))
+
+
+def test_match_query_needs_every_meaningful_word():
+    assert match_query("The future of solar power in India") == '"future" AND "solar" AND "power" AND "india"'
+    assert match_query("the of and") is None
+
+
+def test_search_ranks_the_closest_match_first(index):
+    index.add_research("Latest News", records(
+        ("Wind farms", "Offshore wind and a little solar power in India."),
+        ("Solar power in India", "India's solar power capacity doubled; solar power parks in Rajasthan lead."),
+        ("Coal", "Coal still dominates power in India."),
+    ))
+
+    results = index.search("solar power india")
+    assert [result["title"] for result in results] == ["Solar power in India", "Wind farms"]
+    assert results[0]["score"] < results[1]["score"]
+    assert results[0]["kind"] == "research" and results[0]["source"] == "Latest News"
+
+
+def test_blogs_are_searchable_apart_from_research(index):
+    index.add_research("Latest News", records(("Solar news", "Solar tariffs fell.")))
+    index.add_blog("Solar power", BlogDocument([("title", "Solar Power Today"), ("paragraph", "Solar tariffs keep falling.")]))
+
+    assert [result["kind"] for result in index.search("solar tariffs", kind="blog")] == ["blog"]
+    assert len(index.search("solar tariffs")) == 2
+    assert index.stats() == {"documents": 2, "research": 1, "blogs": 1}
+
+
+def test_web_lookups_need_enough_hits_to_skip_the_network(index):
+    index.add_research("Latest News", records(("AI lending", "AI in finance speeds up lending."),
+                                              ("AI fraud", "AI in finance catches fraud.")))
+    assert index.lookup("Latest News", "AI in Finance") is None
+
+    index.add_research("Latest News", records(("AI trading", "AI in finance drives trading desks.")))
+    local = index.lookup("Latest News", "AI in Finance")
+    assert local.count("Title: ") == 3 and "Snippet: AI in finance" in local
+    # Coverage is per source: the news does not answer for Current Trends
+    assert index.lookup("Current Trends", "AI in Finance") is None
+
+
+def test_one_wikipedia_hit_is_enough(index):
+    index.add_research("Wikipedia", "Title: Machine learning\nSummary: Machine learning builds models from data.\nURL: https://en.wikipedia.org/wiki/ML")
+
+    assert index.lookup("Wikipedia", "machine learning").startswith("Title: Machine learning\nSummary: Machine learning builds")
+    assert index.lookup("Wikipedia", "deep learning") is None
+
+
+def test_stale_results_are_not_reused(index, clock):
+    news = records(*[(f"AI story {n}", f"AI in finance story number {n}.") for n in range(3)])
+    index.add_research("Latest News", news)
+    index.add_research("Current Trends", news)
+
+    clock.now += index.max_ages["news"] + 1
+    # News goes stale within hours, other web results last for days
+    assert index.lookup("Latest News", "AI in Finance") is None
+    assert index.lookup("Current Trends", "AI in Finance") is not None
+
+    # Fetching the same text again makes it fresh again
+    index.add_research("Latest News", news)
+    assert index.lookup("Latest News", "AI in Finance") is not None
+    assert index.stats()["research"] == 6
+
+
+def test_oldest_documents_are_trimmed(tmp_path, clock):
+    index = ResearchIndex(str(tmp_path / "index.db"), max_documents=50)
+    for n in range(110):
+        clock.now += 1
+        index.add_research("Latest News", records((f"Story {n}", f"Unique story body {n}.")))
+
+    assert index.stats()["documents"] == 60
+    assert index.search("story body 0") == []
+
+
+def test_research_prefers_the_local_index(monkeypatch, index, fake_agent):
+    index.add_research("Wikipedia", "Title: AI in finance\nSummary: Banks use AI to score loans.\nURL: https://en.wikipedia.org/wiki/AI")
+    monkeypatch.setattr(agent_module, "research_index", index)
+
+    research = {item["source"]: item["content"] for item in fake_agent.research_topic("AI in Finance").research_data}
+
+    assert "Banks use AI to score loans." in research["Wikipedia"]
+    # The web sources were not covered locally, went live, and were indexed for next time
+    assert "<<AI in Finance>>" in research["Latest News"]
+    assert index.lookup("Wikipedia", "AI in Finance").count("Title: ") == 1
+    assert index.stats()["research"] == 4
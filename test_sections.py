@@ -0,0 +1,168 @@
+import pytest
+
+import agent as agent_module
+from formatter import parse_blog
+from generations import GenerationStore
+from sections import section_headings, parse_plan, stitch, split_document
+
+PLAN_REPLY = """TITLE: AI Is Rewriting Finance
+SUBTITLE: How banks, regulators and startups are adapting to machine learning at scale.
+INTRO: AI now approves most consumer loans.
+Regulators are catching up fast.
+This blog explores what changes next.
+OUTLINE:
+1. Policies & Reforms: new rules for model risk.
+2) Technology & Digital Transformation: cloud cores and fraud models
+- Current Challenges & Real Data: bias audits
+Future Outlook & Predictions: autonomous finance
+SUMMARY: Adoption will keep growing. Over the next 3-5 years oversight will tighten.
+SOURCES:
+- Wikipedia
+- Reuters
+"""
+
+
+def test_parse_plan_reads_every_field():
+    headings = section_headings(4)
+    plan = parse_plan(PLAN_REPLY, headings)
+
+    assert plan["title"] == "AI Is Rewriting Finance"
+    assert plan["intro"] == "AI now approves most consumer loans. Regulators are catching up fast. This blog explores what changes next."
+    assert plan["angles"] == ["new rules for model risk.", "cloud cores and fraud models", "bias audits", "autonomous finance"]
+    assert plan["summary"].startswith("Adoption will keep growing.")
+    assert plan["sources"] == ["Wikipedia", "Reuters"]
+
+
+def test_parse_plan_pads_a_short_outline_and_defaults_sources():
+    reply = PLAN_REPLY.split("OUTLINE:")[0] + "SUMMARY: Short.\n"
+    plan = parse_plan(reply, section_headings(3))
+
+    assert plan["angles"] == ["", "", ""]
+    assert plan["sources"] == ["Wikipedia"]
+
+
+def test_parse_plan_without_a_required_field_is_none():
+    for field in ("TITLE", "SUBTITLE", "INTRO", "SUMMARY"):
+        reply = '\n'.join(line for line in PLAN_REPLY.split('\n') if not line.startswith(field + ":"))
+        assert parse_plan(reply, section_headings(4)) is None, field
+    assert parse_plan("Sure! Here is a great blog about finance.", section_headings(4)) is None
+
+
+def test_stitch_lays_out_the_single_call_format():
+    headings = section_headings(2)
+    plan = parse_plan(PLAN_REPLY, headings)
+    text = stitch(plan, headings, ["  First body.  ", "Second body."])
+
+    assert text.split('\n') == [
+        "AI Is Rewriting Finance",
+        "How banks, regulators and startups are adapting to machine learning at scale.",
+        "",
+        plan["intro"],
+        "",
+        "## Policies & Reforms",
+        "First body.",
+        "",
+        "## Future Outlook & Predictions",
+        "Second body.",
+        "",
+        plan["summary"],
+        "",
+        "Sources:",
+        "- Wikipedia",
+        "- Reuters",
+    ]
+
+
+def body(name, sentences=5):
+    return ' '.join(f"{name} fact {index} is backed by the research data." for index in range(sentences))
+
+
+def stored_plan(summary="Adoption will keep growing. Over the next 3-5 years oversight will tighten."):
+    return {
+        "title": "AI Is Rewriting Finance",
+        "subtitle": "How banks, regulators and startups are adapting to machine learning at scale.",
+        "intro": "AI now approves most consumer loans. Regulators are catching up fast. This blog explores what changes next.",
+        "angles": [''] * 4,
+        "summary": summary,
+        "sources": ["Wikipedia", "Reuters"],
+    }
+
+
+def test_split_document_round_trips_through_stitch():
+    headings = section_headings(4)
+    bodies = [body(heading) for heading in headings]
+    text = stitch(stored_plan(), headings, bodies)
+
+    plan, split_headings, split_bodies = split_document(parse_blog(text), 2)
+
+    assert (plan, split_headings, split_bodies) == (stored_plan(), headings, bodies)
+    assert stitch(plan, split_headings, split_bodies) == text
+
+
+def test_split_document_without_a_summary_keeps_the_last_paragraph():
+    headings = section_headings(2)
+    bodies = [body("Policy"), body("Outlook") + "\n\n" + body("Later outlook")]
+    text = stitch(stored_plan(summary=''), headings, bodies).replace("\n\n\n", "\n\n")
+
+    plan, _, split_bodies = split_document(parse_blog(text), 2)
+
+    assert plan["summary"] == ''
+    assert split_bodies == bodies
+
+
+@pytest.fixture
+def revising_agent(monkeypatch, tmp_path, fake_agent):
+    """fake_agent with a medium generation stored and fake section and passage writers"""
+    agent = fake_agent
+    store = GenerationStore(str(tmp_path / "generations.db"))
+    monkeypatch.setattr(agent_module, "generation_store", store)
+    headings = section_headings(4)
+    document = parse_blog(stitch(stored_plan(), headings, [body(heading) for heading in headings]))
+    generation_id = store.create("AI in Finance", (3, 4, 2), [{"source": "wikipedia", "content": "Finance facts."}],
+                                 document.to_dict())
+
+    written = []
+
+    async def write_section(topic, research_context, plan, headings, index, words, progress=None):
+        written.append(headings[index])
+        return body(f"New {headings[index]}")
+
+    async def write_passage(topic, research_context, plan, headings, part, sentences, progress=None):
+        written.append(part)
+        return ' '.join(f"New {part} sentence {index}." for index in range(sentences))
+    agent._agenerate_section = write_section
+    agent._agenerate_passage = write_passage
+    return agent, generation_id, written
+
+
+def test_resize_keeps_existing_sections(revising_agent):
+    agent, generation_id, written = revising_agent
+
+    _, document = agent.revise_blog_result(generation_id, 4, 6, 3)
+
+    assert sorted(written) == sorted(["Case Studies & Real-World Examples", "Opportunities & Recommendations", "intro", "summary"])
+    plan, headings, bodies = split_document(document, 3)
+    assert headings == section_headings(6)
+    for heading in section_headings(4):
+        assert bodies[headings.index(heading)] == body(heading)
+    assert plan["summary"] == "New summary sentence 0. New summary sentence 1. New summary sentence 2."
+    assert document.generation_id != generation_id
+
+
+def test_redoing_one_section_keeps_the_summary(revising_agent):
+    agent, generation_id, written = revising_agent
+
+    _, document = agent.revise_blog_result(generation_id, sections=["policies & reforms:"])
+
+    assert written == ["Policies & Reforms"]
+    plan, _, bodies = split_document(document, 2)
+    assert bodies[0] == body("New Policies & Reforms")
+    assert plan["summary"] == stored_plan()["summary"]
+
+
+def test_revising_an_unknown_section_raises(revising_agent):
+    agent, generation_id, written = revising_agent
+
+    with pytest.raises(ValueError):
+        agent.revise_blog_result(generation_id, sections=["Sports Results"])
+    assert written == []
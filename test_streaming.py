@@ -0,0 +1,150 @@
+import json
+
+import pytest
+
+import app as app_module
+from formatter import BLOG_CSS, IncrementalBlogRenderer, clean_model_output, render_blog_html
+
+BLOG = """AI in Finance: Smarter Money
+How learning systems are reshaping lending, trading and fraud control
+
+Banks have used statistics for decades, but machine learning changed the pace of decisions.
+Credit checks that once took days now finish while the customer waits.
+
+## Technology & Digital Transformation:
+Cloud platforms let small lenders rent the same models large banks build.
+Open banking rules feed those models with account data, with customer consent.
+
+Current Challenges & Real Data:
+Regulators ask lenders to explain every automated refusal in plain words.
+Bias audits are becoming a routine part of model releases at most banks.
+
+Sources:
+Wikipedia
+Forbes
+"""
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def render(deltas):
+    renderer = IncrementalBlogRenderer()
+    fragments = []
+    for delta in deltas:
+        fragments.extend(renderer.feed(delta))
+    return fragments + renderer.finish()
+
+
+def test_blocks_are_emitted_as_soon_as_they_close():
+    renderer = IncrementalBlogRenderer()
+
+    assert renderer.feed("AI in Finance: Smar") == []
+    assert renderer.feed("ter Money\nHow learning") == ['<div class="blog-container">' + BLOG_CSS,
+                                                        '<h1 class="blog-title">AI in Finance: Smarter Money</h1>\n']
+    assert renderer.feed(" systems help\n\nBanks use models.\nDecisions are fast.\n") == [
+        '<div class="blog-subtitle">How learning systems help</div>\n']
+    # A paragraph closes at the blank line or heading that follows it
+    assert renderer.feed("\n") == ['<p>Banks use models. Decisions are fast.</p>\n']
+    assert renderer.feed("## Future Outlook:\nMore to come.") == ['<h2 class="section-heading">Future Outlook:</h2>\n']
+    assert renderer.finish() == ['<p>More to come.</p>\n']
+
+
+def test_sources_end_the_preview():
+    fragments = render(chunks(BLOG, 11))
+
+    assert fragments[1] == '<h1 class="blog-title">AI in Finance: Smarter Money</h1>\n'
+    assert [fragment.split(">")[0] + ">" for fragment in fragments[2:]] == [
+        '<div class="blog-subtitle">', '<p>', '<h2 class="section-heading">', '<p>',
+        '<h2 class="section-heading">', '<p>']
+    assert not any("Wikipedia" in fragment for fragment in fragments)
+
+
+@pytest.mark.parametrize("size", [1, 5, 64, len(BLOG)])
+def test_chunk_boundaries_do_not_change_the_preview(size):
+    assert render(chunks(BLOG, size)) == render([BLOG])
+
+
+def test_preview_matches_the_final_render_up_to_the_sources():
+    preview = "".join(render(chunks(BLOG, 9)))
+    final = render_blog_html(clean_model_output(BLOG))
+
+    assert final.startswith(preview)
+
+
+class FakeStream:
+    """A finished streamed OpenRouter response carrying deltas"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.status_code = 200
+        self.encoding = None
+
+    def iter_lines(self, decode_unicode=False):
+        for delta in self.deltas:
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": delta}}]})
+            yield ""
+        yield "data: [DONE]"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def long_blog():
+    # Over half the medium target of 1200 words, with no sentence repeated
+    extra = "\n".join(f"Lenders in market {n} report faster approvals and fewer defaults this year." for n in range(50))
+    return BLOG.replace("Sources:", extra + "\n\nSources:")
+
+
+def read_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def streaming_client(monkeypatch, fake_agent):
+    monkeypatch.setattr(app_module, "agent", fake_agent)
+    fake_agent.model_health.order = lambda models: list(models)
+    return app_module.app.test_client()
+
+
+def test_stream_sends_previews_then_the_full_blog(streaming_client, fake_agent):
+    fake_agent.models = ["good/model"]
+    fake_agent._post_openrouter = lambda model, prompt, **kwargs: FakeStream(chunks(long_blog(), 13))
+
+    events = read_events(streaming_client.post("/generate/stream", json={"topic": "AI in Finance"}))
+
+    names = [name for name, _ in events]
+    assert names[:2] == ["status", "status"]
+    assert events[1][1] == {"stage": "generating", "model": "good/model"}
+    assert names[-1] == "done" and set(names[2:-1]) == {"section"}
+    done = events[-1][1]
+    assert done["success"] is True and done["model"] == "good/model"
+    assert done["blog_content"] == render_blog_html(clean_model_output(long_blog()))
+    assert done["document"]["blocks"][0] == ["title", "AI in Finance: Smarter Money"]
+    # The previews are the blog as it grew; the final event adds the sources
+    preview = "".join(payload["html"] for name, payload in events if name == "section")
+    assert done["blog_content"].startswith(preview)
+
+
+def test_rejected_model_resets_the_preview(streaming_client, fake_agent):
+    fake_agent.models = ["bad/model", "good/model"]
+    streams = {"bad/model": BLOG.replace("Credit checks", "[Insert statistic] Credit checks"), "good/model": long_blog()}
+    fake_agent._post_openrouter = lambda model, prompt, **kwargs: FakeStream(chunks(streams[model], 13))
+
+    events = read_events(streaming_client.post("/generate/stream", json={"topic": "AI in Finance"}))
+
+    names = [name for name, _ in events]
+    reset = names.index("reset")
+    assert events[reset][1] == {"model": "bad/model"}
+    assert "section" in names[:reset]
+    assert events[reset + 1][1] == {"stage": "generating", "model": "good/model"}
+    assert names[-1] == "done" and events[-1][1]["model"] == "good/model"
+    assert fake_agent.model_health.snapshot()["bad/model"]["validation_failures"] == 1
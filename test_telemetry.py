@@ -0,0 +1,114 @@
+import asyncio
+import re
+
+import pytest
+
+import app as app_module
+from telemetry import Registry, Trace, current_trace, span, start_trace, finish_trace
+
+
+def test_counters_render_in_the_text_format():
+    registry = Registry()
+    tokens = registry.counter("tokens_total", "Tokens used", ("model", "direction"))
+    tokens.inc(120, model="m1", direction="in")
+    tokens.inc(30, model="m1", direction="in")
+    tokens.inc(5, model='odd "model"\\x\n', direction="out")
+
+    assert registry.render().split("\n") == [
+        "# HELP tokens_total Tokens used",
+        "# TYPE tokens_total counter",
+        'tokens_total{model="m1",direction="in"} 150',
+        'tokens_total{model="odd \\"model\\"\\\\x\\n",direction="out"} 5',
+        "",
+    ]
+
+
+def test_histograms_render_cumulative_buckets_sum_and_count():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, stage="research")
+
+    assert registry.render().split("\n")[2:-1] == [
+        'latency_seconds_bucket{stage="research",le="0.1"} 2',
+        'latency_seconds_bucket{stage="research",le="1"} 3',
+        'latency_seconds_bucket{stage="research",le="+Inf"} 4',
+        'latency_seconds_sum{stage="research"} 3.65',
+        'latency_seconds_count{stage="research"} 4',
+    ]
+
+
+def test_gauges_are_read_at_scrape_time_and_a_broken_one_is_skipped():
+    registry = Registry()
+    depth = [3]
+    registry.gauge("queue_depth", "Jobs waiting", lambda: depth[0])
+    registry.gauge("broken", "Always fails", lambda: 1 / 0)
+    registry.gauge("pool_size", "Connections per host", lambda: {("a.example",): 2, ("b.example",): 1}, ("host",))
+    depth[0] = 5
+
+    assert registry.render().split("\n") == [
+        "# HELP queue_depth Jobs waiting",
+        "# TYPE queue_depth gauge",
+        "queue_depth 5",
+        "# HELP pool_size Connections per host",
+        "# TYPE pool_size gauge",
+        'pool_size{host="a.example"} 2',
+        'pool_size{host="b.example"} 1',
+        "",
+    ]
+
+
+def test_spans_record_outcomes_in_the_current_trace():
+    trace, token = start_trace("job-1")
+    with span("research", source="wiki") as labels:
+        labels["outcome"] = "local"
+    with pytest.raises(ValueError):
+        with span("formatting"):
+            raise ValueError("bad markup")
+
+    async def cancelled():
+        with span("model_attempt"):
+            await asyncio.sleep(5)
+
+    async def run():
+        current_trace.set(trace)
+        task = asyncio.ensure_future(cancelled())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    asyncio.run(run())
+    finish_trace(trace, token)
+
+    assert [(item["name"], item["outcome"]) for item in trace.spans] == [
+        ("research", "local"), ("formatting", "error"), ("model_attempt", "cancelled")]
+    assert trace.spans[0]["source"] == "wiki"
+    assert current_trace.get() is None
+
+
+def test_invalid_trace_ids_are_replaced():
+    assert start_trace("abc-123_X")[0].trace_id == "abc-123_X"
+    for bad in ["has space", "x" * 65, "semi;colon", "", None]:
+        assert re.fullmatch(r"[0-9a-f]{32}", start_trace(bad)[0].trace_id)
+    assert Trace().trace_id != Trace().trace_id
+
+
+def test_every_response_carries_a_trace_id():
+    client = app_module.app.test_client()
+
+    assert client.get("/coalescing/stats", headers={"X-Trace-Id": "caller-trace-42"}).headers["X-Trace-Id"] == "caller-trace-42"
+    generated = client.get("/coalescing/stats", headers={"X-Trace-Id": "not a trace id"}).headers["X-Trace-Id"]
+    assert re.fullmatch(r"[0-9a-f]{32}", generated)
+    assert re.fullmatch(r"[0-9a-f]{32}", client.get("/no-such-route").headers["X-Trace-Id"])
+
+
+def test_metrics_endpoint_exports_request_latency():
+    client = app_module.app.test_client()
+    client.get("/coalescing/stats")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert "# TYPE blog_http_request_seconds histogram" in text
+    assert re.search(r'^blog_http_request_seconds_count\{endpoint="/coalescing/stats",status="200"\} \d+$', text, re.MULTILINE)
+    assert re.search(r"^blog_admission_in_flight \d+$", text, re.MULTILINE)
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import tools
+from tools import ResearchTools
+
+
+class FakeAsyncHttpClient:
+    """Stands in for async_http_client: answers from a canned table and records the thread each call ran on"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((url, threading.current_thread()))
+        status, body = self.responses[url.split("?")[0]]
+        request = httpx.Request(method, url, params=kwargs.get("params"))
+        if isinstance(body, str):
+            return httpx.Response(status, text=body, request=request)
+        return httpx.Response(status, json=body, request=request)
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    def install(responses):
+        client = FakeAsyncHttpClient(responses)
+        monkeypatch.setattr(tools, "async_http_client", client)
+        monkeypatch.setattr(tools.http_client, "get", lambda *args, **kwargs: pytest.fail("used the blocking client"))
+        return client
+    return install
+
+
+def test_async_wikipedia_lookup_uses_the_async_client_on_the_loop(fake_http):
+    page = {"title": "Machine_learning", "titles": {"normalized": "Machine learning"},
+            "extract": "Machine learning is a field of study. It builds models.",
+            "content_urls": {"desktop": {"page": "https://en.wikipedia.org/wiki/Machine_learning"}}}
+    client = fake_http({tools.WIKIPEDIA_SUMMARY_URL + "Machine_learning": (200, page),
+                        tools.WIKIPEDIA_SUMMARY_URL + "Nothing_here": (404, {})})
+
+    result = asyncio.run(ResearchTools.awikipedia_search("Machine learning"))
+    assert result.startswith("Title: Machine learning\nSummary: Machine learning is a field of study.")
+    assert asyncio.run(ResearchTools.awikipedia_search("Nothing here")).startswith("Wikipedia search failed")
+    assert [thread for _, thread in client.calls] == [threading.main_thread()] * 2
+
+
+def test_async_web_search_races_the_http_engines(fake_http, monkeypatch):
+    qwant = {"data": {"result": {"items": {"mainline": [
+        {"title": "AI news", "desc": "Models everywhere", "url": "https://news.example.com/ai"}]}}}}
+    client = fake_http({tools.BRAVE_URL: (503, ""), tools.QWANT_URL: (200, qwant)})
+
+    async def no_ddgs(query):
+        return ""
+    monkeypatch.setattr(tools.search_racer, "async_engines", dict(tools.search_racer.async_engines, duckduckgo=no_ddgs))
+    monkeypatch.setattr(tools.search_racer, "max_retries", 1)
+
+    result = asyncio.run(ResearchTools.aweb_search("ai latest"))
+    assert result == "Title: AI news\nSnippet: Models everywhere\nURL: https://news.example.com/ai"
+    assert {url.split("?")[0] for url, _ in client.calls} == {tools.BRAVE_URL, tools.QWANT_URL}
+    assert {thread for _, thread in client.calls} == {threading.main_thread()}
@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+
+from agent import BlogAgent
+from deadline import Deadline, DeadlineExceeded, current_deadline
+from validator import StreamValidator, StreamAborted
+
+PROSE = ("Artificial intelligence is changing how banks lend money. Lenders now score applicants in seconds. "
+         "Regulators are still catching up with these systems. ")
+
+
+def feed_all(validator, deltas):
+    for delta in deltas:
+        validator.feed(delta)
+
+
+def in_pieces(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_good_prose_streams_through():
+    validator = StreamValidator("Write about AI in finance", target_word_count=40)
+    # A sentence quoted twice is not a loop
+    feed_all(validator, in_pieces(PROSE * 2 + "Fraud detection is the clearest win so far.\nSources:\nWikipedia\nForbes\n"))
+
+    assert validator.text.endswith("Forbes\n")
+
+
+def test_a_looping_model_is_aborted():
+    loop = "The future of finance is artificial intelligence and automation. "
+    validator = StreamValidator("Write about AI in finance")
+
+    with pytest.raises(StreamAborted, match="repeated"):
+        feed_all(validator, in_pieces(PROSE + loop * 5))
+    assert validator.text.count(loop.strip()) == 3
+
+
+def test_short_sentences_may_repeat():
+    validator = StreamValidator("Write about AI in finance")
+    feed_all(validator, in_pieces(PROSE + "Key takeaway. " * 5 + "\nSources:\nWikipedia.\nWikipedia.\nWikipedia.\n"))
+
+
+@pytest.mark.parametrize("opening", [
+    "I'm sorry, but I can't help with writing that blog post about this topic.",
+    "  As an AI language model, I do not have access to current research on this.",
+    "I cannot produce content on this subject because it may be misleading to readers.",
+])
+def test_a_refusal_is_aborted(opening):
+    with pytest.raises(StreamAborted, match="refusal"):
+        feed_all(StreamValidator("Write about AI in finance"), in_pieces(opening + " " + PROSE))
+
+
+@pytest.mark.parametrize("opening", [
+    "```markdown\n# AI in Finance\n" + PROSE,
+    '{"title": "AI in Finance", "body": "' + PROSE + '"}',
+    "<!DOCTYPE html><html><body>" + PROSE,
+])
+def test_code_or_data_instead_of_prose_is_aborted(opening):
+    with pytest.raises(StreamAborted, match="prose"):
+        feed_all(StreamValidator("Write about AI in finance"), in_pieces(opening))
+
+
+def test_a_refusal_later_in_the_text_is_fine():
+    validator = StreamValidator("Write about AI in finance")
+    feed_all(validator, in_pieces(PROSE + "I'm sorry to say the data is thin. " + PROSE))
+
+
+def test_placeholder_split_across_deltas_is_caught():
+    with pytest.raises(StreamAborted, match="placeholder"):
+        feed_all(StreamValidator("Write about AI in finance"), [PROSE, "See [ins", "ert chart here]"])
+
+
+def test_off_topic_and_short_body_rules():
+    with pytest.raises(StreamAborted, match="off-topic"):
+        feed_all(StreamValidator("Write about education"), [PROSE, "Motorcycles are fast."])
+    with pytest.raises(StreamAborted, match="target"):
+        feed_all(StreamValidator("Write about AI", target_word_count=500), [PROSE, "\nSources:\nWikipedia"])
+
+
+def call_model(model, deadline=None):
+    agent = BlogAgent()
+    agent.early_abort = True
+
+    async def call():
+        if deadline is not None:
+            current_deadline.set(deadline)
+        return await agent._acall_model(model, "Write about AI in finance")
+    return agent, call
+
+
+def test_aborted_stream_counts_against_the_model(fake_openrouter):
+    fake_openrouter.script("looping/model", in_pieces(PROSE + "The future of finance is artificial intelligence. " * 4))
+    agent, call = call_model("looping/model")
+
+    assert asyncio.run(call()) is None
+    stats = agent.model_health.snapshot()["looping/model"]
+    assert stats["validation_failures"] == 1
+    assert "repeated" in stats["last_error"]
+
+
+def test_stall_cut_short_by_the_deadline_is_not_a_validation_failure(fake_openrouter):
+    fake_openrouter.script("slow/model", in_pieces(PROSE), error=httpx.ReadTimeout("timed out"))
+    agent, call = call_model("slow/model", Deadline(0.5))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call())
+    stats = agent.model_health.snapshot()["slow/model"]
+    assert stats["attempts"] == 0 and stats["validation_failures"] == 0
+    assert agent.model_health.begin("slow/model")
+
+
+def test_stall_with_time_left_is_a_validation_failure(fake_openrouter):
+    fake_openrouter.script("slow/model", in_pieces(PROSE), error=httpx.ReadTimeout("timed out"))
+    agent, call = call_model("slow/model", Deadline(60))
+
+    assert asyncio.run(call()) is None
+    assert agent.model_health.snapshot()["slow/model"]["validation_failures"] == 1
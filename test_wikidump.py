@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+import tools
+from tools import ResearchTools
+from wikidump import WikipediaDump, import_dump, wikitext_lead
+
+DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <page>
+    <title>Machine learning</title>
+    <ns>0</ns>
+    <revision><text>{{Short description|Field of study}}{{Infobox|name={{nested|x}}}}
+'''Machine learning''' (ML) is a field of [[artificial intelligence|AI]] study.&lt;ref&gt;Mitchell 1997&lt;/ref&gt; It builds models from data. It is used widely. A fourth sentence is dropped.
+== History ==
+Not part of the lead.</text></revision>
+  </page>
+  <page>
+    <title>ML</title>
+    <ns>0</ns>
+    <redirect title="Machine learning" />
+    <revision><text>#REDIRECT [[Machine learning]]</text></revision>
+  </page>
+  <page>
+    <title>Artificial intelligence in finance</title>
+    <ns>0</ns>
+    <revision><text>'''AI in finance''' applies learned models to markets and lending.</text></revision>
+  </page>
+  <page>
+    <title>Talk:Machine learning</title>
+    <ns>1</ns>
+    <revision><text>Discussion pages are not articles.</text></revision>
+  </page>
+</mediawiki>
+"""
+
+
+@pytest.fixture
+def dump(tmp_path):
+    source = tmp_path / "enwiki-test.xml"
+    source.write_text(DUMP, encoding="utf-8")
+    assert import_dump(str(source), str(tmp_path / "wikipedia")) == {"articles": 2, "redirects": 1}
+    dump = WikipediaDump(str(tmp_path / "wikipedia"))
+    yield dump
+    dump.close()
+
+
+def test_wikitext_lead_keeps_plain_opening_sentences():
+    text = "{{Infobox|a={{b}}}}'''Solar power''' is [[energy|power]] from the sun.<ref>x</ref> It is clean.\n== Uses ==\nMore."
+    assert wikitext_lead(text) == "Solar power is power from the sun. It is clean."
+
+
+def test_exact_title_and_redirect_lookups(dump):
+    article = dump.search("machine_learning")
+    assert article.split("\n") == [
+        "Title: Machine learning",
+        "Summary: Machine learning (ML) is a field of AI study. It builds models from data. It is used widely.",
+        "URL: https://en.wikipedia.org/wiki/Machine_learning",
+    ]
+    assert dump.search("ML") == article
+
+
+def test_word_order_and_fuzzy_lookups(dump):
+    assert dump.search("Finance artificial intelligence").startswith("Title: Artificial intelligence in finance")
+    assert dump.search("Machine lerning").startswith("Title: Machine learning")
+
+
+def test_unknown_title_is_a_miss(dump):
+    assert dump.search("Quantum chromodynamics") is None
+    assert dump.search("Deep sea fishing") is None
+
+
+def test_dump_miss_is_looked_up_once_before_going_live(dump, monkeypatch):
+    lookups, live = [], []
+
+    def search(query):
+        lookups.append(query)
+        return WikipediaDump.search(dump, query)
+    monkeypatch.setattr(dump, "search", search)
+    monkeypatch.setattr(tools, "wikipedia_dump", dump)
+    monkeypatch.setattr(ResearchTools, "_wikipedia_search_live", staticmethod(lambda query: live.append(query) or "Title: live"))
+
+    async def alive(query):
+        return ResearchTools._wikipedia_search_live(query)
+    monkeypatch.setattr(ResearchTools, "_awikipedia_search_live", staticmethod(alive))
+
+    assert asyncio.run(ResearchTools.awikipedia_search("Machine learning")).startswith("Title: Machine learning")
+    assert asyncio.run(ResearchTools.awikipedia_search("Quantum chromodynamics")) == "Title: live"
+    assert ResearchTools.wikipedia_search("Quantum chromodynamics") == "Title: live"
+    assert lookups == ["Machine learning", "Quantum chromodynamics", "Quantum chromodynamics"]
+    assert live == ["Quantum chromodynamics", "Quantum chromodynamics"]
+
+
+def test_dump_miss_without_live_fallback_fails(dump, monkeypatch):
+    monkeypatch.setattr(tools, "wikipedia_dump", dump)
+    monkeypatch.setattr(tools, "WIKIPEDIA_LIVE_FALLBACK", False)
+    monkeypatch.setattr(ResearchTools, "_awikipedia_search_live", staticmethod(lambda query: pytest.fail("went live")))
+
+    assert asyncio.run(ResearchTools.awikipedia_search("Quantum chromodynamics")).startswith("Wikipedia search failed")
@@ -1,111 +1,303 @@
-import wikipedia
+import os
+import re
+from urllib.parse import quote
 from ddgs import DDGS  # Updated import to use the new package name
+from ddgs.exceptions import DDGSException, RatelimitException
+from bs4 import BeautifulSoup
 from langchain.tools import Tool
-import requests
 import time
 import random
+import asyncio
+import threading
+from ratelimit import scheduler
+from deadline import budget, time_left
+from cache import research_cache
+from http_client import http_client, async_http_client
+from aio import in_thread
+from wikidump import wikipedia_dump, first_sentences
+from racing import SearchRacer, SearchError, http_error, classify
+from telemetry import span
+
+WIKIPEDIA_LIVE_FALLBACK = os.getenv("WIKIPEDIA_LIVE_FALLBACK", "1") == "1"
+
+# Title, lead extract and URL of a page in one request; redirects are followed
+WIKIPEDIA_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+# Wikimedia asks API clients to identify themselves
+WIKIPEDIA_USER_AGENT = "BlogGenerationSystem/1.0 (research client; python-requests)"
+
+BRAVE_URL = "https://search.brave.com/search"
+QWANT_URL = "https://api.qwant.com/v3/search/web"
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# DDGS keeps an HTTP client per engine, so one instance per thread reuses its connections
+_ddgs_local = threading.local()
+
+
+def _get_ddgs():
+    ddgs = getattr(_ddgs_local, "ddgs", None)
+    if ddgs is None:
+        ddgs = _ddgs_local.ddgs = DDGS(timeout=10)
+    return ddgs
+
+
+def parse_brave_results(html: str, limit: int = 3) -> str:
+    """Top organic results from a Brave results page, formatted like the other engines"""
+    soup = BeautifulSoup(html, "html.parser")
+    results = []
+    for snippet in soup.select('div.snippet[data-type="web"]') or soup.select("div.snippet"):
+        link = snippet.find("a", href=re.compile(r"^https?://"))
+        title = snippet.select_one(".title, .snippet-title")
+        if link is None or title is None:
+            continue
+        description = snippet.select_one(".snippet-description, .generic-snippet .content, .description")
+        snippet_text = description.get_text(" ", strip=True) if description else ""
+        results.append(f"Title: {title.get_text(' ', strip=True)}\nSnippet: {snippet_text}\nURL: {link['href']}")
+        if len(results) == limit:
+            break
+    return "\n\n".join(results)
+
+
+def _wikipedia_url(query: str) -> str:
+    return WIKIPEDIA_SUMMARY_URL + quote(query.strip().replace(' ', '_'), safe='')
+
+
+def _wikipedia_page(query: str, response) -> str:
+    """Format a REST summary response; a missing or ambiguous page is a failure string, other errors raise"""
+    if response.status_code == 404:
+        # The same query gets the same answer, so retrying only burns time
+        return f"Wikipedia search failed for: {query}. Error: no page titled \"{query}\""
+    if response.status_code != 200:
+        raise http_error(response)
+    page = response.json()
+    if page.get("type") == "disambiguation":
+        return f"Wikipedia search failed for: {query}. Error: \"{query}\" may refer to several pages"
+    title = page.get("titles", {}).get("normalized") or page["title"].replace('_', ' ')
+    return f"Title: {title}\nSummary: {first_sentences(page.get('extract', ''))}\nURL: {page['content_urls']['desktop']['page']}"
+
+
+def _wikipedia_retry_wait(error: SearchError, attempt: int, max_retries: int):
+    """Backoff before retrying a transient failure, or None when the request cannot afford another try"""
+    wait_time = error.retry_after if error.retry_after is not None else (2 ** attempt) + random.uniform(0, 1)
+    if error.transient and attempt < max_retries - 1 and wait_time < time_left(wait_time + 1):
+        return wait_time
+    return None
+
+
+def _brave_results(response) -> str:
+    if response.status_code != 200:
+        raise http_error(response)
+    results = parse_brave_results(response.text)
+    if not results:
+        # A 200 with nothing recognisable is a captcha or a markup change, not an empty result set
+        raise SearchError("Brave returned no parsable results", False)
+    return results
+
+
+def _qwant_results(response) -> str:
+    if response.status_code != 200:
+        raise http_error(response)
+    data = response.json()
+    results = data.get("data", {}).get("result", {}).get("items", {})
+    formatted_results = []
+    for item in results.get("mainline", [])[:3]:
+        if "desc" in item:
+            formatted_results.append(f"Title: {item.get('title', 'N/A')}\nSnippet: {item.get('desc', 'N/A')}\nURL: {item.get('url', 'N/A')}")
+    return "\n\n".join(formatted_results)
+
+
+def _brave_params(query: str) -> dict:
+    return {"q": query, "source": "web"}
+
+
+def _qwant_params(query: str) -> dict:
+    return {"q": query, "count": 3, "locale": "en_US", "safesearch": 1, "source": "news"}
+
 
 class ResearchTools:
     @staticmethod
     def wikipedia_search(query: str) -> str:
-        """Search Wikipedia for factual information with retry logic"""
+        """Search Wikipedia, answering from the local dump or the research cache when possible"""
+        local = ResearchTools._wikipedia_from_dump(query)
+        if local is not None:
+            return local
+        return ResearchTools._cached("wikipedia", query, ResearchTools._wikipedia_search_live, "Wikipedia search failed")
+    
+    @staticmethod
+    def web_search(query: str) -> str:
+        """Search the web, answering from the research cache when possible"""
+        return ResearchTools._cached("web", query, ResearchTools._web_search_live, "All search engines failed")
+    
+    @staticmethod
+    async def awikipedia_search(query: str) -> str:
+        """Async wikipedia_search; the live REST lookup goes through the async HTTP client"""
+        local = ResearchTools._wikipedia_from_dump(query)
+        if local is not None:
+            return local
+        return await ResearchTools._acached("wikipedia", query, ResearchTools._awikipedia_search_live, "Wikipedia search failed")
+    
+    @staticmethod
+    async def aweb_search(query: str) -> str:
+        """Async web_search; engines race as tasks, and only the blocking DDGS call uses a worker thread"""
+        return await ResearchTools._acached("web", query, ResearchTools._aweb_search_live, "All search engines failed")
+    
+    @staticmethod
+    def _wikipedia_from_dump(query: str):
+        """The local dump's article, a failure when it has none and the live fallback is off, or None to go live"""
+        if wikipedia_dump is None:
+            return None
+        result = wikipedia_dump.search(query)
+        if result is None and not WIKIPEDIA_LIVE_FALLBACK:
+            return f"Wikipedia search failed for: {query}. Error: no article in the local dump"
+        return result
+    
+    @staticmethod
+    def _cached(source: str, query: str, search, failure_prefix: str) -> str:
+        """Serve a fresh cached result or run the live search and cache it if it succeeded"""
+        if research_cache is None:
+            return search(query)
+        
+        cached = research_cache.get(source, query)
+        if cached is not None:
+            return cached
+        
+        result = search(query)
+        if result and not result.startswith(failure_prefix):
+            research_cache.set(source, query, result)
+        return result
+    
+    @staticmethod
+    async def _acached(source: str, query: str, search, failure_prefix: str) -> str:
+        """Async _cached: the SQLite cache is read and written in a worker thread, the search is awaited"""
+        if research_cache is None:
+            return await search(query)
+        
+        cached = await in_thread(research_cache.get, source, query)
+        if cached is not None:
+            return cached
+        
+        result = await search(query)
+        if result and not result.startswith(failure_prefix):
+            await in_thread(research_cache.set, source, query, result)
+        return result
+    
+    @staticmethod
+    def _wikipedia_search_live(query: str) -> str:
+        """Look a page up through the REST summary endpoint: one pooled round-trip, retried only for transient failures"""
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                # Set a timeout for the request
-                wikipedia.set_lang("en")
-                summary = wikipedia.summary(query, sentences=3, auto_suggest=False)
-                page = wikipedia.page(query, auto_suggest=False)
-                return f"Title: {page.title}\nSummary: {summary}\nURL: {page.url}"
+                scheduler.acquire("host:en.wikipedia.org")
+                response = http_client.get(_wikipedia_url(query), params={"redirect": "true"}, headers={"User-Agent": WIKIPEDIA_USER_AGENT},
+                                           read_timeout=budget(10), total_timeout=budget(http_client.total_timeout))
+                return _wikipedia_page(query, response)
             except Exception as e:
-                if attempt < max_retries - 1:
-                    # Wait before retrying with exponential backoff
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)
+                wait_time = _wikipedia_retry_wait(classify(e), attempt, max_retries)
+                if wait_time is None:
+                    return f"Wikipedia search failed for: {query}. Error: {str(e)}"
+                with span("retry_wait", source="wikipedia"):
                     time.sleep(wait_time)
-                    continue
-                return f"Wikipedia search failed for: {query}. Error: {str(e)}"
     
     @staticmethod
-    def web_search(query: str) -> str:
-        """Search web for recent information with multiple fallback options"""
+    async def _awikipedia_search_live(query: str) -> str:
+        """Async _wikipedia_search_live over the async HTTP client"""
         max_retries = 3
-        search_engines = [
-            ResearchTools._duckduckgo_search,
-            ResearchTools._brave_search,
-            ResearchTools._qwant_search
-        ]
-        
-        for engine in search_engines:
-            for attempt in range(max_retries):
-                try:
-                    result = engine(query)
-                    if result and result.strip():
-                        return result
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        wait_time = (2 ** attempt) + random.uniform(0, 1)
-                        time.sleep(wait_time)
-                        continue
-        
-        return f"All search engines failed for query: {query}"
+        for attempt in range(max_retries):
+            try:
+                await scheduler.aacquire("host:en.wikipedia.org")
+                response = await async_http_client.request("GET", _wikipedia_url(query), params={"redirect": "true"},
+                                                           headers={"User-Agent": WIKIPEDIA_USER_AGENT}, read_timeout=budget(10),
+                                                           total_timeout=budget(http_client.total_timeout))
+                return _wikipedia_page(query, response)
+            except Exception as e:
+                wait_time = _wikipedia_retry_wait(classify(e), attempt, max_retries)
+                if wait_time is None:
+                    return f"Wikipedia search failed for: {query}. Error: {str(e)}"
+                with span("retry_wait", source="wikipedia"):
+                    await asyncio.sleep(wait_time)
+    
+    @staticmethod
+    def _web_search_live(query: str) -> str:
+        """Search the web, racing the engines and taking the first non-empty result"""
+        result = search_racer.search(query)
+        if result is None:
+            return f"All search engines failed for query: {query}"
+        return result
+    
+    @staticmethod
+    async def _aweb_search_live(query: str) -> str:
+        result = await search_racer.asearch(query)
+        if result is None:
+            return f"All search engines failed for query: {query}"
+        return result
     
     @staticmethod
     def _duckduckgo_search(query: str) -> str:
-        """DuckDuckGo search with specific error handling"""
+        """DuckDuckGo search; an empty string means no results"""
+        scheduler.acquire("host:duckduckgo.com")
+        return ResearchTools._duckduckgo_results(query)
+    
+    @staticmethod
+    async def _aduckduckgo_search(query: str) -> str:
+        """Async DuckDuckGo search; DDGS has no async API, so only its call runs in a worker thread"""
+        await scheduler.aacquire("host:duckduckgo.com")
+        return await in_thread(ResearchTools._duckduckgo_results, query)
+    
+    @staticmethod
+    def _duckduckgo_results(query: str) -> str:
         try:
-            with DDGS(timeout=10) as ddgs:
-                results = list(ddgs.text(query, max_results=3))
-                formatted_results = []
-                for result in results:
-                    formatted_results.append(f"Title: {result['title']}\nSnippet: {result['body']}\nURL: {result['href']}")
-                return "\n\n".join(formatted_results)
-        except Exception as e:
-            raise Exception(f"DuckDuckGo search failed: {str(e)}")
+            results = list(_get_ddgs().text(query, max_results=3))
+        except RatelimitException:
+            # DuckDuckGo gives no Retry-After, so pause it for the scheduler's default
+            scheduler.block("host:duckduckgo.com")
+            raise
+        except DDGSException as e:
+            if "no results" in str(e).lower():
+                return ""
+            raise
+        formatted_results = []
+        for result in results:
+            formatted_results.append(f"Title: {result['title']}\nSnippet: {result['body']}\nURL: {result['href']}")
+        return "\n\n".join(formatted_results)
     
     @staticmethod
     def _brave_search(query: str) -> str:
-        """Brave search as a fallback option"""
-        try:
-            url = "https://search.brave.com/search"
-            params = {"q": query, "source": "web"}
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            if response.status_code == 200:
-                # Simple text extraction - in a real implementation, you'd parse HTML
-                return f"Brave search results for: {query}\n[Content would be extracted here]"
-            else:
-                raise Exception(f"HTTP {response.status_code}")
-        except Exception as e:
-            raise Exception(f"Brave search failed: {str(e)}")
+        """Brave search, parsed from its HTML results page"""
+        scheduler.acquire("host:search.brave.com")
+        response = http_client.get(BRAVE_URL, params=_brave_params(query), headers={"User-Agent": BROWSER_USER_AGENT},
+                                   read_timeout=budget(10), total_timeout=budget(http_client.total_timeout))
+        return _brave_results(response)
+    
+    @staticmethod
+    async def _abrave_search(query: str) -> str:
+        await scheduler.aacquire("host:search.brave.com")
+        response = await async_http_client.request("GET", BRAVE_URL, params=_brave_params(query), headers={"User-Agent": BROWSER_USER_AGENT},
+                                                   read_timeout=budget(10), total_timeout=budget(http_client.total_timeout))
+        return _brave_results(response)
     
     @staticmethod
     def _qwant_search(query: str) -> str:
-        """Qwant search as another fallback option"""
-        try:
-            url = "https://api.qwant.com/v3/search/web"
-            params = {
-                "q": query,
-                "count": 3,
-                "locale": "en_US",
-                "safesearch": 1,
-                "source": "news"
-            }
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                results = data.get("data", {}).get("result", {}).get("items", {})
-                formatted_results = []
-                for item in results.get("mainline", [])[:3]:
-                    if "desc" in item:
-                        formatted_results.append(f"Title: {item.get('title', 'N/A')}\nSnippet: {item.get('desc', 'N/A')}\nURL: {item.get('url', 'N/A')}")
-                return "\n\n".join(formatted_results)
-            else:
-                raise Exception(f"HTTP {response.status_code}")
-        except Exception as e:
-            raise Exception(f"Qwant search failed: {str(e)}")
+        """Qwant search"""
+        scheduler.acquire("host:api.qwant.com")
+        response = http_client.get(QWANT_URL, params=_qwant_params(query), headers={"User-Agent": BROWSER_USER_AGENT},
+                                   read_timeout=budget(10), total_timeout=budget(http_client.total_timeout))
+        return _qwant_results(response)
+    
+    @staticmethod
+    async def _aqwant_search(query: str) -> str:
+        await scheduler.aacquire("host:api.qwant.com")
+        response = await async_http_client.request("GET", QWANT_URL, params=_qwant_params(query), headers={"User-Agent": BROWSER_USER_AGENT},
+                                                   read_timeout=budget(10), total_timeout=budget(http_client.total_timeout))
+        return _qwant_results(response)
+
+search_racer = SearchRacer([
+    ("duckduckgo", ResearchTools._duckduckgo_search),
+    ("brave", ResearchTools._brave_search),
+    ("qwant", ResearchTools._qwant_search),
+], async_engines={
+    "duckduckgo": ResearchTools._aduckduckgo_search,
+    "brave": ResearchTools._abrave_search,
+    "qwant": ResearchTools._aqwant_search,
+})
 
 def get_tools():
     return [
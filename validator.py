@@ -0,0 +1,87 @@
+import os
+import re
+
+SECTION_END = re.compile(r'\n\s*(===\s*SOURCES\s*===|Sources:|References:|Note:)', re.IGNORECASE)
+
+# How free models decline instead of writing; only checked at the very start of the output
+REFUSAL = re.compile(r"(i'?m sorry|i am sorry|i apologi[sz]e|i can(not|'?t)|i'?m (not able|unable)|i am (not able|unable)|as an ai\b)",
+                     re.IGNORECASE)
+# Output that opens like code or data instead of prose
+OFF_FORMAT = re.compile(r'(```|\{|\[\s*\{|<!doctype|<html)', re.IGNORECASE)
+SENTENCE = re.compile(r'[^.!?\n]+[.!?]+(?=\s)')
+
+
+class StreamAborted(Exception):
+    """Raised when streamed output is rejected before the model finishes"""
+
+
+class StreamValidator:
+    """Runs the cheap _validate_content rules on partial output as it streams in
+
+    The unsourced-percentage rule is left to the final check because the
+    sources list only arrives at the very end of a generation. Three failures
+    only a stream shows early are checked too: a refusal or code/data instead
+    of prose at the start, and a model looping on the same sentence.
+    """
+
+    # Longest banned phrase, so a match split across two deltas is still seen
+    OVERLAP = len('lorem ipsum')
+    # Characters needed before the opening is judged
+    OPENING = 40
+    # Sentences shorter than this many words (headings, source names) may repeat legitimately
+    MIN_REPEATED_WORDS = 6
+
+    def __init__(self, prompt: str, target_word_count: int = None, min_progress_ratio: float = None, max_repeats: int = None):
+        self.check_off_topic = 'education' in prompt.lower()
+        self.target_word_count = target_word_count
+        self.min_progress_ratio = min_progress_ratio if min_progress_ratio is not None else float(os.getenv("STREAM_MIN_WORD_RATIO", "0.5"))
+        self.max_repeats = max_repeats or int(os.getenv("STREAM_MAX_REPEATS", "3"))
+        self.text = ''
+        self.checked = 0
+        self.opening_checked = False
+        self.sentences_end = 0
+        self.sentence_counts = {}
+
+    def feed(self, delta: str):
+        """Append a delta and raise StreamAborted as soon as a rule fails"""
+        self.text += delta
+        start = max(0, self.checked - self.OVERLAP)
+        window = self.text[start:].lower()
+        self.checked = len(self.text)
+
+        if self.check_off_topic and 'motorcycle' in window:
+            raise StreamAborted("off-topic content")
+        if 'lorem ipsum' in window or '[insert' in window:
+            raise StreamAborted("placeholder text")
+
+        if not self.opening_checked:
+            self._check_opening()
+        self._check_repetition()
+
+        if self.target_word_count and SECTION_END.search(self.text, start):
+            # The body is over; if it is far short of the target no amount of sources will fix it
+            words = len(self.text.split())
+            if words < self.target_word_count * self.min_progress_ratio:
+                raise StreamAborted(f"body ended at {words} words, target is {self.target_word_count}")
+
+    def _check_opening(self):
+        opening = self.text.lstrip()
+        if len(opening) < self.OPENING:
+            return
+        self.opening_checked = True
+        if REFUSAL.match(opening):
+            raise StreamAborted("refusal instead of a blog")
+        if OFF_FORMAT.match(opening):
+            raise StreamAborted("code or data instead of prose")
+
+    def _check_repetition(self):
+        """Count each sentence completed since the last call; one seen max_repeats times means the model is looping"""
+        for match in SENTENCE.finditer(self.text, self.sentences_end):
+            self.sentences_end = match.end()
+            words = match.group(0).lower().split()
+            if len(words) < self.MIN_REPEATED_WORDS:
+                continue
+            sentence = " ".join(words)
+            count = self.sentence_counts[sentence] = self.sentence_counts.get(sentence, 0) + 1
+            if count >= self.max_repeats:
+                raise StreamAborted(f"repeated the same sentence {count} times")
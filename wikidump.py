@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Offline Wikipedia backend: articles imported from a dump are served from a
+compressed article store with mmap-ed title and redirect indexes, so a
+lookup never touches the network.
+
+Usage: python wikidump.py import enwiki-latest-pages-articles.xml.bz2 cache/wikipedia
+       python wikidump.py import wikiextractor-output.jsonl cache/wikipedia
+       python wikidump.py lookup cache/wikipedia "Machine learning"
+
+Then set WIKIPEDIA_DUMP_PATH=cache/wikipedia.
+"""
+
+import os
+import re
+import bz2
+import sys
+import mmap
+import json
+import zlib
+import gzip
+import struct
+import difflib
+import logging
+import argparse
+from urllib.parse import quote
+import xml.etree.ElementTree as ET
+
+ARTICLES_FILE = "articles.bin"
+TITLES_FILE = "titles.idx"
+TOKENS_FILE = "tokens.idx"
+
+INDEX_MAGIC = b"WKIX1"
+INDEX_HEADER = struct.Struct("<5sI")
+# key offset, key length, record offset, record length
+INDEX_ENTRY = struct.Struct("<IHQI")
+
+STOPWORDS = frozenset("a an and at by for from in of on or the to with".split())
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def normalize_title(title: str) -> str:
+    """Lookup key: case-folded, underscores as spaces, single spaces"""
+    return " ".join(title.replace("_", " ").casefold().split())
+
+
+def token_key(title: str) -> str:
+    """Order-insensitive key so 'Finance AI' finds 'AI in finance'"""
+    words = re.findall(r"\w+", normalize_title(title))
+    return " ".join(sorted(word for word in words if word not in STOPWORDS))
+
+
+def first_sentences(text: str, count: int = 3) -> str:
+    return " ".join(SENTENCE_END.split(" ".join(text.split()))[:count])
+
+
+class MmapIndex:
+    """Sorted key -> (offset, length) table read straight from a memory-mapped file"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = INDEX_HEADER.unpack_from(self.map, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a wikidump index")
+        self.entries_at = INDEX_HEADER.size
+
+    def _entry(self, position: int):
+        key_offset, key_length, record_offset, record_length = INDEX_ENTRY.unpack_from(
+            self.map, self.entries_at + position * INDEX_ENTRY.size
+        )
+        return self.map[key_offset:key_offset + key_length], record_offset, record_length
+
+    def _bisect(self, key: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, key: str):
+        encoded = key.encode("utf-8")
+        position = self._bisect(encoded)
+        if position < self.count:
+            found, record_offset, record_length = self._entry(position)
+            if found == encoded:
+                return record_offset, record_length
+        return None
+
+    def neighbors(self, key: str, window: int) -> list:
+        """Entries sorted around where key would be; near misses like plurals and typos land here"""
+        position = self._bisect(key.encode("utf-8"))
+        start = max(0, position - window)
+        return [self._entry(index) for index in range(start, min(self.count, position + window))]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    @staticmethod
+    def write(path: str, entries: list):
+        """entries: (key, record_offset, record_length); duplicate keys keep the first"""
+        unique = {}
+        for key, record_offset, record_length in entries:
+            unique.setdefault(key.encode("utf-8")[:65535], (record_offset, record_length))
+        keys = sorted(unique)
+        entries_size = INDEX_HEADER.size + len(keys) * INDEX_ENTRY.size
+        with open(path, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(keys)))
+            key_offset = entries_size
+            for key in keys:
+                f.write(INDEX_ENTRY.pack(key_offset, len(key), *unique[key]))
+                key_offset += len(key)
+            for key in keys:
+                f.write(key)
+
+
+class WikipediaDump:
+    """Read side: title/redirect lookup with fuzzy fallback, answering in the live tool's format"""
+
+    def __init__(self, path: str, fuzzy_cutoff: float = None):
+        self.path = path
+        self.fuzzy_cutoff = fuzzy_cutoff or float(os.getenv("WIKIPEDIA_DUMP_FUZZY_CUTOFF", "0.85"))
+        self.titles = MmapIndex(os.path.join(path, TITLES_FILE))
+        self.tokens = MmapIndex(os.path.join(path, TOKENS_FILE))
+        self.articles_file = open(os.path.join(path, ARTICLES_FILE), "rb")
+        self.articles = mmap.mmap(self.articles_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _record(self, location):
+        record_offset, record_length = location
+        title, _, summary = zlib.decompress(self.articles[record_offset:record_offset + record_length]).decode("utf-8").partition("\n")
+        return title, summary
+
+    def resolve(self, query: str):
+        """Exact title or redirect, then word-order-insensitive match, then the closest nearby title"""
+        key = normalize_title(query)
+        location = self.titles.find(key) or self.tokens.find(token_key(query))
+        if location:
+            return location
+
+        best, best_ratio = None, self.fuzzy_cutoff
+        for index, probe in ((self.titles, key), (self.tokens, token_key(query))):
+            # Each index is scored against its own form of the query: titles, or sorted word keys
+            matcher = difflib.SequenceMatcher(b=probe, autojunk=False)
+            for candidate, record_offset, record_length in index.neighbors(probe, 8):
+                matcher.set_seq1(candidate.decode("utf-8", "replace"))
+                ratio = matcher.ratio()
+                if ratio > best_ratio:
+                    best, best_ratio = (record_offset, record_length), ratio
+        return best
+
+    def search(self, query: str):
+        """'Title/Summary/URL' like ResearchTools.wikipedia_search, or None if the dump has no match"""
+        location = self.resolve(query)
+        if location is None:
+            return None
+        title, summary = self._record(location)
+        return f"Title: {title}\nSummary: {summary}\nURL: https://en.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+
+    def close(self):
+        self.titles.close()
+        self.tokens.close()
+        self.articles.close()
+        self.articles_file.close()
+
+
+def open_default():
+    """The dump named by WIKIPEDIA_DUMP_PATH, or None when no dump is configured or it cannot be read"""
+    path = os.getenv("WIKIPEDIA_DUMP_PATH")
+    if not path:
+        return None
+    try:
+        return WikipediaDump(path)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Wikipedia dump at {path} unavailable, using the live API: {str(e)}")
+        return None
+
+
+wikipedia_dump = open_default()
+
+
+# --- Import -------------------------------------------------------------------
+
+WIKI_NOISE = [
+    re.compile(r"<!--.*?-->", re.DOTALL),
+    re.compile(r"<ref[^>/]*/>"),
+    re.compile(r"<ref[^>]*>.*?</ref>", re.DOTALL),
+    re.compile(r"\{\|.*?\|\}", re.DOTALL),
+    re.compile(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.IGNORECASE),
+    re.compile(r"<[^>]+>"),
+]
+WIKI_LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+ ?([^\]]*)\]")
+TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+
+
+def wikitext_lead(text: str, sentences: int = 3) -> str:
+    """Plain-text opening sentences of an article's wikitext (lead section only)"""
+    lead = text.split("\n==", 1)[0]
+    # Templates nest, so strip the innermost ones until none are left
+    while True:
+        stripped = TEMPLATE.sub("", lead)
+        if stripped == lead:
+            break
+        lead = stripped
+    for pattern in WIKI_NOISE:
+        lead = pattern.sub("", lead)
+    lead = WIKI_LINK.sub(r"\1", lead)
+    lead = EXTERNAL_LINK.sub(r"\1", lead)
+    lead = lead.replace("'''", "").replace("''", "")
+    lines = [line for line in lead.split("\n") if line.strip() and not line.lstrip().startswith(("|", "!", "{", "}", "*", "#", ":"))]
+    return first_sentences(" ".join(lines), sentences)
+
+
+def _open_dump(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_xml_pages(path: str):
+    """(title, redirect target or None, wikitext) for main-namespace pages of a MediaWiki XML dump"""
+    with _open_dump(path) as f:
+        title = namespace = redirect = text = None
+        for _, element in ET.iterparse(f, events=("end",)):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = element.text
+            elif tag == "ns":
+                namespace = element.text
+            elif tag == "redirect":
+                redirect = element.get("title")
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0" and title:
+                    yield title, redirect, text
+                title = namespace = redirect = text = None
+                # Pages are processed one at a time; drop them so memory stays flat
+                element.clear()
+
+
+def iter_jsonl_pages(path: str):
+    """(title, None, text) from wikiextractor --json output, whose text is already plain"""
+    with _open_dump(path) as f:
+        for line in f:
+            if line.strip():
+                page = json.loads(line)
+                yield page["title"], None, page.get("text", "")
+
+
+def import_dump(source: str, target: str) -> dict:
+    """Build articles.bin plus the title and token indexes from a dump file"""
+    os.makedirs(target, exist_ok=True)
+    xml = ".xml" in os.path.basename(source)
+    pages = iter_xml_pages(source) if xml else iter_jsonl_pages(source)
+
+    titles, tokens, redirects = [], [], []
+    articles = 0
+    with open(os.path.join(target, ARTICLES_FILE), "wb") as out:
+        offset = 0
+        for title, redirect, text in pages:
+            if redirect:
+                redirects.append((title, redirect))
+                continue
+            summary = wikitext_lead(text) if xml else first_sentences(text.split("\n\n", 1)[-1] if text.startswith(title) else text)
+            if not summary:
+                continue
+            record = zlib.compress(f"{title}\n{summary}".encode("utf-8"))
+            out.write(record)
+            titles.append((normalize_title(title), offset, len(record)))
+            tokens.append((token_key(title), offset, len(record)))
+            offset += len(record)
+            articles += 1
+
+    by_title = {key: (record_offset, record_length) for key, record_offset, record_length in titles}
+    resolved = 0
+    for title, target_title in redirects:
+        location = by_title.get(normalize_title(target_title))
+        if location:
+            titles.append((normalize_title(title), *location))
+            resolved += 1
+
+    MmapIndex.write(os.path.join(target, TITLES_FILE), titles)
+    MmapIndex.write(os.path.join(target, TOKENS_FILE), tokens)
+    return {"articles": articles, "redirects": resolved}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and query an offline Wikipedia dump")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Build the article store from a .xml[.bz2] dump or wikiextractor JSONL")
+    import_parser.add_argument("source")
+    import_parser.add_argument("target", nargs="?", default=os.path.join("cache", "wikipedia"))
+    lookup_parser = commands.add_parser("lookup", help="Look up one title")
+    lookup_parser.add_argument("path")
+    lookup_parser.add_argument("query")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        counts = import_dump(args.source, args.target)
+        print(f"Imported {counts['articles']} articles and {counts['redirects']} redirects into {args.target}")
+        return 0
+
+    dump = WikipediaDump(args.path)
+    result = dump.search(args.query)
+    print(result or f"❌ No article for: {args.query}")
+    return 0 if result else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())